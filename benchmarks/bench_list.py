@@ -0,0 +1,98 @@
+'''
+List endpoint benchmark: ORM objects + response_model vs the orjson fast path.
+
+Seeds a temporary SQLite database with one user's contacts and calls
+``GET /api/contacts/?limit=N`` for each page size through httpx's ASGI
+transport, next to a ``/legacy`` route that returns ORM objects and lets
+FastAPI validate them through ``response_model=List[ContactsOut]`` (how the
+endpoint used to work). Pass ``--debug`` to include the TypeAdapter check.
+
+Usage:
+    python -m benchmarks.bench_list --pages 100,1000,5000
+'''
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+from typing import List
+
+import httpx
+from fastapi import Depends
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from main import create_app
+from m14.conf.config import settings
+from m14.database.db import get_db, to_async_url
+from m14.database.models import Base, Contacts, User
+from m14.repository.contacts import get_contacts
+from m14.schemas import ContactsOut
+from m14.services.auth import auth_service
+
+
+def seed(url: str, size: int):
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "username": "power", "email": "power@example.com", "password": "x"}])
+        conn.execute(insert(Contacts), [
+            {"first_name": f"First{i}", "last_name": f"Last{i}", "email": f"contact{i}@example.com",
+             "phone_number": "123456789", "date_of_birth": date(1990, 1 + i % 12, 1 + i % 28),
+             "nick": None if i % 3 else f"nick{i}", "user_id": 1}
+            for i in range(size)
+        ])
+    engine.dispose()
+
+
+async def measure(client: httpx.AsyncClient, path: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get(path)
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return round(statistics.median(timings) * 1000, 2)
+
+
+async def main(pages: List[int], repeat: int):
+    url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_list.db")
+    seed(url, max(pages))
+    engine = create_async_engine(to_async_url(url))
+    SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    app = create_app()
+
+    async def override_get_db():
+        async with SessionLocal() as db:
+            yield db
+
+    @app.get("/legacy", response_model=List[ContactsOut])
+    async def legacy(limit: int, current_user: User = Depends(auth_service.get_current_user),
+                     db=Depends(get_db)):
+        return await get_contacts(0, limit, current_user, db)
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[auth_service.get_current_user] = lambda: User(id=1, username="power",
+                                                                           email="power@example.com")
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for page in pages:
+            await client.get(f"/api/contacts/?limit={page}")
+            legacy_ms = await measure(client, f"/legacy?limit={page}", repeat)
+            fast_ms = await measure(client, f"/api/contacts/?limit={page}", repeat)
+            print({"page_size": page, "debug": settings.debug, "response_model_ms_p50": legacy_ms,
+                   "fast_ms_p50": fast_ms, "speedup": round(legacy_ms / fast_ms, 1)})
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--debug", action="store_true", help="validate fast responses with the ContactsOut TypeAdapter")
+    args = parser.parse_args()
+    settings.debug = args.debug
+    asyncio.run(main([int(p) for p in args.pages.split(",")], args.repeat))
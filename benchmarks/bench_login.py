@@ -0,0 +1,65 @@
+'''
+Login throughput benchmark: inline bcrypt vs the Auth hash executor.
+
+Fires ``--logins`` concurrent password verifications, first calling passlib
+directly inside the coroutine (how ``login`` used to run) and then through
+``auth_service.verify_password``. Alongside, a probe coroutine plays the part
+of a cheap endpoint and records how long it waits for the event loop.
+
+Usage:
+    python -m benchmarks.bench_login --logins 40
+'''
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from m14.conf.config import settings
+from m14.services.auth import auth_service
+
+
+async def probe(stop: asyncio.Event, interval: float = 0.01) -> list:
+    delays = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        delays.append((time.perf_counter() - started - interval) * 1000)
+    return delays
+
+
+async def run(name: str, verify, logins: int, hashed: str) -> dict:
+    stop = asyncio.Event()
+    probing = asyncio.create_task(probe(stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify("haslo1234", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    delays = await probing
+    assert all(results)
+    result = {"mode": name, "logins": logins, "logins_per_s": round(logins / elapsed, 1),
+              "probe_p50_ms": round(statistics.median(delays), 1), "probe_max_ms": round(max(delays), 1)}
+    print(result)
+    return result
+
+
+async def main(logins: int):
+    hashed = auth_service.pwd_context.hash("haslo1234")
+
+    async def inline(password, hashed_password):
+        return auth_service.pwd_context.verify(password, hashed_password)
+
+    await run("inline", inline, logins, hashed)
+    # What the app's lifespan gives auth_service.
+    with ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt") as executor:
+        auth_service.hash_executor = executor
+        await run(f"executor ({settings.password_hash_workers} workers)", auth_service.verify_password,
+                  logins, hashed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins))
@@ -0,0 +1,129 @@
+'''
+Confirmation email throughput: one FastMail connection per message vs the pooled mailer.
+
+Starts a local aiosmtpd server that accepts and discards mail, then sends the
+same number of confirmation emails (rendered from email_template.html) three
+ways: the old path (FastMail + MessageSchema, a new SMTP connection and a
+template lookup per message), SMTPMailer.send from concurrent tasks (what the
+signup background tasks do), and SMTPMailer.send_many. The local server has
+no TLS, so the gap against a real SSL server, where each connection also pays
+a TLS handshake and login, is larger. The old path needs fastapi-mail, which
+is no longer a requirement; it is skipped when the package is not installed.
+
+Usage:
+    python -m benchmarks.bench_mail --messages 500 --concurrency 50
+'''
+import argparse
+import asyncio
+import importlib.util
+import socket
+import time
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from m14.conf.config import settings
+from m14.services.email_service import MAIL_FROM_NAME, TEMPLATE_FOLDER, confirmation_message
+from m14.services.mail_transport import SMTPMailer, SMTPPool
+
+
+class Sink:
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_limited(jobs, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            await job()
+
+    await asyncio.gather(*(run(job) for job in jobs))
+
+
+async def legacy(port: int, count: int, concurrency: int):
+    from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+
+    config = ConnectionConfig(MAIL_USERNAME="", MAIL_PASSWORD="", MAIL_FROM=settings.mail_from, MAIL_PORT=port,
+                              MAIL_SERVER="127.0.0.1", MAIL_FROM_NAME=MAIL_FROM_NAME, MAIL_STARTTLS=False,
+                              MAIL_SSL_TLS=False, USE_CREDENTIALS=False, VALIDATE_CERTS=False,
+                              TEMPLATE_FOLDER=TEMPLATE_FOLDER)
+
+    def job(i):
+        async def send():
+            message = MessageSchema(subject="Confirm your email", recipients=[f"user{i}@example.com"],
+                                    template_body={"host": "http://bench/", "username": f"user{i}", "token": "t"},
+                                    subtype=MessageType.html)
+            await FastMail(config).send_message(message, template_name="email_template.html")
+        return send
+
+    await run_limited([job(i) for i in range(count)], concurrency)
+
+
+def pooled_mailer(port: int) -> SMTPMailer:
+    return SMTPMailer(SMTPPool(lambda: aiosmtplib.SMTP(hostname="127.0.0.1", port=port), size=2))
+
+
+async def pooled_send(port: int, count: int, concurrency: int):
+    mailer = pooled_mailer(port)
+
+    def job(i):
+        return lambda: mailer.send(confirmation_message(f"user{i}@example.com", f"user{i}", "http://bench/"))
+
+    await run_limited([job(i) for i in range(count)], concurrency)
+    stats = mailer.stats()
+    await mailer.close()
+    return stats
+
+
+async def pooled_send_many(port: int, count: int, concurrency: int):
+    mailer = pooled_mailer(port)
+    await mailer.send_many([confirmation_message(f"user{i}@example.com", f"user{i}", "http://bench/")
+                            for i in range(count)])
+    stats = mailer.stats()
+    await mailer.close()
+    return stats
+
+
+async def main(count: int, concurrency: int):
+    sink = Sink()
+    port = free_port()
+    controller = Controller(sink, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        for name, run in (("fastmail_per_message", legacy), ("pooled_send", pooled_send),
+                          ("pooled_send_many", pooled_send_many)):
+            if run is legacy and importlib.util.find_spec("fastapi_mail") is None:
+                print({"mode": name, "skipped": "fastapi-mail is not installed"})
+                continue
+            received = sink.received
+            started = time.perf_counter()
+            stats = await run(port, count, concurrency)
+            elapsed = time.perf_counter() - started
+            result = {"mode": name, "messages": sink.received - received, "seconds": round(elapsed, 2),
+                      "messages_per_s": round(count / elapsed)}
+            if stats:
+                result["connections"] = stats["connects"]
+            print(result)
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.concurrency))
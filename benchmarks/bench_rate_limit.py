@@ -0,0 +1,99 @@
+'''
+Per-request overhead of rate limiting.
+
+Sends the same requests through a minimal FastAPI app three ways: without a
+limit, with a Redis round trip per check (INCR + EXPIRE, what
+fastapi_limiter's RateLimiter costs), and with the hybrid RateLimiter, which
+checks a local token bucket and syncs with Redis in the background once per sync interval.
+Requests come from --clients client addresses, all under the limit, so every
+mode does the same work apart from the limiter. Overhead is reported against
+the unlimited run.
+
+Needs a Redis server (settings.redis_host / redis_port); --fake uses an
+in-process fakeredis instead, which hides the network round trip and so
+understates the per-check cost.
+
+Usage:
+    python -m benchmarks.bench_rate_limit --requests 5000 --clients 50
+'''
+import argparse
+import asyncio
+import time
+
+import httpx
+from fakeredis.aioredis import FakeRedis
+from fastapi import Depends, FastAPI, Request
+from redis.asyncio import Redis
+
+from m14.conf.config import settings
+from m14.services import rate_limit
+from m14.services.rate_limit import Policy, RateLimiter, RateLimitHeadersMiddleware
+
+POLICY = Policy("bench", 1_000_000, 60)
+
+
+def build_app(mode: str, redis) -> FastAPI:
+    if mode == "redis_per_check":
+        async def limit(request: Request):
+            key = f"bench-per-check:{request.headers['x-client']}"
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, POLICY.period)
+                count, _ = await pipe.execute()
+            assert count <= POLICY.limit
+        dependencies = [Depends(limit)]
+    elif mode == "hybrid":
+        async def limit(request: Request):
+            await rate_limit.check(request, POLICY, request.headers["x-client"])
+        dependencies = [Depends(limit)]
+    else:
+        dependencies = []
+    app = FastAPI(dependencies=dependencies)
+    app.add_middleware(RateLimitHeadersMiddleware)
+
+    @app.get("/")
+    async def root():
+        return {"ok": True}
+
+    return app
+
+
+async def measure(app: FastAPI, requests: int, clients: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def send(i: int):
+            async with semaphore:
+                response = await client.get("/", headers={"x-client": f"10.0.0.{i % clients}"})
+                assert response.status_code == 200
+
+        await asyncio.gather(*(send(i) for i in range(concurrency)))
+        started = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(requests)))
+        return (time.perf_counter() - started) / requests * 1e6
+
+
+async def main(requests: int, clients: int, concurrency: int, fake: bool):
+    redis = FakeRedis() if fake else Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    rate_limit.rate_limiter = RateLimiter(redis, sync_interval=settings.rate_limit_sync_interval)
+    baseline = None
+    for mode in ("none", "redis_per_check", "hybrid"):
+        us = await measure(build_app(mode, redis), requests, clients, concurrency)
+        baseline = baseline or us
+        result = {"mode": mode, "us_per_request": round(us, 1), "overhead_us": round(us - baseline, 1)}
+        if mode == "hybrid":
+            await rate_limit.rate_limiter.drain()
+            result.update(rate_limit.rate_limiter.stats())
+        print(result)
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--fake", action="store_true", help="Use fakeredis instead of a Redis server")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.clients, args.concurrency, args.fake))
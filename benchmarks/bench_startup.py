@@ -0,0 +1,111 @@
+'''
+Cold start: how long a fresh API process takes to import, start and answer.
+
+Each run is a new interpreter (``--child``) that imports main, builds the
+app with create_app, enters its lifespan (which creates the engines, Redis
+clients and executors), sends one request through httpx's ASGI transport and leaves
+the lifespan again; the parent reports the median of every phase over
+--runs processes, plus the whole process's wall time. With Redis down the
+startup still completes, the caches and rate limiter fall back as usual.
+
+A ``python -X importtime -c "import main"`` run attributes the import time
+to top-level packages (summed self time), and the SDKs that main no longer
+imports (Cloudinary, Pillow, uvicorn) are imported on their
+own to show what the lazy imports save.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5
+'''
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import orjson
+
+DEFERRED = ("cloudinary.uploader", "PIL.Image", "uvicorn")
+
+
+async def cold_start() -> dict:
+    started = time.perf_counter()
+    import main
+    app = main.create_app()
+    imported = time.perf_counter()
+
+    import httpx
+
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            response = await client.get("/")
+        answered = time.perf_counter()
+    stopped = time.perf_counter()
+    return {"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000,
+            "first_request_ms": (answered - ready) * 1000, "shutdown_ms": (stopped - answered) * 1000,
+            "status": response.status_code}
+
+
+def run_child() -> dict:
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child"], check=True,
+                            capture_output=True, timeout=120).stdout
+    result = orjson.loads(output.splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def import_profile(module: str, top: int) -> dict:
+    '''
+    Import time of a module by top-level package, from ``-X importtime``.
+
+    Returns:
+        dict: The total and the top packages' summed self time, in milliseconds.
+    '''
+
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], check=True,
+                            capture_output=True, text=True, timeout=120).stderr
+    packages = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        packages[name.strip().split(".")[0]] += int(self_us)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {"total_ms": round(sum(packages.values()) / 1000, 1),
+            "packages_ms": {name: round(us / 1000, 1) for name, us in ranked[:top]}}
+
+
+def deferred_imports() -> dict:
+    """Time to import each deferred SDK on top of main, in a fresh process each."""
+    timings = {}
+    for module in DEFERRED:
+        code = ("import time, main; started = time.perf_counter(); import " + module +
+                "; print((time.perf_counter() - started) * 1000)")
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                                timeout=120).stdout
+        timings[module] = round(float(output.splitlines()[-1]), 1)
+    return timings
+
+
+def main(runs: int, top: int) -> dict:
+    results = [run_child() for _ in range(runs)]
+    phases = ("process_ms", "import_ms", "startup_ms", "first_request_ms", "shutdown_ms")
+    return {"runs": runs, "median": {phase: round(statistics.median(r[phase] for r in results), 1)
+                                     for phase in phases},
+            "statuses": sorted({r["status"] for r in results}),
+            "import_main": import_profile("main", top), "deferred_ms": deferred_imports()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to time")
+    parser.add_argument("--top", type=int, default=12, help="packages listed in the import profile")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(orjson.dumps(asyncio.run(cold_start())).decode())
+    else:
+        print(orjson.dumps(main(args.runs, args.top), option=orjson.OPT_INDENT_2).decode())
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,6 +8,10 @@ class Settings(BaseSettings):
 
     Attributes:
         sqlalchemy_database_url (str): URL for the SQLAlchemy database connection.
+        sqlalchemy_async_database_url (str, optional): URL for the asyncio database connection.
+            Derived from sqlalchemy_database_url (asyncpg / aiosqlite driver) when not set.
+        sqlalchemy_replica_url (str, optional): URL of a streaming read replica used by read-only
+            endpoints. Reads go to the primary when not set.
         secret_key (str): Secret key for generating tokens.
         algorithm (str): Algorithm for token encryption.
         mail_username (str): Username for SMTP email server.
@@ -13,18 +19,70 @@ class Settings(BaseSettings):
         mail_from (str): Email address used as the sender for outgoing emails.
         mail_port (int): Port number for the SMTP email server.
         mail_server (str): SMTP email server address.
+        mail_pool_size (int, optional): SMTP sessions kept open per worker. Defaults to 2.
+        mail_batch_size (int, optional): Messages sent over one session checkout. Defaults to 50.
+        mail_keepalive (float, optional): Idle seconds after which a session is probed with NOOP
+            before reuse. Defaults to 10.
+        mail_idle_timeout (float, optional): Idle seconds after which a session is replaced. Defaults to 50.
+        mail_max_messages (int, optional): Messages after which a session is replaced. Defaults to 100.
+        db_pool_size (int, optional): Connections kept open per engine. Defaults to 5.
+        db_max_overflow (int, optional): Extra connections opened under burst load. Defaults to 10.
+        db_pool_timeout (float, optional): Seconds to wait for a free connection before failing. Defaults to 30.
+        db_pool_recycle (int, optional): Seconds after which a connection is replaced; -1 disables. Defaults to 1800.
+        db_pool_pre_ping (bool, optional): Test connections on checkout to drop ones broken by a
+            database restart. Defaults to True.
+        db_statement_timeout (int, optional): Default Postgres statement_timeout in milliseconds;
+            0 disables. Defaults to 30000.
+        db_slow_query_ms (float, optional): Statements taking at least this many milliseconds are logged with
+            their normalized SQL; 0 disables the log. Defaults to 200.
+        replica_max_lag (float, optional): Replication lag in seconds above which reads fall back to the
+            primary. Defaults to 5.
+        replica_sticky_seconds (float, optional): How long a user's reads stay on the primary after a write;
+            never shorter than replica_max_lag. Defaults to 10.
+        replica_check_interval (float, optional): Seconds between replica lag checks. Defaults to 1.
+        replica_check_timeout (float, optional): Seconds a lag check may take before the replica is
+            treated as down. Defaults to 1.
         redis_host (str, optional): Hostname or IP address of the Redis server. Defaults to 'localhost'.
         redis_port (int, optional): Port number of the Redis server. Defaults to 6379.
+        user_cache_ttl (int, optional): Lifetime of cached users in Redis, in seconds. Defaults to 900.
+        user_cache_local_size (int, optional): Maximum number of users in the in-process cache. Defaults to 1024.
+        user_cache_local_ttl (float, optional): Lifetime of users in the in-process cache, in seconds. Defaults to 30.
+        token_cache_size (int, optional): Maximum number of verified access tokens cached in process. Defaults to 4096.
+        password_hash_workers (int, optional): Threads hashing/verifying passwords; also the cap on concurrent
+            bcrypt operations per worker. Defaults to 2.
+        contacts_cache_ttl (int, optional): Lifetime of cached contact reads in Redis, in seconds. Defaults to 300.
+        jobs_concurrency (int, optional): Jobs a worker runs at once. Defaults to 20.
+        jobs_max_attempts (int, optional): Attempts before a job is moved to the dead-letter stream. Defaults to 5.
+        jobs_backoff_base (float, optional): Seconds before the first retry of a failed job; doubled on each
+            further retry. Defaults to 2.
+        jobs_backoff_max (float, optional): Upper bound of the retry delay in seconds. Defaults to 600.
+        jobs_claim_idle (float, optional): Seconds after which a job left pending by a crashed worker is
+            taken over by another one. Defaults to 300.
+        rate_limit_enabled (bool, optional): Enforce the rate limit policies. Defaults to True.
+        rate_limit_sync_interval (float, optional): Seconds between syncs of a local rate limit bucket with
+            Redis. Defaults to 1.
+        rate_limit_buckets (int, optional): Maximum number of rate limit buckets kept per worker. Defaults to 10000.
+        debug (bool, optional): Validate fast-path JSON responses against their schemas. Defaults to False.
+        ops_endpoints_enabled (bool, optional): Serve /metrics and the cache, database, job and rate limit
+            stats endpoints. Defaults to False.
+        ops_token (str, optional): Bearer token the ops endpoints require; without one they reject every request.
         postgres_db (str): PostgreSQL database name.
         postgres_user (str): PostgreSQL database user.
         postgres_password (str): PostgreSQL database password.
         postgres_port (int): PostgreSQL database port.
+        avatar_storage (str, optional): Where avatars are stored, "cloudinary" or "local". Defaults to "cloudinary".
+        avatar_max_bytes (int, optional): Largest accepted avatar upload in bytes. Defaults to 5 MiB.
+        avatar_local_dir (str, optional): Directory of the "local" avatar storage. Defaults to "static/avatars".
+        avatar_upload_workers (int, optional): Threads running avatar uploads. Defaults to 4.
+        avatar_process_workers (int, optional): Processes decoding and resizing avatars. Defaults to 2.
         cloudinary_name (str): Cloudinary account name.
         cloudinary_api_key (str): Cloudinary API key.
         cloudinary_api_secret (str): Cloudinary API secret.
     '''
     
     sqlalchemy_database_url: str
+    sqlalchemy_async_database_url: str | None = None
+    sqlalchemy_replica_url: str | None = None
     secret_key: str
     algorithm: str
     mail_username: str
@@ -32,12 +90,50 @@ class Settings(BaseSettings):
     mail_from: str
     mail_port: int
     mail_server: str
+    mail_pool_size: int = 2
+    mail_batch_size: int = 50
+    mail_keepalive: float = 10
+    mail_idle_timeout: float = 50
+    mail_max_messages: int = 100
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout: int = 30000
+    db_slow_query_ms: float = 200
+    replica_max_lag: float = 5
+    replica_sticky_seconds: float = 10
+    replica_check_interval: float = 1
+    replica_check_timeout: float = 1
     redis_host: str = 'localhost'
     redis_port: int = 6379
+    user_cache_ttl: int = 900
+    user_cache_local_size: int = 1024
+    user_cache_local_ttl: float = 30
+    token_cache_size: int = 4096
+    password_hash_workers: int = 2
+    contacts_cache_ttl: int = 300
+    jobs_concurrency: int = 20
+    jobs_max_attempts: int = 5
+    jobs_backoff_base: float = 2
+    jobs_backoff_max: float = 600
+    jobs_claim_idle: float = 300
+    rate_limit_enabled: bool = True
+    rate_limit_sync_interval: float = 1
+    rate_limit_buckets: int = 10000
+    debug: bool = False
+    ops_endpoints_enabled: bool = False
+    ops_token: str | None = None
     postgres_db: str
     postgres_user: str
     postgres_password: str
     postgres_port: int
+    avatar_storage: Literal["cloudinary", "local"] = "cloudinary"
+    avatar_max_bytes: int = 5 * 1024 * 1024
+    avatar_local_dir: str = "static/avatars"
+    avatar_upload_workers: int = 4
+    avatar_process_workers: int = 2
     cloudinary_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
@@ -1,26 +1,116 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Optional, Tuple
 
-from m14.conf.config import settings
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 
+from m14.conf.config import Settings, settings
+from m14.database.pool import InstrumentedAsyncPool
+from m14.database.queries import QueryMonitor
 
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    '''
+    Translate a synchronous database URL into its asyncio driver counterpart.
+
+    Args:
+        url (str): A SQLAlchemy URL such as ``postgresql+psycopg2://...`` or ``sqlite:///./test.db``.
+
+    Returns:
+        str: The same URL using the asyncpg / aiosqlite driver.
+    '''
+
+    sa_url = make_url(url)
+    driver = ASYNC_DRIVERS.get(sa_url.get_backend_name())
+    if driver is None or sa_url.drivername == driver:
+        return url
+    return sa_url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def engine_options(url: str, is_async: bool = False, app_settings: Settings = settings) -> dict:
+    '''
+    Build create_engine keyword arguments from the pool and timeout settings.
+
+    In-memory SQLite keeps SQLAlchemy's single-connection pool, and
+    statement_timeout is only sent to Postgres drivers.
+
+    Args:
+        url (str): The SQLAlchemy URL the engine is created for.
+        is_async (bool, optional): Whether the engine is an asyncio engine; those get an
+            InstrumentedAsyncPool. Defaults to False.
+        app_settings (Settings, optional): Where the pool and timeout settings come from. Defaults to settings.
+
+    Returns:
+        dict: Keyword arguments for create_engine / create_async_engine.
+    '''
+
+    sa_url = make_url(url)
+    options = {"pool_pre_ping": app_settings.db_pool_pre_ping, "pool_recycle": app_settings.db_pool_recycle}
+    if sa_url.get_backend_name() == "sqlite" and sa_url.database in (None, "", ":memory:"):
+        return options
+    options.update(pool_size=app_settings.db_pool_size, max_overflow=app_settings.db_max_overflow,
+                   pool_timeout=app_settings.db_pool_timeout)
+    if is_async:
+        options["poolclass"] = InstrumentedAsyncPool
+    if sa_url.get_backend_name() == "postgresql" and app_settings.db_statement_timeout:
+        timeout = str(app_settings.db_statement_timeout)
+        if sa_url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+# Used by the Alembic migrations.
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 
+# Unbound until an app's lifespan creates the engines (create_engines) and binds them, see main.use_engines.
+SessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+# Sessions on the optional streaming replica for read-only endpoints, see m14.database.replica.
+ReplicaSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+# Statement counts and timings per request, see QueryTimingMiddleware.
+query_monitor = QueryMonitor(slow_ms=settings.db_slow_query_ms)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
+def create_engines(app_settings: Settings = settings) -> Tuple[AsyncEngine, Optional[AsyncEngine]]:
     '''
-     Create a new database session.
+    Create the primary's engine and, when a replica is configured, the replica's.
+
+    Both are instrumented by query_monitor. Creating an engine opens no
+    connection; the pools fill on first use and are closed by dispose().
+
+    Args:
+        app_settings (Settings, optional): URLs and pool settings. Defaults to settings.
+
+    Returns:
+        Tuple[AsyncEngine, Optional[AsyncEngine]]: The primary's and the replica's engine (None if not configured).
+    '''
+
+    url = app_settings.sqlalchemy_async_database_url or to_async_url(app_settings.sqlalchemy_database_url)
+    engine = create_async_engine(url, **engine_options(url, is_async=True, app_settings=app_settings))
+    query_monitor.instrument(engine.sync_engine)
+    replica_engine = None
+    if app_settings.sqlalchemy_replica_url:
+        replica_url = to_async_url(app_settings.sqlalchemy_replica_url)
+        replica_engine = create_async_engine(replica_url,
+                                             **engine_options(replica_url, is_async=True, app_settings=app_settings))
+        query_monitor.instrument(replica_engine.sync_engine)
+    return engine, replica_engine
+
+
+async def get_db():
+    '''
+     Create a new asynchronous database session.
 
     Yields:
-        Session: The database session.
+        AsyncSession: The database session.
     '''
-    
-    db = SessionLocal()
-    try:
+
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
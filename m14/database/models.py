@@ -1,11 +1,32 @@
-from sqlalchemy import Column, Integer, String, func, ForeignKey, Boolean
+from datetime import date
+
+from sqlalchemy import Column, Integer, String, func, ForeignKey, Boolean, Index, DDL, event
+from sqlalchemy.sql import table, column
 from sqlalchemy.sql.sqltypes import DateTime, Date
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 
 Base = declarative_base()
 
 
+def birthday_key(date_of_birth):
+    """
+    Month and day of a date packed as an MMDD integer (e.g. 1 March -> 301).
+
+    Args:
+        date_of_birth (datetime.date | str, optional): The date (or ISO date string) to convert.
+
+    Returns:
+        int | None: The MMDD key, or None when no date is given.
+    """
+
+    if date_of_birth is None:
+        return None
+    if isinstance(date_of_birth, str):
+        date_of_birth = date.fromisoformat(date_of_birth)
+    return date_of_birth.month * 100 + date_of_birth.day
+
+
 class Contacts(Base):
     """
     SQLAlchemy model representing a table of contacts.
@@ -18,6 +39,9 @@ class Contacts(Base):
         phone_number (str): The phone number of the contact.
         date_of_birth (datetime.date, optional): The date of birth of the contact (nullable).
         nick (str, optional): The nickname of the contact (nullable, default is None).
+        birthday_key (int, optional): MMDD of date_of_birth, kept in sync on assignment and indexed with user_id.
+        version (int): Row version, incremented by SQLAlchemy on every UPDATE and checked in its WHERE clause.
+        updated_at (datetime, optional): The timestamp of the last change of the contact.
         user_id (int): The foreign key referencing the user to whom this contact belongs.
         user (relationship): Relationship to the User model representing the owner of this contact.
     """
@@ -30,9 +54,30 @@ class Contacts(Base):
     phone_number = Column(String, index=True, nullable=False)
     date_of_birth = Column(Date, nullable=True)
     nick = Column(String, nullable=True, default=None)
+    birthday_key = Column(Integer, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     user_id = Column("user_id", ForeignKey("users.id", ondelete="CASCADE"))
     user = relationship("User", backref="contacts")
 
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_birthday_key", "user_id", "birthday_key"),
+        Index("ix_contacts_first_name_trgm", "first_name", postgresql_using="gin",
+              postgresql_ops={"first_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_contacts_last_name_trgm", "last_name", postgresql_using="gin",
+              postgresql_ops={"last_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_contacts_email_trgm", "email", postgresql_using="gin",
+              postgresql_ops={"email": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+    @validates("date_of_birth")
+    def _sync_birthday_key(self, key, value):
+        self.birthday_key = birthday_key(value)
+        return value
+
 
 class User(Base):
     """
@@ -45,8 +90,9 @@ class User(Base):
         confirmed (bool): Flag indicating whether the user's email address is confirmed.
         password (str): The password of the user. Note: It's recommended to store passwords hashed for security reasons.
         created_at (datetime): The timestamp indicating when the user account was created.
-        avatar (str, optional): The URL or path to the user's avatar image (nullable).
+        avatar (str, optional): The URL of the user's avatar image, or the content hash of an uploaded one (nullable).
         refresh_token (str, optional): The refresh token associated with the user (nullable).
+        contacts_version (int): Incremented on every write to the user's contacts; backs the contacts list ETag.
     """
 
     __tablename__ = "users"
@@ -57,4 +103,32 @@ class User(Base):
     password = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=func.now())
     avatar = Column(String(255), nullable=True)
-    refresh_token = Column(String(255), nullable=True)
\ No newline at end of file
+    refresh_token = Column(String(255), nullable=True)
+    contacts_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+# Trigram FTS5 shadow table used for substring search on SQLite. It is an
+# external-content table kept in sync with contacts by triggers; on Postgres
+# the pg_trgm GIN indexes above serve the same ILIKE '%term%' predicates.
+contacts_fts = table("contacts_fts", column("rowid"), column("contacts_fts"))
+
+CONTACTS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+    "first_name, last_name, email, content='contacts', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+]
+
+for statement in CONTACTS_FTS_DDL:
+    event.listen(Contacts.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Contacts.__table__, "after_drop", DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect="sqlite"))
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
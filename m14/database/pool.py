@@ -0,0 +1,88 @@
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from m14.metrics import DB_POOL_IN_USE, DB_POOL_TIMEOUTS, DB_POOL_WAIT
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    '''
+    Async queue pool that records how long checkouts wait for a connection.
+
+    The wait covers queueing for a free connection and, while the pool is
+    below its size, opening a new one. Together with the in-use count it shows
+    whether pool_size / max_overflow are too small for the traffic.
+
+    Attributes:
+        waiting (int): Checkouts currently waiting for a connection.
+        checkouts (int): Completed checkouts.
+        timeouts (int): Checkouts that gave up after pool_timeout.
+        wait_total (float): Sum of checkout waits, in seconds.
+        wait_max (float): Longest checkout wait, in seconds.
+        wait_last (float): Most recent checkout wait, in seconds.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_last = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_last = waited
+        self.wait_max = max(self.wait_max, waited)
+        DB_POOL_WAIT.observe(waited)
+        DB_POOL_IN_USE.inc()
+        return connection
+
+    def _do_return_conn(self, record):
+        DB_POOL_IN_USE.dec()
+        super()._do_return_conn(record)
+
+    def stats(self) -> dict:
+        """Gauges and counters of the pool, with waits in milliseconds."""
+        return {
+            "size": self.size(),
+            "in_use": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "wait_last_ms": round(self.wait_last * 1000, 3),
+        }
+
+
+def pool_stats(pool) -> dict:
+    '''
+    Report the state of an engine's connection pool.
+
+    Args:
+        pool (Pool): The pool, e.g. ``engine.pool``.
+
+    Returns:
+        dict: InstrumentedAsyncPool.stats() for instrumented pools, otherwise SQLAlchemy's status line.
+    '''
+
+    if isinstance(pool, InstrumentedAsyncPool):
+        return pool.stats()
+    return {"status": pool.status()}
@@ -0,0 +1,186 @@
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from m14.metrics import DB_QUERY_LATENCY, DB_SLOW_QUERIES
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDERS = re.compile(r"\$\d+|%\(\w+\)s|(?<![:\w]):\w+|%s")
+LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    '''
+    Reduce a statement to its shape for grouping slow queries.
+
+    Literals and the placeholders of every driver become ``?``, IN lists of
+    any length become ``(?, ...)`` and whitespace is collapsed.
+
+    Args:
+        statement (str): The SQL sent to the driver.
+
+    Returns:
+        str: The normalized statement.
+    '''
+
+    statement = PLACEHOLDERS.sub("?", statement)
+    statement = LITERALS.sub("?", statement)
+    statement = LISTS.sub("(?, ...)", statement)
+    return SPACES.sub(" ", statement).strip()
+
+
+class QueryStats:
+    '''
+    SQL statements issued on behalf of one request.
+
+    Attributes:
+        count (int): Statements executed.
+        duration (float): Time spent in the driver, in seconds.
+        rows (int): Rows returned by queries or affected by DML.
+        slow (int): Statements slower than the slow-query threshold.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.slow = 0
+
+    def server_timing(self) -> str:
+        """Server-Timing entry for the request's database work."""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries, {self.rows} rows"'
+
+
+current_queries: ContextVar[Optional[QueryStats]] = ContextVar("current_queries", default=None)
+
+
+class QueryMonitor:
+    '''
+    Cursor-level hooks that attribute SQL statements to the current request.
+
+    Every statement is timed between before_cursor_execute and
+    after_cursor_execute and added to the QueryStats of the request it runs
+    for (see QueryTimingMiddleware). Statements slower than slow_ms are
+    printed with their normalized SQL. Totals per route are kept for metrics.
+
+    Attributes:
+        slow_ms (float): Threshold of the slow-query log in milliseconds; 0 disables it.
+        queries (int): Statements executed in this process.
+        duration (float): Their total time in seconds.
+        rows (int): Their total rows.
+        slow (int): Statements slower than slow_ms.
+        routes (Dict[str, dict]): Per route: requests, queries, rows, db seconds and the most queries of one request.
+    '''
+
+    def __init__(self, slow_ms: float = 200):
+        self.slow_ms = slow_ms
+        self.queries = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.routes: Dict[str, dict] = {}
+
+    def instrument(self, engine: Engine) -> None:
+        '''
+        Register the hooks on an engine; pass ``engine.sync_engine`` for an AsyncEngine.
+
+        Args:
+            engine (Engine): The engine.
+        '''
+
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    @staticmethod
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        # Kept on the execution context, which is discarded with the statement even if it fails.
+        context.m14_query_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - context.m14_query_started
+        if cursor.description is not None:
+            # The asyncio adapters buffer the whole result right after execute.
+            buffered = getattr(cursor, "_rows", None)
+            rows = len(buffered) if buffered is not None else max(cursor.rowcount, 0)
+        else:
+            rows = max(cursor.rowcount, 0)
+        self.queries += 1
+        self.duration += elapsed
+        self.rows += rows
+        DB_QUERY_LATENCY.observe(elapsed)
+        stats = current_queries.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+            stats.rows += rows
+        if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+            self.slow += 1
+            DB_SLOW_QUERIES.inc()
+            if stats is not None:
+                stats.slow += 1
+            print(f"Slow query ({elapsed * 1000:.1f} ms, {rows} rows): {normalize_sql(statement)}")
+
+    def record(self, route: str, stats: QueryStats) -> None:
+        """Add one finished request's statements to its route's totals."""
+        totals = self.routes.setdefault(route, {"requests": 0, "queries": 0, "rows": 0, "db_seconds": 0.0,
+                                                "max_queries": 0})
+        totals["requests"] += 1
+        totals["queries"] += stats.count
+        totals["rows"] += stats.rows
+        totals["db_seconds"] += stats.duration
+        totals["max_queries"] = max(totals["max_queries"], stats.count)
+
+    def stats(self) -> dict:
+        """Process totals and per-route averages."""
+        routes = {route: {**totals, "db_seconds": round(totals["db_seconds"], 6),
+                          "queries_per_request": round(totals["queries"] / totals["requests"], 2)}
+                  for route, totals in self.routes.items()}
+        return {"queries": self.queries, "db_seconds": round(self.duration, 6), "rows": self.rows,
+                "slow": self.slow, "slow_ms": self.slow_ms, "routes": routes}
+
+
+class QueryTimingMiddleware:
+    '''
+    ASGI middleware that collects the SQL statements of each request.
+
+    Adds a Server-Timing header with the request's database time, statement
+    and row count, plus its total time up to the response start, and records
+    the request under its route template once the response is sent.
+
+    Attributes:
+        app: The wrapped ASGI app.
+        monitor (QueryMonitor): Receives the per-request totals.
+    '''
+
+    def __init__(self, app, monitor: QueryMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = current_queries.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", f"{stats.server_timing()}, app;dur={total:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_queries.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                self.monitor.record(f"{scope['method']} {route.path}", stats)
@@ -0,0 +1,208 @@
+import asyncio
+import time
+
+from fastapi import Depends
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from m14.conf.config import settings
+from m14.database.db import SessionLocal
+from m14.database.models import User
+from m14.services.auth import auth_service
+
+# On a standby, replay_timestamp stops moving while the primary is idle, so a
+# replica that has replayed everything it received reports no lag.
+LAG_QUERIES = {
+    "postgresql": text("SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                       "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"),
+}
+NO_LAG_QUERY = text("SELECT 0")
+
+
+class ReplicaRouter:
+    '''
+    Chooses between the primary and a read replica for read-only requests.
+
+    A user's reads stay on the primary for sticky_seconds after each of their
+    writes (read-your-writes); the marks live in Redis so they hold across
+    workers. The replica's lag is checked at most every check_interval seconds
+    and reads fall back to the primary while it is above max_lag or the
+    replica cannot be reached.
+
+    Because sticky_seconds is never shorter than max_lag, a replica that is
+    healthy again once the mark expires already has the user's write, so reads
+    loaded from it cannot put pre-write data back into the contacts cache.
+
+    Attributes:
+        primary (async_sessionmaker): Sessions on the primary.
+        replica (async_sessionmaker, optional): Sessions on the replica; None routes everything to the primary.
+        redis (Redis): Async Redis client holding the sticky marks.
+        healthy (bool): Outcome of the last lag check.
+        lag (float, optional): Lag measured by the last check in seconds, None if it failed.
+        replica_reads (int): Reads sent to the replica.
+        sticky_reads (int): Reads kept on the primary after a write.
+        fallbacks (int): Reads sent to the primary because the replica lagged or was down.
+        errors (int): Redis errors; the affected reads go to the primary.
+    '''
+
+    def __init__(self, primary: async_sessionmaker, replica: async_sessionmaker | None, redis: Redis,
+                 max_lag: float = 5, sticky_seconds: float = 10, check_interval: float = 1,
+                 check_timeout: float = 1, prefix: str = "replica-sticky"):
+        self.primary = primary
+        self.replica = replica
+        self.redis = redis
+        self.max_lag = max_lag
+        self.sticky_seconds = max(sticky_seconds, max_lag)
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.prefix = prefix
+        self.healthy = False
+        self.lag = None
+        self.replica_reads = 0
+        self.sticky_reads = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self._checked_at = float("-inf")
+
+    def sticky_key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    async def mark_write(self, user_id: int) -> None:
+        '''
+        Keep the user's reads on the primary until the replica has caught up with a write.
+
+        Args:
+            user_id (int): The user who wrote.
+        '''
+
+        if self.replica is None:
+            return
+        try:
+            await self.redis.set(self.sticky_key(user_id), 1, px=int(self.sticky_seconds * 1000))
+        except RedisError as e:
+            self.errors += 1
+            print("Replica sticky mark failed:", e)
+
+    async def is_sticky(self, user_id: int) -> bool:
+        '''
+        Check whether the user wrote within the last sticky_seconds.
+
+        Args:
+            user_id (int): The reading user.
+
+        Returns:
+            bool: True if the user's reads must use the primary; also True when Redis is unreachable.
+        '''
+
+        try:
+            return bool(await self.redis.exists(self.sticky_key(user_id)))
+        except RedisError as e:
+            self.errors += 1
+            print("Replica sticky lookup failed:", e)
+            return True
+
+    async def measure_lag(self) -> float:
+        """Replication lag of the replica in seconds."""
+        async with self.replica() as db:
+            query = LAG_QUERIES.get(db.bind.dialect.name, NO_LAG_QUERY)
+            return float(await db.scalar(query) or 0)
+
+    async def replica_available(self) -> bool:
+        '''
+        Report whether the replica is reachable and within max_lag.
+
+        The lag is re-measured once check_interval has passed; requests arriving
+        while a check runs use the previous result.
+
+        Returns:
+            bool: True if reads may use the replica.
+        '''
+
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                self.lag = await asyncio.wait_for(self.measure_lag(), self.check_timeout)
+                self.healthy = self.lag <= self.max_lag
+                if not self.healthy:
+                    print(f"Read replica lagging by {self.lag:.1f}s, reading from the primary")
+            except (asyncio.TimeoutError, SQLAlchemyError, OSError) as e:
+                self.lag = None
+                self.healthy = False
+                print("Read replica unavailable:", e)
+        return self.healthy
+
+    def mark_down(self) -> None:
+        """Send reads to the primary until the next lag check."""
+        self.healthy = False
+        self._checked_at = time.monotonic()
+
+    async def sessionmaker_for(self, user_id: int) -> async_sessionmaker:
+        '''
+        Pick the sessionmaker a read-only request of the user should use.
+
+        Args:
+            user_id (int): The reading user.
+
+        Returns:
+            async_sessionmaker: The replica's, or the primary's when no replica is configured,
+            the user wrote recently, or the replica lags or is down.
+        '''
+
+        if self.replica is None:
+            return self.primary
+        if await self.is_sticky(user_id):
+            self.sticky_reads += 1
+            return self.primary
+        if not await self.replica_available():
+            self.fallbacks += 1
+            return self.primary
+        self.replica_reads += 1
+        return self.replica
+
+    def stats(self) -> dict:
+        """State of the replica and how reads were routed."""
+        return {
+            "configured": self.replica is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "replica_reads": self.replica_reads,
+            "sticky_reads": self.sticky_reads,
+            "fallbacks": self.fallbacks,
+            "errors": self.errors,
+        }
+
+
+# The replica's sessions and the Redis client are set by the app's lifespan, see main.use_engines / use_redis.
+replica_router = ReplicaRouter(SessionLocal, None, None,
+                               max_lag=settings.replica_max_lag, sticky_seconds=settings.replica_sticky_seconds,
+                               check_interval=settings.replica_check_interval,
+                               check_timeout=settings.replica_check_timeout)
+
+
+async def get_read_db(current_user: User = Depends(auth_service.get_current_user)):
+    '''
+     Create a database session for a read-only request.
+
+    Uses the read replica when replica_router allows it, otherwise the primary.
+    A lost replica connection sends later reads to the primary until the next
+    lag check.
+
+    Args:
+        current_user (User): The current authenticated user.
+
+    Yields:
+        AsyncSession: The database session.
+    '''
+
+    sessionmaker = await replica_router.sessionmaker_for(current_user.id)
+    async with sessionmaker() as db:
+        try:
+            yield db
+        except DBAPIError as e:
+            if sessionmaker is replica_router.replica and e.connection_invalidated:
+                replica_router.mark_down()
+            raise
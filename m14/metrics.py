@@ -0,0 +1,110 @@
+'''
+Prometheus metrics of the API and the job worker.
+
+With several uvicorn workers every process holds its own values, so a scrape
+would see whichever process answered. Set PROMETHEUS_MULTIPROC_DIR to an
+empty directory, shared by the API workers and m14.worker, before starting
+them; each process then writes its values to files there and /metrics merges
+the files of all processes:
+
+    rm -rf /tmp/m14-metrics && mkdir /tmp/m14-metrics
+    PROMETHEUS_MULTIPROC_DIR=/tmp/m14-metrics uvicorn --factory main:create_app --workers 4
+
+Without the variable /metrics reports the serving process only.
+/metrics is only served with OPS_ENDPOINTS_ENABLED set and answers scrapes that
+send ``Authorization: Bearer <OPS_TOKEN>``.
+'''
+import os
+import time
+from typing import Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10)
+CLIENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status code.",
+                        ["method", "route", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Time from request start to the last body chunk.",
+                         ["method", "route"], buckets=LATENCY_BUCKETS)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being served.", ["method"],
+                         multiprocess_mode="livesum")
+
+DB_POOL_WAIT = Histogram("db_pool_checkout_seconds", "Time waiting for a connection from the pool.",
+                         buckets=CLIENT_BUCKETS)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after pool_timeout.")
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections checked out of the pool.",
+                       multiprocess_mode="livesum")
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Time of one SQL statement in the driver.",
+                             buckets=CLIENT_BUCKETS)
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than db_slow_query_ms.")
+
+REDIS_LATENCY = Histogram("redis_command_duration_seconds", "Time of one Redis operation.",
+                          ["client", "operation"], buckets=CLIENT_BUCKETS)
+REDIS_ERRORS = Counter("redis_errors_total", "Redis operations that failed.", ["client", "operation"])
+
+SMTP_CONNECT_LATENCY = Histogram("smtp_connect_duration_seconds", "Time to open and log in an SMTP session.",
+                                 buckets=CLIENT_BUCKETS)
+SMTP_SEND_LATENCY = Histogram("smtp_send_duration_seconds", "Time to send one message over an open session.",
+                              buckets=CLIENT_BUCKETS)
+SMTP_MESSAGES = Counter("smtp_messages_total", "Messages handed to the SMTP server.", ["result"])
+
+
+def render() -> Tuple[bytes, str]:
+    '''
+    Render every metric in the Prometheus text format.
+
+    Returns:
+        Tuple[bytes, str]: The body and its content type.
+    '''
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this process's live gauges from the multiprocess directory; call when the process exits."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    '''
+    ASGI middleware recording latency, status codes and in-flight requests per route.
+
+    Requests are labelled with the route template (``/api/contacts/{contact_id}``),
+    not the raw path, and requests that match no route share the "unmatched"
+    label, which keeps the number of series bounded.
+    '''
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_PROGRESS.labels(method).dec()
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            HTTP_LATENCY.labels(method, path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, path, str(status)).inc()
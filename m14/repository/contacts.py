@@ -1,59 +1,183 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, extract
-
-from typing import List
-from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete, or_, and_, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+from datetime import date, datetime, timedelta
+from calendar import isleap
+import base64
+import json
 
 from m14.database.models import User
-from m14.database.models import Contacts
-from m14.schemas import ContactsIn
+from m14.database.models import Contacts, contacts_fts, birthday_key
+from m14.schemas import ContactsIn, ContactsPatch
 
 
-async def upcoming_birthdays( user:User, db: Session) -> List[Contacts]:
-    """
-    Retrieves upcoming birthdays within the next 7 days for contacts.
+SORT_KEYS = {
+    "id": Contacts.id,
+    "first_name": Contacts.first_name,
+    "last_name": Contacts.last_name,
+    "email": Contacts.email,
+}
+
+
+# ContactsOut fields, in ContactsOut order, for queries that skip building ORM objects.
+CONTACT_COLUMNS = (Contacts.first_name, Contacts.last_name, Contacts.email, Contacts.phone_number,
+                   Contacts.date_of_birth, Contacts.nick, Contacts.id)
+
+
+def _select_contacts(rows: bool):
+    return select(*CONTACT_COLUMNS) if rows else select(Contacts)
+
+
+async def _fetch_contacts(stmt, rows: bool, db: AsyncSession):
+    if rows:
+        return (await db.execute(stmt)).all()
+    return (await db.scalars(stmt)).all()
+
+
+async def _bump_contacts_version(user: User, db: AsyncSession) -> None:
+    # Runs inside the caller's transaction, so the collection ETag changes
+    # exactly when the contacts write commits.
+    await db.execute(update(User).where(User.id == user.id).values(contacts_version=User.contacts_version + 1))
+
+
+def encode_cursor(order_by: str, contact: Contacts) -> str:
+    '''
+    Encodes the position after the given contact into an opaque cursor.
+
+    Args:
+        order_by (str): The sort key the page was ordered by.
+        contact (Contacts): The last contact of the current page.
+
+    Returns:
+        str: A URL-safe cursor string.
+    '''
+
+    position = {"k": order_by, "v": getattr(contact, order_by), "id": contact.id}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str) -> dict:
+    '''
+    Decodes a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): The opaque cursor received from the client.
+        order_by (str): The sort key requested for this page.
+
+    Returns:
+        dict: The position with the sort value ("v") and contact id ("id").
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort key.
+    '''
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position["id"] = int(position["id"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    if position.get("k") != order_by:
+        raise ValueError("Cursor does not match the requested ordering")
+    return position
+
+
+def _search_filter(search: str, db: AsyncSession):
+    '''
+    Builds the substring search predicate for the session's database.
+
+    On SQLite terms of three or more characters are matched through the
+    trigram FTS5 table ``contacts_fts``; everywhere else (and for shorter
+    terms) an escaped ILIKE '%term%' is used, which Postgres serves from the
+    pg_trgm GIN indexes on first_name, last_name and email.
+
+    Args:
+        search (str): The keyword to search for.
+        db (AsyncSession): The database session the query will run on.
+
+    Returns:
+        ColumnElement: The WHERE clause matching contacts that contain the keyword.
+    '''
+
+    if db.get_bind().dialect.name == "sqlite" and len(search) >= 3:
+        phrase = '"' + search.replace('"', '""') + '"'
+        matches = select(contacts_fts.c.rowid).where(contacts_fts.c.contacts_fts.op("MATCH")(phrase))
+        return Contacts.id.in_(matches)
+
+    pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return or_(
+        Contacts.first_name.ilike(pattern, escape="\\"),
+        Contacts.last_name.ilike(pattern, escape="\\"),
+        Contacts.email.ilike(pattern, escape="\\")
+    )
+
+
+def birthday_key_ranges(today: date, days: int) -> List[Tuple[int, int]]:
+    '''
+    Computes the inclusive MMDD ranges covering the next ``days`` days.
+
+    Windows that cross the year end are split in two. In non-leap years a
+    29 February birthday is celebrated on 28 February, so a window ending on
+    28 February also covers key 229.
 
     Args:
-        db (Session): The database session to query.
+        today (date): First day of the window.
+        days (int): Number of days after today to include.
 
     Returns:
-        List[Contacts]: A list of contacts whose birthdays fall within the next 7 days.
+        List[Tuple[int, int]]: One or two (low, high) MMDD ranges.
+    '''
+
+    if days >= 365:
+        return [(birthday_key(date(2000, 1, 1)), birthday_key(date(2000, 12, 31)))]
+    end_date = today + timedelta(days=days)
+    start_key, end_key = birthday_key(today), birthday_key(end_date)
+    if end_key == 228 and not isleap(end_date.year):
+        end_key = 229
+    if start_key <= end_key:
+        return [(start_key, end_key)]
+    return [(start_key, 1231), (101, end_key)]
+
+
+async def upcoming_birthdays( user:User, db: AsyncSession, days: int = 7, rows: bool = False) -> List[Contacts]:
     """
+    Retrieves the user's contacts with birthdays within the next days.
+
+    Filters on the indexed (user_id, birthday_key) pair and orders the
+    contacts by how soon their birthday comes up.
+
+    Args:
+        user (User): The user whose contacts are being retrieved.
+        db (AsyncSession): The database session to query.
+        days (int, optional): Length of the window in days. Defaults to 7.
+        rows (bool, optional): Return CONTACT_COLUMNS rows instead of ORM objects. Defaults to False.
 
+    Returns:
+        List[Contacts]: A list of contacts whose birthdays fall within the window.
+    """
 
     today = datetime.now().date()
-    end_date = today + timedelta(days=7)
-
-    if today.month == end_date.month:
-        contacts = db.query(Contacts).filter(
-            extract('month', Contacts.date_of_birth) == today.month,
-            extract('day', Contacts.date_of_birth) >= today.day,
-            extract('day', Contacts.date_of_birth) <= end_date.day
-        ).all()
-    else:
-        contacts = db.query(Contacts).filter(
-            or_(
-                and_(
-                    extract('month', Contacts.date_of_birth) == today.month,
-                    extract('day', Contacts.date_of_birth) >= today.day
-                ),
-                and_(
-                    extract('month', Contacts.date_of_birth) == end_date.month,
-                    extract('day', Contacts.date_of_birth) <= end_date.day
-                )
-            )
-        ).all()
-    return contacts
-
-
-async def create_contact(body: ContactsIn, user:User, db: Session) -> Contacts:
+    ranges = birthday_key_ranges(today, days)
+    start_key = ranges[0][0]
+    stmt = _select_contacts(rows).where(
+        Contacts.user_id == user.id,
+        or_(*(Contacts.birthday_key.between(low, high) for low, high in ranges))
+    ).order_by(case((Contacts.birthday_key < start_key, 1), else_=0), Contacts.birthday_key)
+    return await _fetch_contacts(stmt, rows, db)
+
+
+async def create_contact(body: ContactsIn, user:User, db: AsyncSession) -> Contacts:
     '''
     Creates a new contact for the specified user.
 
     Args:
         body (ContactsIn): The contact details to create.
         user (User): The user for whom the contact is being created.
-        db (Session): The database session to use.
+        db (AsyncSession): The database session to use.
 
     Returns:
         Contacts: The newly created contact.
@@ -69,12 +193,64 @@ async def create_contact(body: ContactsIn, user:User, db: Session) -> Contacts:
         user_id=user.id
     )
     db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    await _bump_contacts_version(user, db)
+    await db.commit()
+    await db.refresh(contact)
     return contact
 
 
-async def get_contacts(skip: int, limit: int, user:User, db: Session) -> List[Contacts]:
+async def create_contacts(bodies: List[ContactsIn], user: User, db: AsyncSession) -> List[Optional[str]]:
+    '''
+    Creates many contacts for the specified user with multi-row INSERTs.
+
+    Emails that already exist (or repeat within the batch) are rejected up
+    front with one SELECT. If a concurrent writer still causes a conflict the
+    batch is retried row by row so only the offending rows fail.
+
+    Args:
+        bodies (List[ContactsIn]): The validated contact details to create.
+        user (User): The user for whom the contacts are being created.
+        db (AsyncSession): The database session to use.
+
+    Returns:
+        List[Optional[str]]: For each body, None if it was inserted or the reason it was rejected.
+    '''
+
+    results: List[Optional[str]] = [None] * len(bodies)
+    emails = [body.email for body in bodies]
+    existing = set((await db.scalars(select(Contacts.email).where(Contacts.email.in_(emails)))).all())
+    seen = set()
+    rows = []
+    for index, body in enumerate(bodies):
+        if body.email in existing:
+            results[index] = "Contact with this email already exists"
+        elif body.email in seen:
+            results[index] = "Duplicate email in file"
+        else:
+            seen.add(body.email)
+            rows.append((index, {**body.model_dump(), "birthday_key": birthday_key(body.date_of_birth),
+                                 "user_id": user.id}))
+    if not rows:
+        return results
+
+    try:
+        await _bump_contacts_version(user, db)
+        await db.execute(insert(Contacts), [values for _, values in rows])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        for index, values in rows:
+            try:
+                await _bump_contacts_version(user, db)
+                await db.execute(insert(Contacts), [values])
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+                results[index] = "Contact with this email already exists"
+    return results
+
+
+async def get_contacts(skip: int, limit: int, user:User, db: AsyncSession, rows: bool = False) -> List[Contacts]:
     '''
     Retrieves a list of contacts for the specified user with pagination.
 
@@ -82,16 +258,18 @@ async def get_contacts(skip: int, limit: int, user:User, db: Session) -> List[Co
         skip (int): The number of contacts to skip.
         limit (int): The maximum number of contacts to retrieve.
         user (User): The user whose contacts are being retrieved.
-        db (Session): The database session to query.
+        db (AsyncSession): The database session to query.
+        rows (bool, optional): Return CONTACT_COLUMNS rows instead of ORM objects. Defaults to False.
 
     Returns:
         List[Contacts]: A list of contacts belonging to the specified user
     '''
 
-    return db.query(Contacts).filter(Contacts.user_id == user.id).offset(skip).limit(limit).all()
+    stmt = _select_contacts(rows).where(Contacts.user_id == user.id).offset(skip).limit(limit)
+    return await _fetch_contacts(stmt, rows, db)
 
 
-async def search_contacts(search: str, skip: int, limit: int, current_user: User, db: Session):
+async def search_contacts(search: str, skip: int, limit: int, current_user: User, db: AsyncSession, rows: bool = False):
     '''
     Searches contacts based on the keyword in first name, last name, and email with pagination.
 
@@ -99,44 +277,157 @@ async def search_contacts(search: str, skip: int, limit: int, current_user: User
         search (str): The keyword to search for.
         skip (int): Number of contacts to skip at the beginning of the list.
         limit (int): Maximum number of contacts to retrieve.
-        db (Session): The database session to use for queries.
+        db (AsyncSession): The database session to use for queries.
+        rows (bool, optional): Return CONTACT_COLUMNS rows instead of ORM objects. Defaults to False.
 
     Returns:
         List[Contacts]: A list of contacts matching the search criteria,
         starting from the contact at index 'skip' and retrieving at most 'limit' contacts.
     '''
     
-    query = db.query(Contacts).filter(Contacts.user_id == current_user.id)
+    stmt = _select_contacts(rows).where(Contacts.user_id == current_user.id)
     if search:
-        print("Applying search filters")
-        query = query.filter(
-            or_(
-                Contacts.first_name.ilike(f"%{search}%"),
-                Contacts.last_name.ilike(f"%{search}%"),
-                Contacts.email.ilike(f"%{search}%")
-            )
-        )
-    contacts = query.offset(skip).limit(limit).all()
-    return contacts
+        stmt = stmt.where(_search_filter(search, db))
+    return await _fetch_contacts(stmt.offset(skip).limit(limit), rows, db)
 
 
-async def get_contact(contact_id: int, user:User, db: Session) -> Contacts:
+async def get_contacts_page(cursor: str | None, limit: int, user: User, db: AsyncSession,
+                            search: str | None = None, order_by: str = "id",
+                            rows: bool = False) -> Tuple[List[Contacts], str | None]:
+    '''
+    Retrieves one keyset-paginated page of contacts for the specified user.
+
+    Seeks past the position stored in the cursor on (sort key, id) instead of
+    skipping rows, so every page costs the same regardless of its depth.
+
+    Args:
+        cursor (str | None): Cursor returned with the previous page, None or empty for the first page.
+        limit (int): Maximum number of contacts to retrieve.
+        user (User): The user whose contacts are being retrieved.
+        db (AsyncSession): The database session to query.
+        search (str, optional): Keyword to search for in first name, last name and email.
+        order_by (str, optional): Sort key, one of SORT_KEYS. Defaults to "id".
+        rows (bool, optional): Return CONTACT_COLUMNS rows instead of ORM objects. Defaults to False.
+
+    Returns:
+        Tuple[List[Contacts], str | None]: The contacts on the page and the cursor
+        for the next page, or None when this is the last page.
+
+    Raises:
+        ValueError: If the cursor is invalid or the sort key is unknown.
+    '''
+
+    if order_by not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {order_by}")
+    column = SORT_KEYS[order_by]
+    stmt = _select_contacts(rows).where(Contacts.user_id == user.id)
+    if search:
+        stmt = stmt.where(_search_filter(search, db))
+    if cursor:
+        position = decode_cursor(cursor, order_by)
+        if column is Contacts.id:
+            stmt = stmt.where(Contacts.id > position["id"])
+        else:
+            stmt = stmt.where(or_(
+                column > position["v"],
+                and_(column == position["v"], Contacts.id > position["id"])
+            ))
+    if column is Contacts.id:
+        stmt = stmt.order_by(Contacts.id)
+    else:
+        stmt = stmt.order_by(column, Contacts.id)
+
+    contacts = await _fetch_contacts(stmt.limit(limit + 1), rows, db)
+    next_cursor = None
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        next_cursor = encode_cursor(order_by, contacts[-1])
+    return contacts, next_cursor
+
+
+async def stream_contacts(user: User, db: AsyncSession, batch_size: int = 1000) -> AsyncIterator[Sequence]:
+    '''
+    Streams all contacts of the specified user in batches through a server-side cursor.
+
+    Plain column rows are selected instead of ORM objects so nothing accumulates
+    in the session's identity map, and yield_per makes the driver fetch
+    batch_size rows at a time instead of buffering the whole result.
+
+    Args:
+        user (User): The user whose contacts are being exported.
+        db (AsyncSession): The database session to query.
+        batch_size (int, optional): Rows fetched per round trip. Defaults to 1000.
+
+    Yields:
+        Sequence[Row]: Batches of rows with the CONTACT_COLUMNS attributes, ordered by id.
+    '''
+
+    stmt = (select(*CONTACT_COLUMNS).where(Contacts.user_id == user.id).order_by(Contacts.id)
+            .execution_options(yield_per=batch_size))
+    result = await db.stream(stmt)
+    try:
+        async for partition in result.partitions():
+            yield partition
+    finally:
+        await result.close()
+
+
+async def get_contact(contact_id: int, user:User, db: AsyncSession) -> Contacts:
     '''
     Retrieves the contact with the specified ID for the given user.
 
     Args:
         contact_id (int): The ID of the contact to retrieve.
         user (User): The user whose contact is being retrieved.
-        db (Session): The database session to use for queries.
+        db (AsyncSession): The database session to use for queries.
 
     Returns:
         Contacts: The contact belonging to the specified user with the given ID.
     '''
     
-    return db.query(Contacts).filter(and_(Contacts.id == contact_id, Contacts.user_id == user.id)).first()
+    contacts = await db.scalars(select(Contacts).where(and_(Contacts.id == contact_id, Contacts.user_id == user.id)))
+    return contacts.first()
+
+
+async def get_contact_version(contact_id: int, user: User, db: AsyncSession) -> int | None:
+    '''
+    Retrieves only the row version of a contact, for conditional requests.
+
+    Args:
+        contact_id (int): The ID of the contact.
+        user (User): The user who owns the contact.
+        db (AsyncSession): The database session to use for queries.
+
+    Returns:
+        int | None: The contact's version, or None if it does not exist.
+    '''
+
+    stmt = select(Contacts.version).where(Contacts.id == contact_id, Contacts.user_id == user.id)
+    return await db.scalar(stmt)
 
 
-async def update_contact(contact_id: int, body: ContactsIn,  user:User, db: Session) -> Contacts | None:
+async def get_contacts_version(user: User, db: AsyncSession) -> int:
+    '''
+    Retrieves the version of the user's whole contact collection, for conditional requests.
+
+    Args:
+        user (User): The user whose contacts are being checked.
+        db (AsyncSession): The database session to use for queries.
+
+    Returns:
+        int: The user's contacts_version, bumped on every write to their contacts.
+    '''
+
+    return await db.scalar(select(User.contacts_version).where(User.id == user.id)) or 0
+
+
+def _check_version(contact: Contacts, version: int | None) -> None:
+    if version is not None and contact.version != version:
+        raise StaleDataError(f"Contact {contact.id} is at version {contact.version}, not {version}")
+
+
+async def update_contact(contact_id: int, body: ContactsIn,  user:User, db: AsyncSession,
+                         version: int | None = None) -> Contacts | None:
     '''
     Updates an existing contact for the specified user.
 
@@ -144,15 +435,21 @@ async def update_contact(contact_id: int, body: ContactsIn,  user:User, db: Sess
         contact_id (int): The ID of the contact to update.
         body (ContactsIn): The updated contact details.
         user (User): The user who owns the contact being updated.
-        db (Session): The database session to use for queries.
+        db (AsyncSession): The database session to use for queries.
+        version (int, optional): The version the caller last saw; None skips the check.
 
     Returns:
         Union[Contacts, None]: The updated contact if found and updated successfully,
         otherwise None.
+
+    Raises:
+        StaleDataError: If the contact is not at the expected version, or was
+            changed concurrently before the UPDATE ran.
     '''
 
-    contact = db.query(Contacts).filter(and_(Contacts.id == contact_id, Contacts.user_id == user.id)).first()
+    contact = await get_contact(contact_id, user, db)
     if contact:
+        _check_version(contact, version)
         if body.first_name:
             contact.first_name = body.first_name
         if body.last_name:
@@ -165,26 +462,159 @@ async def update_contact(contact_id: int, body: ContactsIn,  user:User, db: Sess
             contact.date_of_birth = body.date_of_birth
         if body.nick is not None:
             contact.nick = body.nick
-        db.commit()
+        await _bump_contacts_version(user, db)
+        try:
+            await db.commit()
+        except StaleDataError:
+            await db.rollback()
+            raise
         return contact
 
 
-async def remove_contact(contact_id: int, user: User, db: Session) -> Contacts | None:
+async def remove_contact(contact_id: int, user: User, db: AsyncSession,
+                         version: int | None = None) -> Contacts | None:
     '''
        Removes an existing contact for the specified user.
 
     Args:
         contact_id (int): The ID of the contact to remove.
         user (User): The user who owns the contact.
-        db (Session): The database session to use for queries.
+        db (AsyncSession): The database session to use for queries.
+        version (int, optional): The version the caller last saw; None skips the check.
 
     Returns:
         Union[Contacts, None]: The removed contact if found and successfully deleted,
         otherwise None.
+
+    Raises:
+        StaleDataError: If the contact is not at the expected version, or was
+            changed concurrently before the DELETE ran.
     '''
     
-    contact = db.query(Contacts).filter(and_(Contacts.id == contact_id, Contacts.user_id == user.id)).first()
+    contact = await get_contact(contact_id, user, db)
     if contact:
-        db.delete(contact)
-        db.commit()
+        _check_version(contact, version)
+        await db.delete(contact)
+        await _bump_contacts_version(user, db)
+        try:
+            await db.commit()
+        except StaleDataError:
+            await db.rollback()
+            raise
     return contact
+
+
+async def get_contacts_by_ids(ids: List[int], user: User, db: AsyncSession) -> Dict[int, Contacts]:
+    '''
+    Retrieves many contacts of the specified user with a single SELECT ... WHERE id IN (...).
+
+    Args:
+        ids (List[int]): The IDs of the contacts to retrieve.
+        user (User): The user who owns the contacts.
+        db (AsyncSession): The database session to query.
+
+    Returns:
+        Dict[int, Contacts]: The contacts found, by ID. IDs of missing or foreign contacts are absent.
+    '''
+
+    stmt = select(Contacts).where(Contacts.user_id == user.id, Contacts.id.in_(set(ids)))
+    contacts = (await db.scalars(stmt)).all()
+    return {contact.id: contact for contact in contacts}
+
+
+async def update_contacts(patches: List[ContactsPatch], user: User, db: AsyncSession) -> List[Union[Contacts, str, None]]:
+    '''
+    Applies many partial updates for the specified user in one transaction.
+
+    The contacts and any clashing emails are loaded with one SELECT each and
+    the accepted patches are written with a single ORM bulk UPDATE by primary key,
+    which also checks and increments each contact's version.
+
+    Args:
+        patches (List[ContactsPatch]): The patches to apply; only fields that were sent are changed.
+        user (User): The user who owns the contacts.
+        db (AsyncSession): The database session to use.
+
+    Returns:
+        List[Union[Contacts, str, None]]: For each patch, the updated contact, None if the
+        contact was not found, or the reason the patch was rejected.
+    '''
+
+    contacts = await get_contacts_by_ids([patch.id for patch in patches], user, db)
+    emails = [patch.email for patch in patches if patch.email is not None]
+    owners = {}
+    if emails:
+        owners = dict((await db.execute(select(Contacts.email, Contacts.id).where(Contacts.email.in_(emails)))).all())
+
+    results: List[Union[Contacts, str, None]] = [None] * len(patches)
+    rows, seen_ids, seen_emails = [], set(), set()
+    for index, patch in enumerate(patches):
+        contact = contacts.get(patch.id)
+        if contact is None:
+            continue
+        values = patch.model_dump(exclude_unset=True, exclude={"id", "version"})
+        if patch.id in seen_ids:
+            results[index] = "Duplicate id in batch"
+        elif patch.version is not None and patch.version != contact.version:
+            results[index] = "Contact has been modified"
+        elif "email" in values and owners.get(values["email"], patch.id) != patch.id:
+            results[index] = "Contact with this email already exists"
+        elif "email" in values and values["email"] in seen_emails:
+            results[index] = "Duplicate email in batch"
+        else:
+            seen_ids.add(patch.id)
+            if "email" in values:
+                seen_emails.add(values["email"])
+            if "date_of_birth" in values:
+                values["birthday_key"] = birthday_key(values["date_of_birth"])
+            results[index] = contact
+            if values:
+                rows.append((contact, values))
+    if not rows:
+        return results
+
+    try:
+        await _bump_contacts_version(user, db)
+        # No WHERE besides the primary key and version: SQLAlchemy only checks the
+        # matched row count, and so only raises StaleDataError, for plain bulk
+        # UPDATEs by primary key. The contacts were loaded for this user above.
+        await db.execute(update(Contacts),
+                         [{"id": contact.id, "version": contact.version, **values} for contact, values in rows],
+                         execution_options={"synchronize_session": None})
+        await db.commit()
+    except (IntegrityError, StaleDataError) as e:
+        await db.rollback()
+        error = "Contact has been modified" if isinstance(e, StaleDataError) else "Contact with this email already exists"
+        return [error if isinstance(result, Contacts) else result for result in results]
+    for contact, values in rows:
+        for key, value in values.items():
+            set_committed_value(contact, key, value)
+        set_committed_value(contact, "version", contact.version + 1)
+    return results
+
+
+async def remove_contacts(ids: List[int], user: User, db: AsyncSession) -> Dict[int, Contacts]:
+    '''
+    Removes many contacts of the specified user with a single DELETE ... RETURNING.
+
+    The user's row is locked by the version bump before the contacts, in the
+    same order as the other writers, so concurrent batches cannot deadlock.
+
+    Args:
+        ids (List[int]): The IDs of the contacts to remove.
+        user (User): The user who owns the contacts.
+        db (AsyncSession): The database session to use.
+
+    Returns:
+        Dict[int, Contacts]: The removed contacts, by ID.
+    '''
+
+    stmt = (delete(Contacts).where(Contacts.user_id == user.id, Contacts.id.in_(set(ids)))
+            .returning(Contacts))
+    await _bump_contacts_version(user, db)
+    contacts = (await db.scalars(stmt)).all()
+    if contacts:
+        await db.commit()
+    else:
+        await db.rollback()
+    return {contact.id: contact for contact in contacts}
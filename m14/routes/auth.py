@@ -1,31 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, status, Security
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.requests import Request
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from m14.database.db import get_db
 from m14.schemas import UserIn, UserOut, TokenModel, RequestEmail
 from m14.repository import users as repository_users
 from m14.services.auth import auth_service
-from m14.services.email_service import send_email
+from m14.services.jobs import job_queue
+from m14.services.rate_limit import AUTH_EMAIL, LOGIN, rate_limit
 
 
 router = APIRouter(prefix='/auth', tags=["auth"])
 security = HTTPBearer()
 
 
-@router.post("/signup", response_model=UserOut, status_code=status.HTTP_201_CREATED)
+@router.post("/signup", response_model=UserOut, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(rate_limit(AUTH_EMAIL))])
 
-async def signup(body: UserIn, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserIn, request: Request, db: AsyncSession = Depends(get_db)):
     '''
     Handles POST request to the "/signup" endpoint, creating a new user in the system.
 
+    The confirmation email is queued as a "send_email" job for m14.worker
+    once the user is saved.
+
     Args:
         body (UserIn): Input data for creating the user.
-        background_tasks (BackgroundTasks): Background tasks to execute, e.g., sending emails.
         request (Request): The request object.
 
-        db (Session, optional): The database session.
+        db (AsyncSession, optional): The database session.
 
     Returns:
         UserOut: Data of the newly created user.
@@ -37,29 +42,29 @@ async def signup(body: UserIn, background_tasks: BackgroundTasks, request: Reque
     exist_user = await repository_users.get_user_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
-
+    body.password = await auth_service.get_password_hash(body.password)
     try:
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        new_user = await repository_users.create_user(body, db)
     except Exception as e:
         print("Error while saving user to database:", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="Error while saving user to database")
+    try:
+        await job_queue.enqueue("send_email", email=new_user.email, username=new_user.username,
+                                host=str(request.base_url))
+    except RedisError as e:
+        print("Confirmation email not queued:", e)
     return UserOut(id=new_user.id, username=new_user.username, email=new_user.email)
     
 
-@router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@router.post("/login", response_model=TokenModel, dependencies=[Depends(rate_limit(LOGIN))])
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     '''
     Handles the login process for a existing users.
 
     Args:
         body (OAuth2PasswordRequestForm): The credentials used for authentication.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         TokenModel: The access and refresh tokens upon successful login.
@@ -73,7 +78,7 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password(body.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
 
     access_token = await auth_service.create_access_token(data={"sub": user.email})
@@ -83,13 +88,13 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(get_db)):
     '''
     Refreshes the access token using the refresh token for authenticated users.
 
     Args:
         credentials (HTTPAuthorizationCredentials): The HTTP authorization credentials containing the refresh token. 
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         TokenModel: The new access and refresh tokens.
@@ -112,13 +117,13 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(sec
 
 
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     '''
     Confirm the email address associated with the provided token.
 
     Args:
         token (str): The verification token.
-        db (Session, optional): The database session.
+        db (AsyncSession, optional): The database session.
 
     Returns:
         dict: A message indicating the status of email confirmation.
@@ -134,24 +139,26 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     await repository_users.confirm_email(email, db)
+    await auth_service.user_cache.invalidate(email)
     return {"message": "Email confirmed"}
 
 
-@router.post('/request_email')
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+@router.post('/request_email', dependencies=[Depends(rate_limit(AUTH_EMAIL))])
+async def request_email(body: RequestEmail, request: Request, db: AsyncSession = Depends(get_db)):
     '''
     Request confirmation email for the provided email address.
 
     Args:
         body (RequestEmail): The email address for which confirmation is requested.
-        background_tasks (BackgroundTasks): Background tasks to execute, e.g., sending emails.
         request (Request): The request object.
-        db (Session, optional): The database session.
+        db (AsyncSession, optional): The database session.
 
     Returns:
         dict: A message indicating the status of the email confirmation request.
 
+    Raises:
+        HTTPException: 503 if the email job cannot be queued.
+
     '''
     
     user = await repository_users.get_user_by_email(body.email, db)
@@ -159,5 +166,9 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(send_email, user.email, user.username, request.base_url)
+        try:
+            await job_queue.enqueue("send_email", email=user.email, username=user.username, host=str(request.base_url))
+        except RedisError as e:
+            print("Confirmation email not queued:", e)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Email service unavailable")
     return {"message": "Check your email for confirmation."}
\ No newline at end of file
@@ -1,17 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi import APIRouter, HTTPException, Depends, status, Query, UploadFile, File, BackgroundTasks, Header, Request, Response
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, ORJSONResponse
 from fastapi.openapi.docs import get_swagger_ui_html
-from fastapi_limiter.depends import RateLimiter
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Literal, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
 from m14.database.db import get_db
-from m14.schemas import ContactsIn, ContactsOut
+from m14.database.replica import get_read_db, replica_router
+from m14.schemas import (ContactsIn, ContactsOut, ContactsPage, ImportJobOut, ContactsIds, ContactsPatchBatch,
+                         ContactsBatchResult)
 from m14.repository import contacts as repository_contacts
-from m14.repository.contacts import upcoming_birthdays
 from m14.database.models import User
 from m14.services.auth import auth_service
+from m14.services import imports, exports, contacts_cache
+from m14.services.contacts_io import detect_format, FORMATS, MEDIA_TYPES
+from m14.services.serialization import contacts_response
+from m14.services.rate_limit import CREATE_CONTACT, SEARCH, rate_limit
+from m14.services.etags import contact_etag, collection_etag, etag_matches, not_modified, if_match_version
 
 
 router = APIRouter(prefix='/contacts')
@@ -44,35 +50,30 @@ async def get_open_api_endpoint():
 
 
 @router.get("/upcoming_birthdays", response_model=List[ContactsOut])
-async def get_upcoming_birthdays(current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+async def get_upcoming_birthdays(days: int = Query(7, ge=0, le=365, description="Number of days to look ahead"),
+                                 current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_read_db)):
     '''
-     Retrieve a list of upcoming birthdays for all contacts.
+     Retrieve a list of upcoming birthdays for the current user's contacts.
+
+    Served through the per-user contacts cache.
 
     Args:
-        db (Session, optional): The database session. Defaults to Depends(get_db).
+        days (int, optional): Number of days to look ahead. Defaults to 7.
+        current_user (User, optional): The current user.
+        db (AsyncSession, optional): The read-only database session. Defaults to Depends(get_read_db).
 
     Returns:
         List[ContactsOut]: A list of upcoming birthdays.
     '''
     
-    upcoming_birthdays_list = await upcoming_birthdays(current_user, db)
-    upcoming_birthdays_out_list = [ContactsOut(
-                                        id=contact.id,
-                                        first_name = contact.first_name,
-                                        last_name = contact.last_name,
-                                        email = contact.email,
-                                        phone_number = contact.phone_number,
-                                        date_of_birth = contact.date_of_birth,
-                                        nick = contact.nick,
-                                    ) for contact in upcoming_birthdays_list]
-    return upcoming_birthdays_out_list
-
-
-@router.post("/create", response_model=ContactsOut, status_code=status.HTTP_201_CREATED, description='No more than 5 requests per minute', dependencies=[Depends(RateLimiter(times=5, seconds=60))])
+    return ORJSONResponse(await contacts_cache.upcoming_birthdays(current_user, db, days))
+
+
+@router.post("/create", response_model=ContactsOut, status_code=status.HTTP_201_CREATED, description='No more than 5 requests per minute', dependencies=[Depends(rate_limit(CREATE_CONTACT))])
 async def create_contact(
         body: ContactsIn,
         current_user: User = Depends(auth_service.get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     '''
     Create a new contact for the current authenticated user.
@@ -80,7 +81,7 @@ async def create_contact(
     Args:
         body (ContactsIn): The data for creating the contact.
         current_user (User): The current authenticated user. 
-        db (Session, optional): The database session.
+        db (AsyncSession, optional): The database session.
 
     Returns:
         ContactsOut: The newly created contact.
@@ -93,115 +94,339 @@ async def create_contact(
     if not contact:
         raise HTTPException(status_code=400, detail="Failed to create contact")
 
-    contact.user_id = current_user.id
-    db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    await contacts_cache.invalidate(current_user)
+    await replica_router.mark_write(current_user.id)
 
     return contact
 
 
-@router.get("/", response_model=List[ContactsOut])
+@router.post("/import", response_model=ImportJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def import_contacts(
+        background_tasks: BackgroundTasks,
+        file: UploadFile = File(),
+        format: Literal["csv", "ndjson", "vcard"] = Query(None, description="File format; guessed from the file name when omitted"),
+        current_user: User = Depends(auth_service.get_current_user)
+):
+    '''
+    Start a bulk import of contacts from a CSV, NDJSON or vCard file.
+
+    The file is spooled to disk and imported in the background; poll
+    /contacts/import/{job_id} for progress and per-row errors.
+
+    Args:
+        background_tasks (BackgroundTasks): Background tasks to execute, e.g., the import.
+        file (UploadFile): The file to import.
+        format (str, optional): "csv", "ndjson" or "vcard".
+        current_user (User): The current authenticated user.
+
+    Returns:
+        ImportJobOut: The pending import job.
+
+    Raises:
+        HTTPException: If the file format cannot be determined.
+    '''
+
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown file format")
+    job = await imports.create_job(current_user.id, fmt)
+    path = await imports.spool_upload(file, fmt)
+    background_tasks.add_task(imports.run_import, job, path, current_user)
+    return job.state
+
+
+@router.get("/import/{job_id}", response_model=ImportJobOut)
+async def read_import(job_id: str, current_user: User = Depends(auth_service.get_current_user)):
+    '''
+    Retrieve the progress of a contacts import job.
+
+    Args:
+        job_id (str): The ID of the import job.
+        current_user (User): The current authenticated user.
+
+    Returns:
+        ImportJobOut: The job progress.
+
+    Raises:
+        HTTPException: If the job is not found.
+    '''
+
+    progress = await imports.get_job(job_id, current_user.id)
+    if progress is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return progress
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts(
+        format: Literal["csv", "ndjson", "vcard"] = Query("csv", description="Export file format"),
+        current_user: User = Depends(auth_service.get_current_user)
+):
+    '''
+    Download the whole address book as a CSV, NDJSON or vCard file.
+
+    Rows are read through a server-side cursor and written to the response
+    in chunks, so memory use does not grow with the number of contacts. The
+    export is read from the replica when replica_router allows it.
+
+    Args:
+        format (str, optional): "csv", "ndjson" or "vcard". Defaults to "csv".
+        current_user (User): The current authenticated user.
+
+    Returns:
+        StreamingResponse: The export file as an attachment.
+    '''
+
+    filename = f"contacts{FORMATS[format]}"
+    sessionmaker = await replica_router.sessionmaker_for(current_user.id)
+    return StreamingResponse(exports.stream_export(current_user, format, sessionmaker=sessionmaker), media_type=MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+def _batch_results(ids: List[int], contacts: dict) -> List[dict]:
+    return [{"id": contact_id, "status": "ok", "contact": contacts[contact_id]}
+            if contact_id in contacts else {"id": contact_id, "status": "not_found"}
+            for contact_id in ids]
+
+
+@router.post("/batch/get", response_model=List[ContactsBatchResult])
+async def read_contacts_batch(body: ContactsIds, current_user: User = Depends(auth_service.get_current_user),
+                              db: AsyncSession = Depends(get_read_db)):
+    '''
+    Retrieve many contacts by ID in one request.
+
+    Args:
+        body (ContactsIds): The IDs of the contacts to retrieve.
+        current_user (User): The current authenticated user.
+        db (AsyncSession): The read-only database session.
+
+    Returns:
+        List[ContactsBatchResult]: One result per requested ID, in request order.
+    '''
+
+    contacts = await repository_contacts.get_contacts_by_ids(body.ids, current_user, db)
+    return _batch_results(body.ids, contacts)
+
+
+@router.patch("/batch", response_model=List[ContactsBatchResult])
+async def update_contacts_batch(body: ContactsPatchBatch, current_user: User = Depends(auth_service.get_current_user),
+                                db: AsyncSession = Depends(get_db)):
+    '''
+    Partially update many contacts in one transaction.
+
+    Args:
+        body (ContactsPatchBatch): The patches to apply; only the fields sent are changed.
+        current_user (User): The current authenticated user.
+        db (AsyncSession): The database session.
+
+    Returns:
+        List[ContactsBatchResult]: One result per patch, in request order. Rejected
+        patches have status "conflict" and an error message.
+    '''
+
+    results = await repository_contacts.update_contacts(body.items, current_user, db)
+    await contacts_cache.invalidate(current_user)
+    await replica_router.mark_write(current_user.id)
+    response = []
+    for patch, result in zip(body.items, results):
+        if result is None:
+            response.append({"id": patch.id, "status": "not_found"})
+        elif isinstance(result, str):
+            response.append({"id": patch.id, "status": "conflict", "error": result})
+        else:
+            response.append({"id": patch.id, "status": "ok", "contact": result})
+    return response
+
+
+@router.post("/batch/delete", response_model=List[ContactsBatchResult])
+async def remove_contacts_batch(body: ContactsIds, current_user: User = Depends(auth_service.get_current_user),
+                                db: AsyncSession = Depends(get_db)):
+    '''
+    Delete many contacts by ID in one transaction.
+
+    Args:
+        body (ContactsIds): The IDs of the contacts to delete.
+        current_user (User): The current authenticated user.
+        db (AsyncSession): The database session.
+
+    Returns:
+        List[ContactsBatchResult]: One result per requested ID, in request order, with the deleted contact.
+    '''
+
+    contacts = await repository_contacts.remove_contacts(body.ids, current_user, db)
+    await contacts_cache.invalidate(current_user)
+    await replica_router.mark_write(current_user.id)
+    return _batch_results(body.ids, contacts)
+
+
+@router.get("/", response_model=Union[List[ContactsOut], ContactsPage], dependencies=[Depends(rate_limit(SEARCH))])
 async def read_contacts(
+        request: Request,
         search: str = Query(None, description="Search contacts by first name, last name, or email"),
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1),
+        cursor: str = Query(None, description="Keyset pagination cursor; pass an empty value for the first page"),
+        order_by: Literal["id", "first_name", "last_name", "email"] = Query("id", description="Sort key in cursor mode"),
+        if_none_match: str = Header(None),
         current_user: User= Depends(auth_service.get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_read_db)
 ):
     '''
     Retrieve a list of contacts.
 
+    When the cursor parameter is present the endpoint switches to keyset
+    pagination and returns a ContactsPage with next_cursor instead of a plain list.
+    Rows are serialized straight from column tuples with orjson; response_model
+    only documents the shape and is checked when settings.debug is on.
+
+    The ETag is derived from the user's contacts_version and the query, so a
+    matching If-None-Match is answered with 304 before any contact is loaded.
+
     Args:
+        request (Request): The incoming request, whose query is part of the ETag.
         search (str, optional): Search contacts by first name, last name, or email.
         skip (int, optional): Number of contacts to skip. Defaults to 0.
         limit (int, optional): Maximum number of contacts to retrieve. Defaults to 100.
+        cursor (str, optional): Cursor returned with the previous page. Empty for the first page.
+        order_by (str, optional): Sort key used in cursor mode. Defaults to "id".
+        if_none_match (str, optional): ETags of the copies the client already has.
         current_user (User, optional): The current user.
-        db (Session, optional): The database session.
+        db (AsyncSession, optional): The read-only database session.
 
     Returns:
-        List[ContactsOut]: A list of contacts
+        Union[List[ContactsOut], ContactsPage]: A list of contacts, or a page of contacts in cursor mode;
+        304 Not Modified if the client's copy is current.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
     '''
     
-    if search:
-        contacts = await repository_contacts.search_contacts(search, skip, limit, current_user, db)
+    # Read the version before the rows: a concurrent write can only make the
+    # payload newer than its tag, which costs one extra download, never a stale 304.
+    version = await repository_contacts.get_contacts_version(current_user, db)
+    etag = collection_etag(current_user.id, version, request.query_params.multi_items())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if cursor is not None:
+        try:
+            contacts, next_cursor = await repository_contacts.get_contacts_page(cursor, limit, current_user, db,
+                                                                                search=search, order_by=order_by,
+                                                                                rows=True)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        response = contacts_response(contacts, next_cursor=next_cursor)
     else:
-        contacts = await repository_contacts.get_contacts(skip, limit, current_user, db)
-    if not contacts:
-        print("No contacts found")
-    return contacts
+        if search:
+            contacts = await repository_contacts.search_contacts(search, skip, limit, current_user, db, rows=True)
+            response = contacts_response(contacts)
+        else:
+            contacts = await contacts_cache.get_contacts(skip, limit, current_user, db, version=version)
+            response = ORJSONResponse(contacts)
+        if not contacts:
+            print("No contacts found")
+    response.headers["ETag"] = etag
+    return response
 
 
 @router.get("/{contact_id}", response_model=ContactsOut)
-async def read_contact(contact_id: int, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+async def read_contact(contact_id: int, response: Response, if_none_match: str = Header(None),
+                       current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_read_db)):
     '''
     Retrieve a contact by ID.
 
+    With If-None-Match only the contact's version is read, and a matching
+    ETag is answered with 304 without loading the row.
+
     Args:
         contact_id (int): The ID of the contact to retrieve.
+        response (Response): The response, used to set the ETag header.
+        if_none_match (str, optional): ETags of the copies the client already has.
         current_user (User, optional): The current user. 
-        db (Session, optional): The database session. 
+        db (AsyncSession, optional): The read-only database session.
 
     Returns:
-        ContactsOut: The contact information.
+        ContactsOut: The contact information, or 304 Not Modified if the client's copy is current.
 
     Raises:
         HTTPException: If the contact with the specified ID is not found.
    
     '''
 
-    contact = await repository_contacts.get_contact(contact_id, current_user, db)
+    if if_none_match:
+        version = await repository_contacts.get_contact_version(contact_id, current_user, db)
+        if version is not None and etag_matches(if_none_match, contact_etag(contact_id, version)):
+            return not_modified(contact_etag(contact_id, version))
+    contact = await contacts_cache.get_contact(contact_id, current_user, db)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    response.headers["ETag"] = contact_etag(contact_id, contact["version"])
     return contact
 
 
 @router.put("/{contact_id}", response_model=ContactsOut)
-async def update_contact(body: ContactsIn, contact_id: int, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+async def update_contact(body: ContactsIn, contact_id: int, response: Response, if_match: str = Header(None),
+                         current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
     '''
     Update a contact by ID.
 
     Args:
         body (ContactsIn): The updated contact information.
         contact_id (int): The ID of the contact to update.
+        response (Response): The response, used to set the new ETag header.
+        if_match (str, optional): ETag the client last saw; the update only applies if the contact still matches it.
         current_user (User, optional): The current user. 
-        db (Session, optional): The database session. 
+        db (AsyncSession, optional): The database session. 
 
     Returns:
         ContactsOut: The updated contact information.
 
     Raises:
-        HTTPException: If the contact with the specified ID is not found.
+        HTTPException: If the contact with the specified ID is not found, or 412 if it no longer matches If-Match.
     
     '''
     
-    contact = await repository_contacts.update_contact(contact_id, body,  current_user, db)
+    try:
+        contact = await repository_contacts.update_contact(contact_id, body,  current_user, db,
+                                                           version=if_match_version(if_match, contact_id))
+    except StaleDataError:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Contact has been modified")
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    await contacts_cache.invalidate(current_user)
+    await replica_router.mark_write(current_user.id)
+    response.headers["ETag"] = contact_etag(contact.id, contact.version)
     return contact
 
 
 @router.delete("/{contact_id}", response_model=ContactsOut)
-async def remove_contact(contact_id: int, current_user: User = Depends(auth_service.get_current_user), db: Session = Depends(get_db)):
+async def remove_contact(contact_id: int, if_match: str = Header(None),
+                         current_user: User = Depends(auth_service.get_current_user), db: AsyncSession = Depends(get_db)):
     '''
     Delete a contact by ID.
 
     Args:
         contact_id (int): The ID of the contact to delete.
+        if_match (str, optional): ETag the client last saw; the contact is only deleted if it still matches it.
         current_user (User, optional): The current user. Defaults to Depends(auth_service.get_current_user).
-        db (Session, optional): The database session. Defaults to Depends(get_db).
+        db (AsyncSession, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
         ContactsOut: The deleted contact information.
 
     Raises:
-        HTTPException: If the contact with the specified ID is not found.
+        HTTPException: If the contact with the specified ID is not found, or 412 if it no longer matches If-Match.
    
     '''
     
-    contact = await repository_contacts.remove_contact(contact_id, current_user, db)
+    try:
+        contact = await repository_contacts.remove_contact(contact_id, current_user, db,
+                                                           version=if_match_version(if_match, contact_id))
+    except StaleDataError:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Contact has been modified")
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+    await contacts_cache.invalidate(current_user)
+    await replica_router.mark_write(current_user.id)
     return contact
 
 
@@ -1,15 +1,13 @@
-import pickle
-
-from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
+from fastapi import APIRouter, Response, Depends, HTTPException, status, UploadFile, File, Header
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from m14.database.db import get_db
 from m14.database.models import User
 from m14.repository import users as repository_users
-from m14.services.auth import auth_service, Auth
-from m14.conf.config import settings
+from m14.services.auth import auth_service
+from m14.services import avatars
+from m14.services.etags import etag_matches, not_modified
+from m14.services.images import AVATAR_SIZES
 from m14.schemas import UserOut
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -32,29 +30,61 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 
 @router.patch('/avatar', response_model=UserOut)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_db)):
     '''
     Update the avatar for the currently authenticated user.
 
+    The image is resized to AVATAR_SIZES as WebP in a worker process and
+    stored under the SHA-256 of the upload, which becomes the user's avatar;
+    the same image uploaded again is neither processed nor stored twice.
+
     Args:
         file (UploadFile): The avatar image file to upload.
         current_user (User): The currently authenticated user.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         UserOut: The updated details of the currently authenticated user.
+
+    Raises:
+        HTTPException: 413 / 415 if the file is too large or not an image, 502 if the upload fails.
     '''
     
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'NotesApp/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
-    Auth.r.set(f"user:{user.email}", pickle.dumps(user))
+    digest = await avatars.store_avatar(file)
+    user = await repository_users.update_avatar(current_user.email, digest, db)
+    await auth_service.user_cache.invalidate(user.email)
     return user
+
+
+@router.get("/avatars/{digest}/{size}.webp", response_class=Response)
+async def read_avatar(digest: str, size: int, if_none_match: str = Header(None)):
+    '''
+    Serve one size of a stored avatar.
+
+    Avatars are addressed by content, so a URL always returns the same bytes
+    and is cached for a year as immutable. Nothing is looked up before
+    answering: a missing image is the storage's 404 (the CDN's, for Cloudinary),
+    so reads never spend the rate-limited Admin API quota.
+
+    Args:
+        digest (str): The avatar's content hash, as stored in User.avatar.
+        size (int): One of AVATAR_SIZES.
+        if_none_match (str, optional): ETags of the copies the client already has.
+
+    Returns:
+        Response: The WebP image, a redirect to it, or 304 Not Modified.
+
+    Raises:
+        HTTPException: If the digest or size is unknown, or (local storage) the image is missing.
+    '''
+
+    if size not in AVATAR_SIZES or not avatars.DIGEST.fullmatch(digest):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    etag = f'"{digest}-{size}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(if_none_match, etag):
+        response = not_modified(etag)
+        response.headers.update(headers)
+        return response
+    key = avatars.avatar_key(digest, size)
+    return avatars.get_storage().response(key, headers)
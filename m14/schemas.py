@@ -1,6 +1,6 @@
 from datetime import date, datetime
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import List, Optional
 
 class ContactsIn(BaseModel):
     '''
@@ -42,6 +42,90 @@ class ContactsOut(ContactsIn):
         orm_mode = True
 
 
+class ContactsPage(BaseModel):
+    '''
+    Data model for a keyset-paginated page of contacts.
+
+    Attributes:
+        items (List[ContactsOut]): The contacts on this page.
+        next_cursor (Optional[str]): Opaque cursor for the next page, None on the last page.
+    '''
+
+    items: List[ContactsOut]
+    next_cursor: Optional[str] = None
+
+
+MAX_BATCH_SIZE = 1000
+
+
+class ContactsPatch(BaseModel):
+    '''
+    Data model for a partial update of one contact in a batch.
+
+    Only the fields that are sent are changed; first_name, last_name, email,
+    phone_number and date_of_birth cannot be cleared (an explicit null is
+    rejected).
+
+    Attributes:
+        id (int): The ID of the contact to update.
+        first_name (Optional[str]): The new first name. Must be between 4 and 16 characters.
+        last_name (Optional[str]): The new last name. Must be between 4 and 16 characters.
+        email (Optional[str]): The new email address.
+        phone_number (Optional[str]): The new phone number.
+        date_of_birth (Optional[date]): The new date of birth.
+        nick (Optional[str]): The new nickname.
+        version (Optional[int]): The version the client last saw; the patch is rejected if the contact has changed since.
+    '''
+
+    id: int
+    first_name: str = Field(None, min_length=4, max_length=16)
+    last_name: str = Field(None, min_length=4, max_length=16)
+    email: str = None
+    phone_number: str = None
+    date_of_birth: date = None
+    nick: Optional[str] = None
+    version: Optional[int] = None
+
+
+class ContactsIds(BaseModel):
+    '''
+    Data model for a batch of contact IDs.
+
+    Attributes:
+        ids (List[int]): Between 1 and MAX_BATCH_SIZE contact IDs.
+    '''
+
+    ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ContactsPatchBatch(BaseModel):
+    '''
+    Data model for a batch of partial contact updates.
+
+    Attributes:
+        items (List[ContactsPatch]): Between 1 and MAX_BATCH_SIZE patches.
+    '''
+
+    items: List[ContactsPatch] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ContactsBatchResult(BaseModel):
+    '''
+    Data model for the outcome of one item of a batch request.
+
+    Attributes:
+        id (int): The contact ID the item refers to.
+        status (str): One of "ok", "not_found" or "conflict".
+        contact (Optional[ContactsOut]): The contact read, updated or deleted, when status is "ok".
+        error (Optional[str]): Why the item was rejected.
+    '''
+
+    id: int
+    status: str
+    contact: Optional[ContactsOut] = None
+    error: Optional[str] = None
+
+
 class UserIn(BaseModel):
     '''
     Data model for creating new users.
@@ -65,7 +149,8 @@ class UserOut(BaseModel):
         id (int): The unique identifier of the user.
         username (str): The username of the user.
         email (str): The email address of the user.
-        avatar (str): The avatar URL of the user.
+        avatar (str): The avatar URL of the user, or the content hash of an uploaded avatar,
+            served at /api/users/avatars/{hash}/{size}.webp.
     '''
     
     id: int
@@ -100,4 +185,39 @@ class RequestEmail(BaseModel):
     
     '''
     
-    email: EmailStr
\ No newline at end of file
+    email: EmailStr
+
+class ImportRowError(BaseModel):
+    '''
+    Data model for a row rejected during a contacts import.
+
+    Attributes:
+        row (int): Line number (CSV / NDJSON) or card number (vCard) of the row.
+        error (str): Why the row was rejected.
+    '''
+
+    row: int
+    error: str
+
+
+class ImportJobOut(BaseModel):
+    '''
+    Data model for the progress of a contacts import job.
+
+    Attributes:
+        id (str): The job identifier.
+        status (str): One of "pending", "running", "done" or "failed".
+        format (str): The file format being imported.
+        processed (int): Number of rows read so far.
+        inserted (int): Number of contacts created so far.
+        failed (int): Number of rejected rows so far.
+        errors (List[ImportRowError]): Details of the first rejected rows.
+    '''
+
+    id: str
+    status: str
+    format: str
+    processed: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
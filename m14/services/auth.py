@@ -1,18 +1,21 @@
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import time
 
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-import redis as redis
-import pickle
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from m14.conf.config import settings
 from m14.database.db import get_db
 from m14.repository import users as repository_users
 from m14.schemas import UserOut
+from m14.services.cache import LRUCache, UserCache
 
 
 class Auth:
@@ -21,10 +24,13 @@ class Auth:
 
     Attributes:
         pwd_context (CryptContext): Password hashing context using the bcrypt scheme.
+        hash_executor (ThreadPoolExecutor, optional): Bounded pool running bcrypt off the event loop; its size caps
+            concurrent hashes and further requests queue behind it.
         SECRET_KEY (str): Secret key used for JWT token generation.
         ALGORITHM (str): Algorithm used for JWT token generation.
         oauth2_scheme (OAuth2PasswordBearer): OAuth2 password bearer scheme.
-        r (Redis): Redis client for caching.
+        user_cache (UserCache): Two-tier cache of authenticated users.
+        token_cache (LRUCache): Verified access token claims keyed by token hash, kept until the token expires.
 
     Methods:
         verify_password(plain_password, hashed_password): Verify if the plain password matches the hashed password.
@@ -32,6 +38,7 @@ class Auth:
         create_access_token(data, expires_delta): Generate an access token for the provided data.
         create_refresh_token(data, expires_delta): Generate a refresh token for the provided data.
         decode_refresh_token(refresh_token): Decode the provided refresh token and return the associated email.
+        decode_access_token(token): Verify the access token and return its claims, using the token cache.
         get_current_user(token, db): Get the currently authenticated user based on the provided access token.
         create_email_token(data): Generate a token for email verification.
         get_email_from_token(token): Decode the provided token and return the associated email.
@@ -39,18 +46,25 @@ class Auth:
     '''
     
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    # Set by the app's lifespan (main.lifespan); until then bcrypt runs on the loop's default executor.
+    hash_executor: Optional[ThreadPoolExecutor] = None
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    # Its Redis client is set by the app's lifespan, see main.use_redis.
+    user_cache = UserCache(None, ttl=settings.user_cache_ttl, local_size=settings.user_cache_local_size,
+                           local_ttl=settings.user_cache_local_ttl)
+    token_cache = LRUCache(maxsize=settings.token_cache_size)
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_password(self, plain_password, hashed_password):
         """Verify if the plain password matches the hashed password."""
-        return self.pwd_context.verify(plain_password, hashed_password)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hash_executor, self.pwd_context.verify, plain_password, hashed_password)
 
-    def get_password_hash(self, password: str):
+    async def get_password_hash(self, password: str):
         """Hash the provided password."""
-        return self.pwd_context.hash(password)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.hash_executor, self.pwd_context.hash, password)
 
 
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
@@ -87,7 +101,18 @@ class Auth:
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserOut:
+    def decode_access_token(self, token: str) -> dict:
+        """Verify the access token and return its claims, using the token cache."""
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.token_cache.get(key)
+        if payload is None:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            ttl = payload.get("exp", 0) - time.time()
+            if ttl > 0:
+                self.token_cache.set(key, payload, ttl=ttl)
+        return payload
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> UserOut:
         """Get the currently authenticated user based on the provided access token."""
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -96,7 +121,7 @@ class Auth:
         )
 
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_access_token(token)
             if payload['scope'] == 'access_token':
                 email = payload["sub"]
                 if email is None:
@@ -105,15 +130,12 @@ class Auth:
                 raise credentials_exception
         except JWTError as e:
             raise credentials_exception
-        user = self.r.get(f"user:{email}")
-        if user is None:       
+        user = await self.user_cache.get(email)
+        if user is None:
             user = await repository_users.get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
-            await self.r.set(f"user:{email}", pickle.dumps(user))
-            await self.r.expire(f"user:{email}", 900)
-        else:
-            user = pickle.loads(user)
+            user = await self.user_cache.set(user)
         return user
         
     def create_email_token(self, data: dict):
@@ -0,0 +1,299 @@
+import asyncio
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import FileResponse, RedirectResponse, Response
+
+from m14.conf.config import Settings, settings
+from m14.services.images import AVATAR_SIZES, content_hash, process_avatar
+
+CHUNK_SIZE = 64 * 1024
+DIGEST = re.compile(r"[0-9a-f]{64}")
+
+# Uploads are blocking SDK / file calls; they run here instead of on the event loop. Both
+# executors are created by start() in the app's lifespan; until then the loop's default executor is used.
+upload_executor: Optional[ThreadPoolExecutor] = None
+
+
+def image_pool(workers: int = settings.avatar_process_workers) -> ProcessPoolExecutor:
+    """Processes for decoding and resizing, which are CPU-bound; "spawn" keeps the event loop and sockets out of them."""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+image_executor: Optional[ProcessPoolExecutor] = None
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    '''
+    Identify an image from its first bytes instead of trusting the client's content type.
+
+    Args:
+        head (bytes): At least the first 12 bytes of the file.
+
+    Returns:
+        str | None: "image/jpeg", "image/png", "image/gif" or "image/webp", or None for anything else.
+    '''
+
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def avatar_key(digest: str, size: int) -> str:
+    """Storage key of one processed avatar size."""
+    return f"{digest}/{size}.webp"
+
+
+class CloudinaryStorage:
+    '''
+    Content-addressed avatar storage on Cloudinary, served from its CDN.
+
+    Images are stored as processed, without URL transformations. The SDK is
+    imported and configured when the storage is created, on the first avatar
+    request, so processes that never touch avatars do not load it.
+
+    Attributes:
+        folder (str): Folder of the public IDs.
+    '''
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str, folder: str = "NotesApp"):
+        import cloudinary
+
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+        self.folder = folder
+
+    def public_id(self, key: str) -> str:
+        return f"{self.folder}/{key.removesuffix('.webp')}"
+
+    def _exists(self, key: str) -> bool:
+        import cloudinary.api
+        import cloudinary.exceptions
+
+        try:
+            cloudinary.api.resource(self.public_id(key))
+        except cloudinary.exceptions.NotFound:
+            return False
+        return True
+
+    def _upload(self, key: str, data: bytes) -> None:
+        import cloudinary.uploader
+
+        cloudinary.uploader.upload(data, public_id=self.public_id(key), overwrite=False)
+
+    async def exists(self, key: str) -> bool:
+        """Check for a stored image from a worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(upload_executor, self._exists, key)
+
+    async def put(self, key: str, data: bytes) -> None:
+        """Upload an image from a worker thread; an existing image under the key is kept."""
+        await asyncio.get_running_loop().run_in_executor(upload_executor, self._upload, key, data)
+
+    def response(self, key: str, headers: dict) -> Response:
+        """Redirect to the image on the CDN, which answers 404 for a missing key; no Admin API call."""
+        import cloudinary
+
+        url = cloudinary.CloudinaryImage(self.public_id(key)).build_url(format="webp")
+        return RedirectResponse(url, status_code=status.HTTP_308_PERMANENT_REDIRECT, headers=headers)
+
+    def close(self) -> None:
+        """Close the keep-alive HTTPS connections of the SDK modules that were loaded."""
+        for name in ("cloudinary.uploader", "cloudinary.api_client.call_api"):
+            module = sys.modules.get(name)
+            if module is not None:
+                module._http.clear()
+
+
+class LocalStorage:
+    '''
+    Content-addressed avatar storage on the local filesystem (or a mounted bucket).
+
+    Attributes:
+        directory (str): Where avatars are written.
+    '''
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".part", "wb") as out:
+            out.write(data)
+        os.replace(path + ".part", path)
+
+    async def exists(self, key: str) -> bool:
+        """Check for a stored image from a worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(upload_executor, os.path.exists, self.path(key))
+
+    async def put(self, key: str, data: bytes) -> None:
+        """Write an image from a worker thread, replacing any previous file atomically."""
+        await asyncio.get_running_loop().run_in_executor(upload_executor, self._write, key, data)
+
+    def response(self, key: str, headers: dict) -> Response:
+        """Stream the image file, or 404 when there is none."""
+        if not os.path.isfile(self.path(key)):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+        return FileResponse(self.path(key), media_type="image/webp", headers=headers)
+
+    def close(self) -> None:
+        """Nothing to release."""
+
+
+def build_storage():
+    '''
+    Create the avatar storage selected by settings.avatar_storage.
+
+    Returns:
+        CloudinaryStorage | LocalStorage: The storage backend.
+    '''
+
+    if settings.avatar_storage == "local":
+        return LocalStorage(settings.avatar_local_dir)
+    return CloudinaryStorage(settings.cloudinary_name, settings.cloudinary_api_key, settings.cloudinary_api_secret)
+
+
+# Built by get_storage() on first use.
+avatar_storage = None
+
+
+def get_storage():
+    """The avatar storage, created from settings on the first call."""
+    global avatar_storage
+    if avatar_storage is None:
+        avatar_storage = build_storage()
+    return avatar_storage
+
+
+def start(app_settings: Settings = settings) -> None:
+    """Create both executors, sized by app_settings; main's lifespan calls this on startup."""
+    global upload_executor, image_executor
+    upload_executor = ThreadPoolExecutor(max_workers=app_settings.avatar_upload_workers,
+                                         thread_name_prefix="avatar-upload")
+    image_executor = image_pool(app_settings.avatar_process_workers)
+
+
+def close() -> None:
+    """Stop both executors and release the storage's connections; main's lifespan calls this on shutdown."""
+    global upload_executor, image_executor, avatar_storage
+    for executor in (upload_executor, image_executor):
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    upload_executor = image_executor = None
+    if avatar_storage is not None:
+        avatar_storage.close()
+        avatar_storage = None
+
+
+async def resize_avatar(data: bytes) -> dict:
+    '''
+    Run process_avatar in the process pool, replacing the pool once if a worker died.
+
+    Args:
+        data (bytes): The original upload.
+
+    Returns:
+        dict: The WebP image for each of AVATAR_SIZES.
+
+    Raises:
+        ValueError: If the data is not a usable image.
+    '''
+
+    global image_executor
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(image_executor, process_avatar, data)
+    except BrokenProcessPool:
+        print("Avatar process pool broke, starting a new one")
+        image_executor.shutdown(wait=False)
+        image_executor = image_pool()
+        return await loop.run_in_executor(image_executor, process_avatar, data)
+
+
+async def check_avatar(file: UploadFile, max_bytes: int) -> str:
+    '''
+    Enforce the size and type limits before anything is processed or uploaded.
+
+    The declared size is checked first; when it is unknown the file is read
+    through in chunks. The type comes from the file's magic bytes.
+
+    Args:
+        file (UploadFile): The uploaded avatar.
+        max_bytes (int): The size limit.
+
+    Returns:
+        str: The image's content type. The file is rewound to its start.
+
+    Raises:
+        HTTPException: 413 if the file is too large, 415 if it is not a JPEG, PNG, GIF or WebP image.
+    '''
+
+    too_large = HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                              detail=f"Avatar must not exceed {max_bytes} bytes")
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+    head = await file.read(12)
+    content_type = sniff_image_type(head)
+    if content_type is None:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Avatar must be a JPEG, PNG, GIF or WebP image")
+    if file.size is None:
+        size = len(head)
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise too_large
+    await file.seek(0)
+    return content_type
+
+
+async def store_avatar(file: UploadFile) -> str:
+    '''
+    Validate an uploaded avatar, resize it to AVATAR_SIZES as WebP and store the results under its content hash.
+
+    An image that was stored before is neither processed nor uploaded again.
+    The largest size is written last, so its presence means the set is complete.
+
+    Args:
+        file (UploadFile): The uploaded avatar.
+
+    Returns:
+        str: The SHA-256 digest of the upload, which keys the stored images.
+
+    Raises:
+        HTTPException: 413 / 415 if the file breaks the limits or cannot be decoded, 502 if the storage fails.
+    '''
+
+    await check_avatar(file, settings.avatar_max_bytes)
+    data = await file.read()
+    digest = content_hash(data)
+    storage = get_storage()
+    try:
+        if await storage.exists(avatar_key(digest, max(AVATAR_SIZES))):
+            return digest
+        try:
+            images = await resize_avatar(data)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+        for size in sorted(images):
+            await storage.put(avatar_key(digest, size), images[size])
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Avatar upload failed:", e)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Avatar upload failed")
+    return digest
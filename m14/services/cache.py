@@ -0,0 +1,223 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from m14.metrics import REDIS_ERRORS, REDIS_LATENCY
+from m14.schemas import UserOut
+
+
+class LRUCache:
+    '''
+    Bounded in-process cache with least-recently-used eviction and per-entry expiry.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept.
+        ttl (float): Default lifetime of an entry in seconds.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that found nothing (or an expired entry).
+    '''
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key) -> Any:
+        """Return the cached value for key, or None when missing or expired."""
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        """Store value under key for ttl seconds (defaults to the cache ttl)."""
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        """Drop key from the cache if present."""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class UserCache:
+    '''
+    Two-tier cache of authenticated users: a small in-process LRU in front of Redis.
+
+    Users are stored as compact UserOut JSON (no ORM state, no password hash)
+    with a single ``SET ... EX``. Invalidations delete the Redis key and are
+    published on a pub/sub channel so every worker drops its local copy; the
+    short local TTL bounds staleness if a message is missed.
+
+    Attributes:
+        redis (Redis): Async Redis client.
+        local (LRUCache): The in-process tier.
+        ttl (int): Lifetime of the Redis entries in seconds.
+        channel (str): Pub/sub channel used for invalidations.
+    '''
+
+    def __init__(self, redis: Redis, ttl: int = 900, local_size: int = 1024, local_ttl: float = 30,
+                 channel: str = "user-cache:invalidate"):
+        self.redis = redis
+        self.ttl = ttl
+        self.local = LRUCache(maxsize=local_size, ttl=local_ttl)
+        self.channel = channel
+
+    @staticmethod
+    def key(email: str) -> str:
+        return f"user:{email}"
+
+    @staticmethod
+    def dump(user) -> str:
+        """Serialize an ORM user (or UserOut) as UserOut JSON."""
+        fields = {name: getattr(user, name) for name in UserOut.model_fields if getattr(user, name, None) is not None}
+        return UserOut(**fields).model_dump_json()
+
+    async def get(self, email: str) -> Optional[UserOut]:
+        """Return the cached user for email from the local tier or Redis, or None."""
+        user = self.local.get(email)
+        if user is not None:
+            return user
+        try:
+            with REDIS_LATENCY.labels("user_cache", "get").time():
+                payload = await self.redis.get(self.key(email))
+        except RedisError as e:
+            REDIS_ERRORS.labels("user_cache", "get").inc()
+            print("User cache unavailable:", e)
+            return None
+        if payload is None:
+            return None
+        user = UserOut.model_validate_json(payload)
+        self.local.set(email, user)
+        return user
+
+    async def set(self, user) -> UserOut:
+        """Cache user in both tiers and return its UserOut form."""
+        payload = self.dump(user)
+        cached = UserOut.model_validate_json(payload)
+        self.local.set(cached.email, cached)
+        try:
+            with REDIS_LATENCY.labels("user_cache", "set").time():
+                await self.redis.set(self.key(cached.email), payload, ex=self.ttl)
+        except RedisError as e:
+            REDIS_ERRORS.labels("user_cache", "set").inc()
+            print("User cache unavailable:", e)
+        return cached
+
+    async def invalidate(self, email: str) -> None:
+        """Drop the user from Redis and from the local tier of every worker."""
+        self.local.pop(email)
+        try:
+            with REDIS_LATENCY.labels("user_cache", "invalidate").time():
+                await self.redis.delete(self.key(email))
+                await self.redis.publish(self.channel, email)
+        except RedisError as e:
+            REDIS_ERRORS.labels("user_cache", "invalidate").inc()
+            print("User cache unavailable:", e)
+
+    async def listen(self, retry_delay: float = 1) -> None:
+        """Apply invalidations published by other workers until cancelled."""
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Anything cached while we were not subscribed may be stale.
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            email = message["data"]
+                            self.local.pop(email.decode() if isinstance(email, bytes) else email)
+            except (RedisError, OSError) as e:
+                print("User cache listener disconnected:", e)
+                self.local.clear()
+                await asyncio.sleep(retry_delay)
+
+
+class ContactsCache:
+    '''
+    Per-user read-through cache of contact reads in Redis.
+
+    Entries live under ``contacts:{user_id}:{generation}:...`` where the
+    generation is a per-user counter. A write bumps the counter with a single
+    INCR, so every entry of that user becomes unreachable at once and simply
+    expires; nothing has to be scanned or deleted. Redis errors fall back to
+    the loader, so the cache can only make reads faster, never fail them.
+
+    Attributes:
+        redis (Redis): Async Redis client.
+        ttl (int): Lifetime of the cached entries in seconds.
+        prefix (str): Key namespace.
+        hits (int): Reads answered from Redis.
+        misses (int): Reads that went to the loader and were cached.
+        errors (int): Reads or invalidations that failed because of Redis.
+    '''
+
+    def __init__(self, redis: Redis, ttl: int = 300, prefix: str = "contacts"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def generation_key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}:gen"
+
+    async def get_or_load(self, user_id: int, name: str, params: tuple,
+                          loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached JSON value for (name, params), calling loader and caching its result on a miss.
+        None results are not cached."""
+        try:
+            generation = int(await self.redis.get(self.generation_key(user_id)) or 0)
+            key = ":".join([self.prefix, str(user_id), str(generation), name, *map(str, params)])
+            payload = await self.redis.get(key)
+        except RedisError as e:
+            print("Contacts cache unavailable:", e)
+            self.errors += 1
+            return await loader()
+        if payload is not None:
+            self.hits += 1
+            return orjson.loads(payload)
+        self.misses += 1
+        value = await loader()
+        if value is not None:
+            try:
+                await self.redis.set(key, orjson.dumps(value), ex=self.ttl)
+            except RedisError as e:
+                print("Contacts cache unavailable:", e)
+                self.errors += 1
+        return value
+
+    async def invalidate(self, user_id: int) -> None:
+        """Make every cached read of the user unreachable by bumping their generation."""
+        try:
+            await self.redis.incr(self.generation_key(user_id))
+        except RedisError as e:
+            print("Contacts cache unavailable:", e)
+            self.errors += 1
+
+    def stats(self) -> dict:
+        """Counters and the hit ratio of this process since start."""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0}
@@ -0,0 +1,28 @@
+'''
+Redis clients shared by the caches, the rate limiter, the replica router and the job queue.
+
+A Redis client owns a connection pool; building one per module gave every
+process five pools to the same server. Nothing is built at import: the app's
+lifespan (main.lifespan) creates two clients from the app's settings, hands
+them to the module singletons and closes them on shutdown, and the job
+worker creates its own.
+'''
+from redis.asyncio import Redis
+
+from m14.conf.config import Settings, settings
+
+
+def redis_client(app_settings: Settings = settings, decode_responses: bool = False) -> Redis:
+    '''
+    Build an unconnected Redis client.
+
+    Args:
+        app_settings (Settings, optional): Where redis_host and redis_port come from. Defaults to settings.
+        decode_responses (bool, optional): Return str instead of bytes. Defaults to False.
+
+    Returns:
+        Redis: The client.
+    '''
+
+    return Redis(host=app_settings.redis_host, port=app_settings.redis_port, db=0,
+                 decode_responses=decode_responses)
@@ -0,0 +1,90 @@
+from datetime import date
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from m14.conf.config import settings
+from m14.database.models import Contacts
+from m14.repository import contacts as repository_contacts
+from m14.services.cache import ContactsCache
+from m14.services.serialization import contacts_to_json
+
+# The Redis client is set by the app's lifespan, see main.use_redis.
+contacts_cache = ContactsCache(None, ttl=settings.contacts_cache_ttl)
+
+
+async def get_contacts(skip: int, limit: int, user, db: AsyncSession, version: int = 0) -> List[dict]:
+    '''
+    Read-through cached repository.contacts.get_contacts.
+
+    Args:
+        skip (int): The number of contacts to skip.
+        limit (int): The maximum number of contacts to retrieve.
+        user (User): The user whose contacts are being retrieved.
+        db (AsyncSession): The database session used on a cache miss.
+        version (int, optional): The contacts_version the response's ETag was built from. It is part
+            of the key so a page cached just before the generation bump is never served under a newer ETag.
+
+    Returns:
+        List[dict]: The contacts as ContactsOut-shaped dicts.
+    '''
+
+    async def load():
+        return contacts_to_json(await repository_contacts.get_contacts(skip, limit, user, db, rows=True))
+
+    return await contacts_cache.get_or_load(user.id, "list", (version, skip, limit), load)
+
+
+async def upcoming_birthdays(user, db: AsyncSession, days: int = 7) -> List[dict]:
+    '''
+    Read-through cached repository.contacts.upcoming_birthdays.
+
+    The window depends on today's date, which is therefore part of the key.
+
+    Args:
+        user (User): The user whose contacts are being retrieved.
+        db (AsyncSession): The database session used on a cache miss.
+        days (int, optional): Length of the window in days. Defaults to 7.
+
+    Returns:
+        List[dict]: The contacts as ContactsOut-shaped dicts, soonest birthday first.
+    '''
+
+    async def load():
+        return contacts_to_json(await repository_contacts.upcoming_birthdays(user, db, days, rows=True))
+
+    return await contacts_cache.get_or_load(user.id, "birthdays", (date.today().isoformat(), days), load)
+
+
+async def get_contact(contact_id: int, user, db: AsyncSession) -> dict | None:
+    '''
+    Read-through cached repository.contacts.get_contact.
+
+    Args:
+        contact_id (int): The ID of the contact to retrieve.
+        user (User): The user whose contact is being retrieved.
+        db (AsyncSession): The database session used on a cache miss.
+
+    Returns:
+        dict | None: The contact's ContactsOut fields plus its version, or None if not found.
+    '''
+
+    async def load():
+        contact = await repository_contacts.get_contact(contact_id, user, db)
+        if contact is None:
+            return None
+        return {column.key: getattr(contact, column.key)
+                for column in (*repository_contacts.CONTACT_COLUMNS, Contacts.version)}
+
+    return await contacts_cache.get_or_load(user.id, "contact", (contact_id,), load)
+
+
+async def invalidate(user) -> None:
+    '''
+    Drop every cached contacts read of the user; call after each committed write.
+
+    Args:
+        user (User): The user whose contacts changed.
+    '''
+
+    await contacts_cache.invalidate(user.id)
@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Sequence, Tuple
+
+FIELDS = ["first_name", "last_name", "email", "phone_number", "date_of_birth", "nick"]
+FORMATS = {"csv": ".csv", "ndjson": ".ndjson", "vcard": ".vcf"}
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson", "vcard": "text/vcard"}
+EXPORT_FIELDS = ["id"] + FIELDS
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".vcf": "vcard", ".vcard": "vcard"}
+
+
+def detect_format(filename: str | None, content_type: str | None = None) -> str | None:
+    '''
+    Guess the import format of an uploaded file.
+
+    Args:
+        filename (str, optional): The uploaded file name.
+        content_type (str, optional): The uploaded file content type.
+
+    Returns:
+        str | None: "csv", "ndjson" or "vcard", or None when it cannot be guessed.
+    '''
+
+    name = (filename or "").lower()
+    for extension, fmt in EXTENSIONS.items():
+        if name.endswith(extension):
+            return fmt
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    if "vcard" in content_type:
+        return "vcard"
+    return None
+
+
+def iter_csv(lines: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+    '''
+    Parse CSV with a header row into contact dicts.
+
+    Args:
+        lines (Iterable[str]): Lines of the file, read lazily.
+
+    Yields:
+        Tuple[int, dict]: The line number and the row, with empty cells as None.
+    '''
+
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, {key.strip(): (value or None) for key, value in row.items() if key}
+
+
+def iter_ndjson(lines: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+    '''
+    Parse newline-delimited JSON objects into contact dicts.
+
+    Args:
+        lines (Iterable[str]): Lines of the file, read lazily.
+
+    Yields:
+        Tuple[int, dict]: The line number and the object. Malformed lines yield
+        an "__error__" entry instead of stopping the import.
+    '''
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, {"__error__": f"Invalid JSON: {e}"}
+            continue
+        if not isinstance(row, dict):
+            yield number, {"__error__": "Expected a JSON object"}
+            continue
+        yield number, row
+
+
+def _unfold(lines: Iterable[str]) -> Iterator[str]:
+    previous = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and previous is not None:
+            previous += line[1:]
+            continue
+        if previous is not None:
+            yield previous
+        previous = line
+    if previous is not None:
+        yield previous
+
+
+def _vcard_date(value: str) -> str:
+    value = value.strip()
+    if len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value[:10]
+
+
+def iter_vcard(lines: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+    '''
+    Parse vCard 3.0/4.0 cards (N, FN, EMAIL, TEL, BDAY, NICKNAME) into contact dicts.
+
+    Args:
+        lines (Iterable[str]): Lines of the file, read lazily.
+
+    Yields:
+        Tuple[int, dict]: The card number and the contact. Only the first
+        EMAIL and TEL of a card are used.
+    '''
+
+    number, card = 0, None
+    for line in _unfold(lines):
+        name, _, value = line.partition(":")
+        prop = name.split(";", 1)[0].upper()
+        if prop == "BEGIN" and value.strip().upper() == "VCARD":
+            number, card = number + 1, {}
+        elif card is None:
+            continue
+        elif prop == "END":
+            yield number, card
+            card = None
+        elif prop == "N":
+            parts = value.split(";")
+            card["last_name"] = parts[0] or None
+            card["first_name"] = parts[1] if len(parts) > 1 and parts[1] else None
+        elif prop == "FN" and not card.get("first_name"):
+            first, _, last = value.strip().partition(" ")
+            card["first_name"] = first or None
+            if not card.get("last_name"):
+                card["last_name"] = last or None
+        elif prop == "EMAIL":
+            card.setdefault("email", value.strip())
+        elif prop == "TEL":
+            card.setdefault("phone_number", value.strip())
+        elif prop == "BDAY":
+            card["date_of_birth"] = _vcard_date(value)
+        elif prop == "NICKNAME":
+            card["nick"] = value.strip() or None
+
+
+PARSERS = {"csv": iter_csv, "ndjson": iter_ndjson, "vcard": iter_vcard}
+
+
+def _csv_chunk(rows: Sequence) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([tuple(getattr(row, field) for field in EXPORT_FIELDS) for row in rows])
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(rows: Sequence) -> str:
+    return "".join(json.dumps({field: getattr(row, field) for field in EXPORT_FIELDS}, default=str) + "\n"
+                   for row in rows)
+
+
+def _vcard_escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\n", "\\n")
+
+
+def _vcard_chunk(rows: Sequence) -> str:
+    cards = []
+    for row in rows:
+        first, last = _vcard_escape(row.first_name), _vcard_escape(row.last_name)
+        lines = ["BEGIN:VCARD", "VERSION:3.0", f"N:{last};{first};;;", f"FN:{first} {last}",
+                 f"EMAIL:{_vcard_escape(row.email)}", f"TEL:{_vcard_escape(row.phone_number)}"]
+        if row.date_of_birth:
+            lines.append(f"BDAY:{row.date_of_birth.isoformat()}")
+        if row.nick:
+            lines.append(f"NICKNAME:{_vcard_escape(row.nick)}")
+        lines.append("END:VCARD")
+        cards.append("\r\n".join(lines) + "\r\n")
+    return "".join(cards)
+
+
+WRITERS = {"csv": _csv_chunk, "ndjson": _ndjson_chunk, "vcard": _vcard_chunk}
+
+
+async def export_chunks(fmt: str, partitions: AsyncIterable[Sequence]) -> AsyncIterator[bytes]:
+    '''
+    Serialize contacts partition by partition, so only one partition is held in memory.
+
+    Args:
+        fmt (str): "csv", "ndjson" or "vcard".
+        partitions (AsyncIterable[Sequence]): Batches of rows exposing the EXPORT_FIELDS attributes.
+
+    Yields:
+        bytes: UTF-8 encoded chunks of the export, starting with the CSV header for CSV.
+    '''
+
+    if fmt == "csv":
+        yield (",".join(EXPORT_FIELDS) + "\r\n").encode()
+    write = WRITERS[fmt]
+    async for rows in partitions:
+        yield write(rows).encode()
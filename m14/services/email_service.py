@@ -1,52 +1,92 @@
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader
 from pydantic import EmailStr
 
 from m14.conf.config import settings
 from m14.services.auth import auth_service
+from m14.services.mail_transport import SMTPMailer, SMTPPool
 
 
+TEMPLATE_FOLDER = Path(__file__).parent / 'templates'
+MAIL_FROM_NAME = "Example email"
+SMTP_TIMEOUT = 60
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Example email",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=False,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+# One environment for the process: Jinja keeps compiled templates in it, and
+# without auto_reload it does not stat the template file on every render.
+templates = Environment(loader=FileSystemLoader(TEMPLATE_FOLDER), auto_reload=False)
+
+
+def smtp_client() -> aiosmtplib.SMTP:
+    """Build an unconnected SMTP client from settings; the server speaks implicit TLS."""
+    return aiosmtplib.SMTP(hostname=settings.mail_server, port=settings.mail_port, timeout=SMTP_TIMEOUT,
+                           use_tls=True, start_tls=False, validate_certs=False)
+
+
+mailer = SMTPMailer(SMTPPool(smtp_client, size=settings.mail_pool_size, username=settings.mail_username,
+                             password=settings.mail_password, keepalive=settings.mail_keepalive,
+                             idle_timeout=settings.mail_idle_timeout, max_messages=settings.mail_max_messages),
+                    batch_size=settings.mail_batch_size)
+
+
+def render_message(recipient: str, subject: str, template_name: str, context: dict) -> EmailMessage:
+    '''
+    Render an HTML email from a cached template.
+
+    Args:
+        recipient (str): The To address.
+        subject (str): The subject line.
+        template_name (str): A template in the templates folder.
+        context (dict): The template variables.
+
+    Returns:
+        EmailMessage: The message, sent from settings.mail_from.
+    '''
+
+    message = EmailMessage()
+    message["From"] = formataddr((MAIL_FROM_NAME, settings.mail_from))
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(templates.get_template(template_name).render(**context), subtype="html")
+    return message
+
+
+def confirmation_message(email: EmailStr, username: str, host: str) -> EmailMessage:
+    '''
+    Build the email confirmation message with a fresh verification token.
+
+    Args:
+        email (EmailStr): The email address to confirm.
+        username (str): The username associated with the email.
+        host (str): The host URL where the confirmation link should point to.
+
+    Returns:
+        EmailMessage: The message.
+    '''
+
+    token_verification = auth_service.create_email_token({"sub": email})
+    return render_message(email, "Confirm your email", "email_template.html",
+                          {"host": host, "username": username, "token": token_verification})
 
 
 async def send_email(email: EmailStr, username: str, host: str):
     '''
     Send an email for email confirmation.
 
+    Runs as the "send_email" job of m14.worker; the message joins the mailer's
+    next batch and goes out over a pooled, already logged-in SMTP session.
+
     Args:
         email (EmailStr): The email address to send the confirmation email to.
         username (str): The username associated with the email.
         host (str): The host URL where the confirmation link should point to.
 
     Raises:
-        ConnectionErrors: If there is an error connecting to the email server.
+        SMTPException: If the server rejected the message; the job queue retries it.
+        OSError: If the SMTP server could not be reached; the job queue retries it.
     '''
     
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+    await mailer.send(confirmation_message(email, username, host))
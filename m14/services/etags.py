@@ -0,0 +1,103 @@
+import hashlib
+import re
+from typing import Iterable, Tuple
+
+from fastapi import HTTPException, Response, status
+
+
+def contact_etag(contact_id: int, version: int) -> str:
+    '''
+    Strong ETag of a single contact.
+
+    Args:
+        contact_id (int): The contact ID.
+        version (int): The contact's row version.
+
+    Returns:
+        str: The quoted ETag, e.g. "12-3".
+    '''
+
+    return f'"{contact_id}-{version}"'
+
+
+def collection_etag(user_id: int, version: int, query: Iterable[Tuple[str, str]]) -> str:
+    '''
+    Strong ETag of a contacts listing.
+
+    The same collection version can produce different payloads for different
+    pages or searches, so the normalized query parameters are part of the tag.
+
+    Args:
+        user_id (int): The owner of the contacts.
+        version (int): The user's contacts_version.
+        query (Iterable[Tuple[str, str]]): The request's query parameters.
+
+    Returns:
+        str: The quoted ETag.
+    '''
+
+    digest = hashlib.sha1(repr(sorted(query)).encode()).hexdigest()[:16]
+    return f'"c{user_id}-{version}-{digest}"'
+
+
+def _tags(header: str) -> list:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    '''
+    Check an If-None-Match header against the current ETag (weak comparison).
+
+    Args:
+        header (str, optional): The If-None-Match header value.
+        etag (str): The current ETag.
+
+    Returns:
+        bool: True if the client's copy is current.
+    '''
+
+    if not header:
+        return False
+    tags = _tags(header)
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    '''
+    Build an empty 304 response carrying the ETag.
+
+    Args:
+        etag (str): The current ETag.
+
+    Returns:
+        Response: The 304 Not Modified response.
+    '''
+
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def if_match_version(header: str | None, contact_id: int) -> int | None:
+    '''
+    Extract the contact version a client expects from an If-Match header (strong comparison).
+
+    Args:
+        header (str, optional): The If-Match header value.
+        contact_id (int): The contact being modified.
+
+    Returns:
+        int | None: The expected version, or None when the header is absent or "*".
+
+    Raises:
+        HTTPException: 412 if the header names no version of this contact.
+    '''
+
+    if not header:
+        return None
+    tags = [tag.strip() for tag in header.split(",")]
+    if "*" in tags:
+        return None
+    for tag in tags:
+        match = re.fullmatch(rf'"{contact_id}-(\d+)"', tag)
+        if match:
+            return int(match.group(1))
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Contact has been modified")
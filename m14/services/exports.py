@@ -0,0 +1,33 @@
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from m14.database.db import SessionLocal
+from m14.repository import contacts as repository_contacts
+from m14.services.contacts_io import export_chunks
+
+BATCH_SIZE = 1000
+
+
+async def stream_export(user, fmt: str, batch_size: int = BATCH_SIZE,
+                        sessionmaker: async_sessionmaker | None = None) -> AsyncIterator[bytes]:
+    '''
+    Produce a full export of the user's contacts for a StreamingResponse.
+
+    The generator opens its own session because the response body is sent
+    after the request dependencies, including get_db, have been torn down.
+
+    Args:
+        user (User): The user whose contacts are exported.
+        fmt (str): "csv", "ndjson" or "vcard".
+        batch_size (int, optional): Rows fetched and serialized per chunk. Defaults to BATCH_SIZE.
+        sessionmaker (async_sessionmaker, optional): Where to read from, e.g. the read replica.
+            Defaults to the primary's SessionLocal.
+
+    Yields:
+        bytes: Chunks of the export file.
+    '''
+
+    async with (sessionmaker or SessionLocal)() as db:
+        async for chunk in export_chunks(fmt, repository_contacts.stream_contacts(user, db, batch_size)):
+            yield chunk
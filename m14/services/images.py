@@ -0,0 +1,64 @@
+import hashlib
+import io
+from typing import Dict, Sequence
+
+AVATAR_SIZES = (64, 128, 250)
+WEBP_QUALITY = 80
+# Refuse decompression bombs: a 5 MiB file can otherwise decode to gigabytes.
+MAX_PIXELS = 25_000_000
+
+
+def content_hash(data: bytes) -> str:
+    '''
+    Content address of an uploaded image.
+
+    Args:
+        data (bytes): The original upload.
+
+    Returns:
+        str: The SHA-256 hex digest.
+    '''
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def process_avatar(data: bytes, sizes: Sequence[int] = AVATAR_SIZES, quality: int = WEBP_QUALITY) -> Dict[int, bytes]:
+    '''
+    Decode an avatar and re-encode square WebP thumbnails of it.
+
+    CPU-bound; meant to run in a process pool. The image is turned upright
+    according to its EXIF orientation, centre-cropped to a square and
+    downscaled with Lanczos filtering. EXIF and other metadata are dropped.
+
+    Args:
+        data (bytes): The original upload.
+        sizes (Sequence[int], optional): Edge lengths in pixels. Defaults to AVATAR_SIZES.
+        quality (int, optional): WebP quality. Defaults to WEBP_QUALITY.
+
+    Returns:
+        Dict[int, bytes]: The WebP image for each size.
+
+    Raises:
+        ValueError: If the data is not a decodable image or has more than MAX_PIXELS pixels.
+    '''
+
+    # Pillow is only needed in the image processes, not in the API process that imports this module.
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width * image.height > MAX_PIXELS:
+                raise ValueError(f"Image has more than {MAX_PIXELS} pixels")
+            image.draft("RGB", (max(sizes), max(sizes)))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+                                  else "RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Invalid image: {e}")
+    outputs = {}
+    for size in sizes:
+        thumbnail = ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format="WEBP", quality=quality, method=4)
+        outputs[size] = buffer.getvalue()
+    return outputs
@@ -0,0 +1,244 @@
+import asyncio
+import bisect
+import itertools
+import os
+import tempfile
+import uuid
+from functools import partial
+from typing import Iterator, List, Optional, Tuple, Union
+
+from fastapi import UploadFile
+from pydantic import ValidationError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from m14.database.db import SessionLocal
+from m14.database.replica import replica_router
+from m14.repository import contacts as repository_contacts
+from m14.schemas import ContactsIn, ImportJobOut, ImportRowError
+from m14.services import contacts_cache
+from m14.services.cache import LRUCache
+from m14.services.contacts_io import FIELDS, FORMATS, PARSERS
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+MAX_JOBS = 1000
+JOB_TTL = 24 * 3600
+
+
+class ImportJob:
+    '''
+    State of a contacts import, kept by the worker running it.
+
+    Attributes:
+        user_id (int): Owner of the job; only they can read its progress.
+        state (ImportJobOut): Progress reported by the progress endpoint.
+    '''
+
+    def __init__(self, user_id: int, fmt: str):
+        self.user_id = user_id
+        self.state = ImportJobOut(id=uuid.uuid4().hex, status="pending", format=fmt)
+
+    def reject(self, row: int, error: str) -> None:
+        """Count a rejected row and keep the details of the MAX_REPORTED_ERRORS lowest rows, in row order.
+        Rows failing at insert are only known after later rows failed validation."""
+        self.state.failed += 1
+        bisect.insort(self.state.errors, ImportRowError(row=row, error=error), key=lambda e: e.row)
+        if len(self.state.errors) > MAX_REPORTED_ERRORS:
+            self.state.errors.pop()
+
+
+class ImportJobStore:
+    '''
+    Progress of import jobs in Redis, so any worker can report it.
+
+    The worker running an import saves the job when it is created, after each
+    batch and when it ends; a job expires ttl seconds after its last save.
+    Jobs started by this process are also kept locally, which answers for
+    them while Redis is unreachable.
+
+    Attributes:
+        redis (Redis): Async Redis client.
+        ttl (int): Lifetime of a saved job in seconds.
+        prefix (str): Key namespace.
+        local (LRUCache): Jobs started by this process by (user ID, job ID).
+        errors (int): Saves or reads that failed because of Redis.
+    '''
+
+    def __init__(self, redis: Redis, ttl: int = JOB_TTL, prefix: str = "contacts-import", local_size: int = MAX_JOBS):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self.local = LRUCache(maxsize=local_size, ttl=ttl)
+        self.errors = 0
+
+    def key(self, user_id: int, job_id: str) -> str:
+        return f"{self.prefix}:{user_id}:{job_id}"
+
+    async def save(self, job: ImportJob) -> None:
+        """Store the job's current progress."""
+        self.local.set((job.user_id, job.state.id), job)
+        try:
+            await self.redis.set(self.key(job.user_id, job.state.id), job.state.model_dump_json(), ex=self.ttl)
+        except RedisError as e:
+            print("Import job store unavailable:", e)
+            self.errors += 1
+
+    async def get(self, job_id: str, user_id: int) -> Optional[ImportJobOut]:
+        '''
+        Look up the progress of an import job owned by the given user.
+
+        Args:
+            job_id (str): The job identifier.
+            user_id (int): The user asking for it.
+
+        Returns:
+            ImportJobOut | None: The progress, or None if the job is unknown, expired or belongs to someone else.
+        '''
+
+        try:
+            payload = await self.redis.get(self.key(user_id, job_id))
+        except RedisError as e:
+            print("Import job store unavailable:", e)
+            self.errors += 1
+            payload = None
+        if payload is not None:
+            return ImportJobOut.model_validate_json(payload)
+        job = self.local.get((user_id, job_id))
+        return job.state if job is not None else None
+
+
+# The Redis client is set by the app's lifespan, see main.use_redis.
+import_jobs = ImportJobStore(None)
+
+
+async def create_job(user_id: int, fmt: str) -> ImportJob:
+    '''
+    Register a new import job.
+
+    Args:
+        user_id (int): The user starting the import.
+        fmt (str): The file format ("csv", "ndjson" or "vcard").
+
+    Returns:
+        ImportJob: The pending job.
+    '''
+
+    job = ImportJob(user_id, fmt)
+    await import_jobs.save(job)
+    return job
+
+
+async def get_job(job_id: str, user_id: int) -> Optional[ImportJobOut]:
+    '''
+    Look up the progress of an import job owned by the given user, whichever worker runs it.
+
+    Args:
+        job_id (str): The job identifier.
+        user_id (int): The user asking for it.
+
+    Returns:
+        ImportJobOut | None: The progress, or None if the job is unknown or belongs to someone else.
+    '''
+
+    return await import_jobs.get(job_id, user_id)
+
+
+async def spool_upload(file: UploadFile, fmt: str) -> str:
+    '''
+    Copy an uploaded file to a temporary file in chunks so the import can
+    outlive the request without holding the upload in memory.
+
+    Args:
+        file (UploadFile): The uploaded file.
+        fmt (str): The file format, used for the temporary file suffix.
+
+    Returns:
+        str: Path of the temporary file; run_import removes it when done.
+    '''
+
+    fd, path = tempfile.mkstemp(prefix="contacts-import-", suffix=FORMATS[fmt])
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(CHUNK_SIZE):
+            out.write(chunk)
+    return path
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+
+
+def _parse_chunk(rows: Iterator[Tuple[int, dict]], size: int) -> List[Tuple[int, Union[ContactsIn, str]]]:
+    """Read up to size rows and validate them against ContactsIn; runs in a worker thread.
+    Each row comes back as a ContactsIn or the reason it was rejected."""
+    chunk = []
+    for row, values in itertools.islice(rows, size):
+        if "__error__" in values:
+            chunk.append((row, values["__error__"]))
+            continue
+        try:
+            chunk.append((row, ContactsIn(**{field: values.get(field) for field in FIELDS})))
+        except ValidationError as e:
+            chunk.append((row, _validation_message(e)))
+    return chunk
+
+
+async def _flush(job: ImportJob, batch: List[Tuple[int, ContactsIn]], user, db) -> None:
+    results = await repository_contacts.create_contacts([body for _, body in batch], user, db)
+    await contacts_cache.invalidate(user)
+    await replica_router.mark_write(user.id)
+    for (row, _), error in zip(batch, results):
+        if error is None:
+            job.state.inserted += 1
+        else:
+            job.reject(row, error)
+    batch.clear()
+    await import_jobs.save(job)
+
+
+async def run_import(job: ImportJob, path: str, user, batch_size: int = BATCH_SIZE) -> None:
+    '''
+    Stream-parse a spooled file, validate rows against ContactsIn and insert
+    them in batches, saving the job's progress after each batch. The file is
+    read, parsed and validated batch_size rows at a time in the default
+    executor, so a large upload does not stall other requests on the loop.
+
+    Args:
+        job (ImportJob): The job to run.
+        path (str): The spooled upload, deleted afterwards.
+        user (User): The user who owns the imported contacts.
+        batch_size (int, optional): Rows per multi-row INSERT. Defaults to BATCH_SIZE.
+    '''
+
+    job.state.status = "running"
+    await import_jobs.save(job)
+    loop = asyncio.get_running_loop()
+    try:
+        lines = await loop.run_in_executor(None, partial(open, path, encoding="utf-8-sig", newline=""))
+        try:
+            rows = PARSERS[job.state.format](lines)
+            async with SessionLocal() as db:
+                batch: List[Tuple[int, ContactsIn]] = []
+                # Reading, parsing and validating are CPU-bound and blocking; only the inserts run on the loop.
+                while chunk := await loop.run_in_executor(None, _parse_chunk, rows, batch_size):
+                    for row, parsed in chunk:
+                        job.state.processed += 1
+                        if isinstance(parsed, str):
+                            job.reject(row, parsed)
+                        else:
+                            batch.append((row, parsed))
+                    if len(batch) >= batch_size:
+                        await _flush(job, batch, user, db)
+                if batch:
+                    await _flush(job, batch, user, db)
+        finally:
+            lines.close()
+        job.state.status = "done"
+    except Exception as e:
+        print("Contacts import failed:", e)
+        job.state.status = "failed"
+        job.reject(0, f"Import aborted: {type(e).__name__}")
+    finally:
+        os.remove(path)
+        await import_jobs.save(job)
@@ -0,0 +1,274 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError, WatchError
+
+from m14.conf.config import settings
+
+
+class JobQueue:
+    '''
+    Durable job queue on a Redis stream, consumed by `python -m m14.worker`.
+
+    Jobs are stream entries ``{name, kwargs, attempt}`` read through a consumer
+    group, and are acknowledged and deleted once their handler returns. A
+    failed job is retried with exponential backoff: it waits in a sorted set
+    scored by due time and is moved back onto the stream when due. After
+    max_attempts it goes to the dead-letter stream ``<stream>:dead`` with its
+    last error. Entries left pending by a crashed worker for claim_idle seconds
+    are claimed by another worker, so handlers should tolerate running twice.
+
+    Attributes:
+        redis (Redis): Async Redis client created with decode_responses=True.
+        stream (str): The jobs stream.
+        group (str): The consumer group shared by all workers.
+        delayed (str): Sorted set of jobs waiting for a retry.
+        dead (str): Dead-letter stream.
+        max_attempts (int): Attempts before a job is dead-lettered.
+        backoff_base (float): Delay before the first retry in seconds; doubled on each further retry.
+        backoff_max (float): Upper bound of the retry delay in seconds.
+        claim_idle (float): Seconds after which another worker's pending job is taken over.
+        handlers (Dict[str, Callable]): Registered handlers by job name.
+        limits (Dict[str, asyncio.Semaphore]): Per-name limits on jobs running at once.
+        processed (int): Jobs completed by this process.
+        retried (int): Failures scheduled for a retry.
+        dead_lettered (int): Jobs moved to the dead-letter stream.
+    '''
+
+    def __init__(self, redis: Redis, stream: str = "jobs", group: str = "workers", max_attempts: int = 5,
+                 backoff_base: float = 2, backoff_max: float = 600, claim_idle: float = 300):
+        self.redis = redis
+        self.stream = stream
+        self.group = group
+        self.delayed = f"{stream}:delayed"
+        self.dead = f"{stream}:dead"
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_idle = claim_idle
+        self.handlers: Dict[str, Callable[..., Awaitable]] = {}
+        self.limits: Dict[str, asyncio.Semaphore] = {}
+        self.processed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def register(self, name: str, handler: Callable[..., Awaitable], limit: Optional[int] = None) -> None:
+        '''
+        Register the coroutine function that runs jobs of the given name.
+
+        Args:
+            name (str): The job name used with enqueue().
+            handler (Callable[..., Awaitable]): Called with the job's keyword arguments.
+            limit (int, optional): Maximum jobs of this name running at once per worker.
+        '''
+
+        self.handlers[name] = handler
+        if limit:
+            self.limits[name] = asyncio.Semaphore(limit)
+
+    async def enqueue(self, name: str, **kwargs) -> str:
+        '''
+        Add a job to the stream.
+
+        Args:
+            name (str): The registered job name.
+            **kwargs: JSON-serializable arguments for the handler.
+
+        Returns:
+            str: The stream entry ID.
+        '''
+
+        return await self.redis.xadd(self.stream, {"name": name, "kwargs": orjson.dumps(kwargs).decode(),
+                                                   "attempt": 0})
+
+    def backoff(self, attempt: int) -> float:
+        """Retry delay after the given failed attempt, with jitter over its upper half."""
+        delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def ensure_group(self) -> None:
+        """Create the stream and consumer group if they do not exist yet."""
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def promote_due(self, limit: int = 100) -> int:
+        '''
+        Move retries whose backoff has elapsed back onto the stream.
+
+        The move is a single MULTI under WATCH, so a job is neither lost nor
+        moved twice when several workers promote at once.
+
+        Args:
+            limit (int, optional): Maximum jobs moved per call. Defaults to 100.
+
+        Returns:
+            int: The number of jobs moved.
+        '''
+
+        async with self.redis.pipeline() as pipe:
+            try:
+                await pipe.watch(self.delayed)
+                due = await pipe.zrangebyscore(self.delayed, "-inf", time.time(), start=0, num=limit)
+                if not due:
+                    return 0
+                pipe.multi()
+                pipe.zrem(self.delayed, *due)
+                for member in due:
+                    pipe.xadd(self.stream, orjson.loads(member))
+                await pipe.execute()
+            except WatchError:
+                return 0
+        return len(due)
+
+    async def _fail(self, entry_id: str, fields: dict, error: Exception) -> None:
+        attempt = int(fields["attempt"]) + 1
+        job = {**fields, "id": fields.get("id", entry_id), "attempt": attempt,
+               "error": f"{type(error).__name__}: {error}"}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if attempt >= self.max_attempts:
+                pipe.xadd(self.dead, {**job, "failed_at": int(time.time())})
+                self.dead_lettered += 1
+                print(f"Job {job['name']} {job['id']} dead-lettered after {attempt} attempts: {job['error']}")
+            else:
+                pipe.zadd(self.delayed, {orjson.dumps(job).decode(): time.time() + self.backoff(attempt)})
+                self.retried += 1
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+
+    async def handle(self, entry_id: str, fields: dict) -> None:
+        '''
+        Run one job and acknowledge it, scheduling a retry or dead-lettering it on failure.
+
+        Args:
+            entry_id (str): The stream entry ID.
+            fields (dict): The entry's fields.
+        '''
+
+        name = fields["name"]
+        try:
+            handler = self.handlers.get(name)
+            if handler is None:
+                raise LookupError(f"No handler registered for job {name!r}")
+            limit = self.limits.get(name)
+            if limit is None:
+                await handler(**orjson.loads(fields["kwargs"]))
+            else:
+                async with limit:
+                    await handler(**orjson.loads(fields["kwargs"]))
+        except Exception as e:
+            await self._fail(entry_id, fields, e)
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+        self.processed += 1
+
+    async def claim_stale(self, consumer: str, count: int) -> list:
+        """Take over up to count jobs another worker left pending for claim_idle seconds."""
+        _, entries, _ = await self.redis.xautoclaim(self.stream, self.group, consumer,
+                                                    min_idle_time=int(self.claim_idle * 1000),
+                                                    start_id="0-0", count=count)
+        return entries
+
+    async def read(self, consumer: str, count: int, block: int = 1000) -> list:
+        """Read up to count new jobs, waiting at most block milliseconds."""
+        response = await self.redis.xreadgroup(self.group, consumer, {self.stream: ">"}, count=count, block=block)
+        return [entry for _, entries in response for entry in entries]
+
+    async def step(self, consumer: str, count: int = 10, block: int = 1000) -> int:
+        '''
+        Promote due retries, then read and run one batch of jobs.
+
+        Args:
+            consumer (str): This worker's consumer name.
+            count (int, optional): Maximum jobs run. Defaults to 10.
+            block (int, optional): Milliseconds to wait for new jobs. Defaults to 1000.
+
+        Returns:
+            int: The number of jobs run.
+        '''
+
+        await self.promote_due()
+        entries = await self.claim_stale(consumer, count) or await self.read(consumer, count, block)
+        await asyncio.gather(*(self.handle(entry_id, fields) for entry_id, fields in entries))
+        return len(entries)
+
+    async def run(self, consumer: str, concurrency: int = 20, block: int = 1000,
+                  stop: Optional[asyncio.Event] = None) -> None:
+        '''
+        Process jobs until stop is set, with at most concurrency jobs running at once.
+
+        Args:
+            consumer (str): This worker's consumer name, unique per process.
+            concurrency (int, optional): Maximum jobs running at once. Defaults to 20.
+            block (int, optional): Milliseconds to wait for new jobs per read. Defaults to 1000.
+            stop (asyncio.Event, optional): Set to finish the running jobs and return.
+        '''
+
+        stop = stop or asyncio.Event()
+        running = set()
+        next_claim = 0.0
+        ready = False
+
+        def finished(task: asyncio.Task) -> None:
+            running.discard(task)
+            if not task.cancelled() and task.exception():
+                print("Job left pending, it will be claimed again:", task.exception())
+
+        while not stop.is_set():
+            if len(running) >= concurrency:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            try:
+                if not ready:
+                    await self.ensure_group()
+                    ready = True
+                await self.promote_due()
+                entries = []
+                if time.monotonic() >= next_claim:
+                    entries = await self.claim_stale(consumer, concurrency - len(running))
+                    next_claim = time.monotonic() + self.claim_idle / 10
+                if not entries:
+                    entries = await self.read(consumer, concurrency - len(running), block)
+            except RedisError as e:
+                print("Job queue unavailable:", e)
+                await asyncio.sleep(1)
+                continue
+            if not entries:
+                # Let running jobs progress even if the read returned without blocking.
+                await asyncio.sleep(0)
+            for entry_id, fields in entries:
+                task = asyncio.create_task(self.handle(entry_id, fields))
+                running.add(task)
+                task.add_done_callback(finished)
+        if running:
+            await asyncio.wait(running)
+
+    async def stats(self) -> dict:
+        """Queue depths in Redis (None while Redis is unreachable) and this process's counters."""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xlen(self.stream)
+                pipe.zcard(self.delayed)
+                pipe.xlen(self.dead)
+                queued, delayed, dead = await pipe.execute()
+        except RedisError as e:
+            print("Job queue stats unavailable:", e)
+            queued = delayed = dead = None
+        return {"queued": queued, "delayed": delayed, "dead": dead, "processed": self.processed,
+                "retried": self.retried, "dead_lettered": self.dead_lettered}
+
+
+# The Redis client is set by the app's lifespan (main.use_redis) or by the worker.
+job_queue = JobQueue(None,
+                     max_attempts=settings.jobs_max_attempts, backoff_base=settings.jobs_backoff_base,
+                     backoff_max=settings.jobs_backoff_max, claim_idle=settings.jobs_claim_idle)
@@ -0,0 +1,275 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from typing import Callable, List, Optional, Sequence
+
+import aiosmtplib
+from aiosmtplib.errors import SMTPRecipientsRefused, SMTPResponseException
+
+from m14.metrics import SMTP_CONNECT_LATENCY, SMTP_MESSAGES, SMTP_SEND_LATENCY
+
+# Errors that reject one message but leave the SMTP session usable; aiosmtplib
+# has already sent RSET. Everything else (OSError subclasses) breaks the session,
+# and so does a 4xx reply (see is_transient).
+MESSAGE_ERRORS = (SMTPResponseException, SMTPRecipientsRefused)
+
+
+def is_transient(error: Exception) -> bool:
+    """A 4xx reply (421 closing channel, 451 local error...): drop the session and retry, don't fail the message."""
+    return isinstance(error, SMTPResponseException) and 400 <= error.code < 500
+
+
+class SMTPConnection:
+    '''
+    A logged-in SMTP session kept open between messages.
+
+    Attributes:
+        smtp (aiosmtplib.SMTP): The client.
+        sent (int): Messages sent over this session.
+        last_used (float): time.monotonic() of the last checkin.
+    '''
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    async def send(self, message: EmailMessage) -> None:
+        with SMTP_SEND_LATENCY.time():
+            await self.smtp.send_message(message)
+        self.sent += 1
+
+    async def close(self) -> None:
+        try:
+            await self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+
+class SMTPPool:
+    '''
+    Bounded pool of keep-alive SMTP sessions.
+
+    A session idle for longer than keepalive is probed with NOOP before reuse,
+    and one idle for longer than idle_timeout (servers drop idle clients after
+    a minute or so) or that has sent max_messages is replaced.
+
+    Attributes:
+        factory (Callable[[], aiosmtplib.SMTP]): Builds an unconnected client.
+        size (int): Maximum number of open sessions.
+        username (str, optional): Login user; no AUTH when None.
+        password (str, optional): Login password.
+        connects (int): Sessions opened.
+        reuses (int): Checkouts served by an already open session.
+    '''
+
+    def __init__(self, factory: Callable[[], aiosmtplib.SMTP], size: int = 2, username: Optional[str] = None,
+                 password: Optional[str] = None, keepalive: float = 10, idle_timeout: float = 50,
+                 max_messages: int = 100):
+        self.factory = factory
+        self.size = size
+        self.username = username
+        self.password = password
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.connects = 0
+        self.reuses = 0
+        self._idle: List[SMTPConnection] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> SMTPConnection:
+        smtp = self.factory()
+        with SMTP_CONNECT_LATENCY.time():
+            await smtp.connect()
+            if self.username:
+                await smtp.login(self.username, self.password)
+        self.connects += 1
+        return SMTPConnection(smtp)
+
+    async def _alive(self, connection: SMTPConnection) -> bool:
+        idle = time.monotonic() - connection.last_used
+        if not connection.smtp.is_connected or idle > self.idle_timeout:
+            return False
+        if idle > self.keepalive:
+            try:
+                await connection.smtp.noop()
+            except (OSError, SMTPResponseException):
+                return False
+        return True
+
+    async def _checkout(self) -> SMTPConnection:
+        while self._idle:
+            connection = self._idle.pop()
+            if await self._alive(connection):
+                self.reuses += 1
+                return connection
+            await connection.close()
+        return await self._connect()
+
+    @asynccontextmanager
+    async def connection(self):
+        '''
+        Borrow a session, opening one if none is idle.
+
+        A session that raised anything but a per-message rejection is closed
+        instead of being returned to the pool.
+
+        Yields:
+            SMTPConnection: The session.
+        '''
+
+        async with self._slots:
+            connection = await self._checkout()
+            try:
+                yield connection
+            except BaseException:
+                await connection.close()
+                raise
+            connection.last_used = time.monotonic()
+            if connection.sent >= self.max_messages or not connection.smtp.is_connected:
+                await connection.close()
+            else:
+                self._idle.append(connection)
+
+    async def close(self) -> None:
+        """Quit every idle session."""
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await connection.close()
+
+
+class SMTPMailer:
+    '''
+    Sends messages in batches over pooled SMTP sessions.
+
+    send() queues one message and waits for it; up to `pool.size` worker
+    tasks, started on first use, drain the queue batch_size messages at a time
+    over a single session. send_many() sends a known list directly.
+
+    Attributes:
+        pool (SMTPPool): The SMTP sessions.
+        batch_size (int): Messages sent over one checkout.
+        sent (int): Messages accepted by the server.
+        failed (int): Messages that could not be delivered to the server.
+    '''
+
+    def __init__(self, pool: SMTPPool, batch_size: int = 50):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.sent = 0
+        self.failed = 0
+        self._queue: asyncio.Queue | None = None
+        self._workers: List[asyncio.Task] = []
+
+    async def _send_batch(self, messages: Sequence[EmailMessage]) -> List[Optional[Exception]]:
+        '''
+        Send messages over one session, moving on to a new one after max_messages or, once, after a drop
+        or a transient (4xx) reply.
+
+        Args:
+            messages (Sequence[EmailMessage]): The messages.
+
+        Returns:
+            List[Optional[Exception]]: Per message, None when sent or the error.
+        '''
+
+        results: List[Optional[Exception]] = [None] * len(messages)
+        pending = list(range(len(messages)))
+        drops = 0
+        while pending:
+            try:
+                async with self.pool.connection() as connection:
+                    while pending and connection.sent < self.pool.max_messages:
+                        try:
+                            await connection.send(messages[pending[0]])
+                        except MESSAGE_ERRORS as e:
+                            if is_transient(e):
+                                raise
+                            results[pending[0]] = e
+                        pending.pop(0)
+            except (OSError, SMTPResponseException) as e:
+                if not isinstance(e, OSError) and not is_transient(e):
+                    raise
+                drops += 1
+                if drops > 1:
+                    for index in pending:
+                        results[index] = e
+                    break
+        failed = sum(error is not None for error in results)
+        self.sent += len(messages) - failed
+        self.failed += failed
+        SMTP_MESSAGES.labels("sent").inc(len(messages) - failed)
+        SMTP_MESSAGES.labels("failed").inc(failed)
+        return results
+
+    async def send_many(self, messages: Sequence[EmailMessage]) -> List[Optional[Exception]]:
+        '''
+        Send many messages, batch_size per session, over up to pool.size sessions at once.
+
+        Args:
+            messages (Sequence[EmailMessage]): The messages.
+
+        Returns:
+            List[Optional[Exception]]: Per message, in order, None when sent or the error.
+        '''
+
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        results = await asyncio.gather(*(self._send_batch(batch) for batch in batches))
+        return [error for batch in results for error in batch]
+
+    async def _work(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                errors = await self._send_batch([message for message, _ in batch])
+            except Exception as e:
+                errors = [e] * len(batch)
+            for (_, future), error in zip(batch, errors):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+    def _start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.pool.size:
+            self._workers.append(asyncio.create_task(self._work()))
+
+    async def send(self, message: EmailMessage) -> None:
+        '''
+        Queue a message for the next batch and wait until the server has accepted it.
+
+        Args:
+            message (EmailMessage): The message.
+
+        Raises:
+            SMTPException: If the server rejected the message.
+            OSError: If no SMTP session could be opened or kept.
+        '''
+
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, future))
+        await future
+
+    async def close(self) -> None:
+        """Stop the workers and quit the pooled sessions."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        await self.pool.close()
+
+    def stats(self) -> dict:
+        """Delivery and connection counters."""
+        return {"sent": self.sent, "failed": self.failed, "queued": self._queue.qsize() if self._queue else 0,
+                "connects": self.pool.connects, "reuses": self.pool.reuses, "idle": len(self.pool._idle)}
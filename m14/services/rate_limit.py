@@ -0,0 +1,336 @@
+import asyncio
+import math
+import time
+from typing import Callable, List, Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from m14.conf.config import settings
+from m14.schemas import UserOut
+from m14.services.auth import auth_service
+from m14.services.cache import LRUCache
+
+
+class Policy:
+    '''
+    A rate limit: at most `limit` requests per `period` seconds for each client.
+
+    Attributes:
+        name (str): Identifies the policy in Redis keys and in the RateLimit-Policy header.
+        limit (int): Requests allowed per period; also the burst a client may send at once.
+        period (int): Window length in seconds.
+        key (str): "ip" to count per client address, "user" per authenticated user.
+    '''
+
+    def __init__(self, name: str, limit: int, period: int, key: str = "ip"):
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.key = key
+
+    @property
+    def rate(self) -> float:
+        """Tokens added to a local bucket per second."""
+        return self.limit / self.period
+
+    def header(self) -> str:
+        """RateLimit-Policy value, e.g. ``5;w=60``."""
+        return f"{self.limit};w={self.period}"
+
+
+DEFAULT = Policy("default", 120, 60)
+LOGIN = Policy("login", 10, 60)
+AUTH_EMAIL = Policy("auth-email", 5, 300)
+SEARCH = Policy("search", 60, 60, key="user")
+CREATE_CONTACT = Policy("create-contact", 5, 60, key="user")
+
+
+class Bucket:
+    '''
+    Local state of one policy for one client.
+
+    Attributes:
+        tokens (float): Requests this process may admit right now.
+        updated (float): time.monotonic() of the last refill.
+        window (int): The Redis window the counters below belong to.
+        used (int): Requests counted in Redis for the window at the last sync, from every process.
+        pending (int): Requests admitted here since the last sync.
+        synced_at (float): time.monotonic() of the last sync attempt.
+        syncing (bool): A sync is in flight.
+    '''
+
+    def __init__(self, tokens: float):
+        self.tokens = tokens
+        self.updated = time.monotonic()
+        self.window = -1
+        self.used = 0
+        self.pending = 0
+        self.synced_at = 0.0
+        self.syncing = False
+
+
+class Decision:
+    '''
+    Outcome of one check, rendered as RateLimit-* headers.
+
+    Attributes:
+        policy (Policy): The policy checked.
+        allowed (bool): Whether the request may proceed.
+        remaining (int): Requests left for the client.
+        reset (int): Seconds until the quota is restored.
+        retry_after (int): Seconds the client should wait when not allowed.
+    '''
+
+    def __init__(self, policy: Policy, allowed: bool, remaining: int, reset: int, retry_after: int = 0):
+        self.policy = policy
+        self.allowed = allowed
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> dict:
+        headers = {"RateLimit-Limit": str(self.policy.limit), "RateLimit-Remaining": str(self.remaining),
+                   "RateLimit-Reset": str(self.reset), "RateLimit-Policy": self.policy.header()}
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class RateLimiter:
+    '''
+    Rate limiter that decides in process and reconciles with Redis periodically.
+
+    Each process keeps a token bucket per policy and client, refilled at
+    limit / period tokens per second, which admits or rejects requests without
+    I/O and smooths bursts across window boundaries. Every sync_interval
+    seconds (and when a new window starts) a background task adds the
+    requests a bucket admitted to a fixed-window counter in Redis with one
+    pipelined INCRBY and learns how many every process admitted; requests
+    never wait for it and are decided against the last known counts. A bucket
+    whose window is spent rejects until the next window. Between syncs each process may therefore
+    admit what was left of the window at its last sync, so the overshoot is
+    bounded by workers x sync_interval of traffic. When Redis is unreachable the
+    buckets keep limiting each process on its own.
+
+    Attributes:
+        redis (Redis): Async Redis client.
+        sync_interval (float): Seconds between syncs of a bucket.
+        buckets (LRUCache): Local buckets by (policy name, client key).
+        prefix (str): Prefix of the Redis counter keys.
+        enabled (bool): Checks always pass when False.
+        allowed (int): Requests admitted by this process.
+        rejected (int): Requests rejected by this process.
+        syncs (int): Round trips to Redis.
+        errors (int): Syncs that failed.
+        tasks (set): Syncs in flight.
+    '''
+
+    def __init__(self, redis: Redis, sync_interval: float = 1, max_buckets: int = 10000, prefix: str = "ratelimit",
+                 enabled: bool = True):
+        self.redis = redis
+        self.sync_interval = sync_interval
+        self.buckets = LRUCache(maxsize=max_buckets)
+        self.prefix = prefix
+        self.enabled = enabled
+        self.allowed = 0
+        self.rejected = 0
+        self.syncs = 0
+        self.errors = 0
+        self.tasks = set()
+
+    def counter_key(self, policy: Policy, key: str, window: int) -> str:
+        return f"{self.prefix}:{policy.name}:{key}:{window}"
+
+    async def sync(self, policy: Policy, key: str, bucket: Bucket, window: int) -> None:
+        '''
+        Push the requests admitted since the last sync to Redis and read the window's total.
+
+        Runs as a background task scheduled by hit. If the bucket moved on to a
+        new window before the task started, the sync is skipped; hit schedules
+        one for the new window.
+
+        Args:
+            policy (Policy): The bucket's policy.
+            key (str): The client key.
+            bucket (Bucket): The bucket.
+            window (int): The current window.
+        '''
+
+        if window != bucket.window:
+            bucket.syncing = False
+            return
+        pending = bucket.pending
+        bucket.syncing = True
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.incrby(self.counter_key(policy, key, window), pending)
+                pipe.expire(self.counter_key(policy, key, window), policy.period + 1)
+                total, _ = await pipe.execute()
+        except RedisError as e:
+            self.errors += 1
+            print("Rate limit sync failed:", e)
+            return
+        finally:
+            bucket.syncing = False
+            self.syncs += 1
+        if bucket.window == window:
+            bucket.used = total
+            bucket.pending -= pending
+
+    async def hit(self, policy: Policy, key: str) -> Decision:
+        '''
+        Count one request against a policy, scheduling a sync of the bucket with Redis when due.
+
+        Args:
+            policy (Policy): The policy.
+            key (str): Identifies the client, e.g. an IP address or user ID.
+
+        Returns:
+            Decision: Whether the request is allowed, with the quota left.
+        '''
+
+        now = time.time()
+        window = int(now // policy.period)
+        bucket = self.buckets.get((policy.name, key))
+        if bucket is None:
+            bucket = Bucket(policy.limit)
+        if window != bucket.window:
+            # What other processes admitted in the new window is learnt with the sync below.
+            bucket.window, bucket.used, bucket.pending = window, 0, 0
+            bucket.synced_at = 0.0
+        if not bucket.syncing and time.monotonic() - bucket.synced_at >= self.sync_interval:
+            # Also extends the life of an active bucket in the LRU.
+            self.buckets.set((policy.name, key), bucket, ttl=2 * policy.period)
+            bucket.syncing = True
+            bucket.synced_at = time.monotonic()
+            task = asyncio.create_task(self.sync(policy, key, bucket, window))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+        clock = time.monotonic()
+        bucket.tokens = min(policy.limit, bucket.tokens + (clock - bucket.updated) * policy.rate)
+        bucket.updated = clock
+        left = policy.limit - bucket.used - bucket.pending
+        reset = math.ceil((window + 1) * policy.period - now)
+        if bucket.tokens >= 1 and left >= 1:
+            bucket.tokens -= 1
+            bucket.pending += 1
+            self.allowed += 1
+            return Decision(policy, True, int(min(bucket.tokens, left - 1)), reset)
+        self.rejected += 1
+        retry_after = reset if left < 1 else math.ceil((1 - bucket.tokens) / policy.rate)
+        return Decision(policy, False, 0, reset, retry_after)
+
+    async def drain(self) -> None:
+        """Wait for the syncs in flight, e.g. before closing the Redis client."""
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Counters of this process."""
+        return {"allowed": self.allowed, "rejected": self.rejected, "syncs": self.syncs, "errors": self.errors,
+                "buckets": len(self.buckets)}
+
+
+# Limiter of apps that have none of their own; main.create_app gives each app one on app.state.
+rate_limiter = RateLimiter(None,
+                           sync_interval=settings.rate_limit_sync_interval,
+                           max_buckets=settings.rate_limit_buckets, enabled=settings.rate_limit_enabled)
+
+
+def limiter_for(request: Request) -> RateLimiter:
+    """The limiter of the request's app (app.state.rate_limiter), else the module's rate_limiter."""
+    return getattr(request.app.state, "rate_limiter", rate_limiter)
+
+
+async def check(request: Request, policy: Policy, key: str) -> None:
+    '''
+    Apply a policy to a request and record the decision for the RateLimit-* headers.
+
+    Args:
+        request (Request): The request.
+        policy (Policy): The policy.
+        key (str): The client key.
+
+    Raises:
+        HTTPException: 429 with Retry-After if the client is over the limit.
+    '''
+
+    limiter = limiter_for(request)
+    if not limiter.enabled:
+        return
+    decision = await limiter.hit(policy, key)
+    decisions: List[Decision] = getattr(request.state, "rate_limits", [])
+    decisions.append(decision)
+    request.state.rate_limits = decisions
+    if not decision.allowed:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests",
+                            headers=decision.headers())
+
+
+def client_ip(request: Request) -> str:
+    """The client address; run uvicorn with --proxy-headers behind a trusted proxy."""
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit(policy: Policy) -> Callable:
+    '''
+    Build a dependency enforcing a policy, per client IP or per authenticated user.
+
+    Example:
+        ``@router.post("/login", dependencies=[Depends(rate_limit(LOGIN))])``
+
+    Args:
+        policy (Policy): The policy.
+
+    Returns:
+        Callable: The dependency.
+    '''
+
+    if policy.key == "user":
+        async def per_user(request: Request, current_user: UserOut = Depends(auth_service.get_current_user)) -> None:
+            await check(request, policy, str(current_user.id))
+        return per_user
+
+    async def per_ip(request: Request) -> None:
+        await check(request, policy, client_ip(request))
+    return per_ip
+
+
+def tightest(decisions: List[Decision]) -> Optional[Decision]:
+    """The decision to report when several policies applied: a rejection, else the fewest remaining."""
+    if not decisions:
+        return None
+    return min(decisions, key=lambda decision: (decision.allowed, decision.remaining))
+
+
+class RateLimitHeadersMiddleware:
+    '''
+    ASGI middleware adding the RateLimit-* headers of the tightest policy checked for a request.
+
+    The dependencies record their decisions on request.state, which lives in
+    the ASGI scope, so the headers also reach responses that endpoints build
+    themselves (streaming, ORJSONResponse, file responses).
+    '''
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                decision = tightest(scope.get("state", {}).get("rate_limits", []))
+                if decision is not None:
+                    headers = list(message.get("headers", []))
+                    present = {name.lower() for name, _ in headers}
+                    headers += [(name.lower().encode(), value.encode()) for name, value in decision.headers().items()
+                                if name.lower().encode() not in present]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
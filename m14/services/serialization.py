@@ -0,0 +1,49 @@
+from typing import List, Sequence
+
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+from m14.conf.config import settings
+from m14.schemas import ContactsOut
+
+contacts_adapter = TypeAdapter(List[ContactsOut])
+
+
+def contacts_to_json(rows: Sequence) -> List[dict]:
+    '''
+    Turn contact rows into JSON-ready dicts without building Pydantic models.
+
+    With settings.debug the dicts are also validated against ContactsOut, so
+    a query that drifts from the schema fails loudly in development.
+
+    Args:
+        rows (Sequence[Row]): Rows selected with repository CONTACT_COLUMNS.
+
+    Returns:
+        List[dict]: One dict per row, keyed by ContactsOut field names.
+    '''
+
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    items = [dict(zip(keys, row)) for row in rows]
+    if settings.debug:
+        contacts_adapter.validate_python(items)
+    return items
+
+
+def contacts_response(rows: Sequence, **extra) -> ORJSONResponse:
+    '''
+    Build an orjson response for a list of contact rows, bypassing response_model validation.
+
+    Args:
+        rows (Sequence[Row]): Rows selected with repository CONTACT_COLUMNS.
+        **extra: Extra top-level keys (e.g. next_cursor); when given the rows are
+            wrapped as {"items": [...], **extra}.
+
+    Returns:
+        ORJSONResponse: The serialized contacts.
+    '''
+
+    items = contacts_to_json(rows)
+    return ORJSONResponse({"items": items, **extra} if extra else items)
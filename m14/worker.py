@@ -0,0 +1,49 @@
+'''
+Background job worker.
+
+Consumes the Redis stream of m14.services.jobs.job_queue, so the web workers
+only enqueue jobs and return. Run one or more next to the API:
+
+    python -m m14.worker --concurrency 20
+'''
+import argparse
+import asyncio
+import os
+import signal
+import socket
+
+from m14 import metrics
+from m14.conf.config import settings
+from m14.services import connections
+from m14.services.email_service import mailer, send_email
+from m14.services.jobs import job_queue
+
+
+def register_jobs() -> None:
+    """Register every job handler the API enqueues."""
+    job_queue.register("send_email", send_email)
+
+
+async def main(consumer: str, concurrency: int) -> None:
+    register_jobs()
+    job_queue.redis = connections.redis_client(settings, decode_responses=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"Worker {consumer} consuming {job_queue.stream} with concurrency {concurrency}")
+    try:
+        await job_queue.run(consumer, concurrency=concurrency, stop=stop)
+    finally:
+        await mailer.close()
+        await job_queue.redis.aclose()
+        job_queue.redis = None
+        metrics.mark_process_dead()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.jobs_concurrency)
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}", help="consumer name")
+    args = parser.parse_args()
+    asyncio.run(main(args.name, args.concurrency))
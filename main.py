@@ -1,11 +1,29 @@
-from fastapi import FastAPI
-from redis.asyncio import Redis
-from fastapi_limiter import FastAPILimiter
+import asyncio
+import secrets
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncEngine
 
-from m14.conf.config import settings
+from m14 import metrics
+from m14.conf.config import Settings, settings
 from m14.routes import auth, contacts, users
-import uvicorn
+from m14.services import avatars, connections
+from m14.services.auth import auth_service
+from m14.services.imports import import_jobs
+from m14.services.contacts_cache import contacts_cache
+from m14.services.jobs import job_queue
+from m14.services.rate_limit import DEFAULT, RateLimiter, RateLimitHeadersMiddleware, rate_limit
+from m14.database import db
+from m14.database.db import query_monitor
+from m14.database.pool import pool_stats
+from m14.database.queries import QueryTimingMiddleware
+from m14.database.replica import replica_router
 from dotenv import load_dotenv
 
 origins = [
@@ -13,29 +31,211 @@ origins = [
     ]
 
 load_dotenv()
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(auth.router, prefix='/api')
-app.include_router(contacts.router, prefix='/api')
-app.include_router(users.router, prefix='/api')
-
-@app.on_event("startup")
-async def startup():
-    r = await Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
-                    decode_responses=True)
-    await FastAPILimiter.init(r)
-
-@app.get("/")
+router = APIRouter()
+# Process internals (per-route latency and query counts, cache and queue state); see create_app.
+ops_router = APIRouter(include_in_schema=False)
+
+
+def require_ops_token(request: Request, authorization: str = Header(None)) -> None:
+    '''
+    Admit a request to the ops endpoints only with ``Authorization: Bearer <ops_token>``.
+
+    Args:
+        request (Request): The request; the token is in the app's settings.
+        authorization (str, optional): The Authorization header.
+
+    Raises:
+        HTTPException: 401 if the token is missing or wrong, or none is configured.
+    '''
+
+    token = request.app.state.settings.ops_token
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if not token or scheme.lower() != "bearer" or not secrets.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+@ops_router.get("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+@ops_router.get("/cache/stats")
+def cache_stats():
+    return {"contacts": contacts_cache.stats(), "users_local": {"hits": auth_service.user_cache.local.hits,
+                                                              "misses": auth_service.user_cache.local.misses},
+            "tokens": {"hits": auth_service.token_cache.hits, "misses": auth_service.token_cache.misses}}
+
+@ops_router.get("/db/pool")
+def db_pool_stats(request: Request):
+    return pool_stats(request.app.state.engine.pool)
+
+@ops_router.get("/db/queries")
+def db_query_stats():
+    return query_monitor.stats()
+
+@ops_router.get("/db/replica")
+def db_replica_stats():
+    return replica_router.stats()
+
+@ops_router.get("/jobs/stats")
+async def jobs_stats():
+    return await job_queue.stats()
+
+@ops_router.get("/ratelimit/stats")
+def rate_limit_stats(request: Request):
+    return request.app.state.rate_limiter.stats()
+
+@router.get("/")
 def read_root():
     return {"message": "Welcome in users contacts!"}
 
+
+def use_redis(client: Optional[Redis], text_client: Optional[Redis]) -> None:
+    '''
+    Point every module-level Redis user at the given clients.
+
+    Args:
+        client (Redis, optional): Client of the user and contacts caches and the replica router.
+        text_client (Redis, optional): Client of the job queue and the import job store, created with
+            decode_responses=True.
+    '''
+
+    auth_service.user_cache.redis = client
+    contacts_cache.redis = client
+    replica_router.redis = client
+    job_queue.redis = text_client
+    import_jobs.redis = text_client
+
+
+def use_engines(engine: Optional[AsyncEngine], replica_engine: Optional[AsyncEngine] = None) -> None:
+    '''
+    Bind the module-level session factories to the given engines.
+
+    Args:
+        engine (AsyncEngine, optional): The primary's engine, for db.SessionLocal.
+        replica_engine (AsyncEngine, optional): The replica's engine; None sends every read to the primary.
+    '''
+
+    db.SessionLocal.configure(bind=engine)
+    db.ReplicaSessionLocal.configure(bind=replica_engine)
+    replica_router.replica = db.ReplicaSessionLocal if replica_engine is not None else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    '''
+    Own the process's pools for as long as the server runs.
+
+    On startup the database engines, the Redis clients and the bcrypt and
+    avatar executors are built from the app's settings, kept on app.state and
+    handed to the module singletons, and the user cache starts listening for
+    invalidations. On shutdown everything is released and the singletons are
+    unbound again: the listener, the SMTP sessions and Cloudinary HTTPS
+    connections (when those modules were loaded at all), the executors, the
+    rate limiter's pending syncs, the Redis connections and the engines' pools.
+
+    Args:
+        app (FastAPI): The app; its settings are in app.state.settings.
+    '''
+
+    app_settings: Settings = app.state.settings
+    state = app.state
+    state.engine, state.replica_engine = db.create_engines(app_settings)
+    use_engines(state.engine, state.replica_engine)
+    state.redis = connections.redis_client(app_settings)
+    state.text_redis = connections.redis_client(app_settings, decode_responses=True)
+    use_redis(state.redis, state.text_redis)
+    state.rate_limiter.redis = state.redis
+    state.hash_executor = ThreadPoolExecutor(max_workers=app_settings.password_hash_workers,
+                                             thread_name_prefix="bcrypt")
+    auth_service.hash_executor = state.hash_executor
+    avatars.start(app_settings)
+    state.upload_executor, state.image_executor = avatars.upload_executor, avatars.image_executor
+    listener = asyncio.create_task(auth_service.user_cache.listen())
+    try:
+        yield
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+        # Only the job worker sends mail; the mailer exists here if something imported it anyway.
+        email_service = sys.modules.get("m14.services.email_service")
+        if email_service is not None:
+            await email_service.mailer.close()
+        avatars.close()
+        await state.rate_limiter.drain()
+        state.rate_limiter.redis = None
+        auth_service.hash_executor = None
+        state.hash_executor.shutdown(cancel_futures=True)
+        use_redis(None, None)
+        await state.redis.aclose()
+        await state.text_redis.aclose()
+        use_engines(None)
+        await state.engine.dispose()
+        if state.replica_engine is not None:
+            await state.replica_engine.dispose()
+        metrics.mark_process_dead()
+
+
+def create_app(app_settings: Settings = settings) -> FastAPI:
+    '''
+    Build the API.
+
+    Building the app (or importing this module) creates no engine, client or
+    executor; they belong to lifespan and exist only while a server runs it.
+    Serve it with ``uvicorn --factory main:create_app``; ``uvicorn main:app``
+    also works and builds one with the process settings. Each app has its own
+    rate limiter on app.state.rate_limiter. The ops endpoints
+    (/metrics and the stats) exist only with ops_endpoints_enabled and then
+    require the ops_token bearer token.
+
+    Args:
+        app_settings (Settings, optional): Settings of the database engines, Redis clients, executors and
+            rate limiter. Defaults to settings.
+
+    Returns:
+        FastAPI: The app.
+    '''
+
+    app = FastAPI(lifespan=lifespan, dependencies=[Depends(rate_limit(DEFAULT))])
+    app.state.settings = app_settings
+    # Buckets are per app; the lifespan gives the limiter its Redis client.
+    app.state.rate_limiter = RateLimiter(None, sync_interval=app_settings.rate_limit_sync_interval,
+                                         max_buckets=app_settings.rate_limit_buckets,
+                                         enabled=app_settings.rate_limit_enabled)
+
+    app.add_middleware(RateLimitHeadersMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy",
+                        "Retry-After"],
+    )
+    app.add_middleware(QueryTimingMiddleware, monitor=query_monitor)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    app.include_router(auth.router, prefix='/api')
+    app.include_router(contacts.router, prefix='/api')
+    app.include_router(users.router, prefix='/api')
+    app.include_router(router)
+    if app_settings.ops_endpoints_enabled:
+        app.include_router(ops_router, dependencies=[Depends(require_ops_token)])
+    return app
+
+
+def __getattr__(name: str):
+    # Keeps `uvicorn main:app` working: the app is built on first access, which opens nothing.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.2", port=8000)
\ No newline at end of file
+    import uvicorn
+
+    uvicorn.run("main:create_app", factory=True, host="127.0.0.2", port=8000)
@@ -0,0 +1,26 @@
+"""contacts user_id index
+
+Revision ID: 3c2a9f1d7b40
+Revises: ebfd08110ce6
+Create Date: 2026-10-17 10:12:04.118230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c2a9f1d7b40'
+down_revision: Union[str, None] = 'ebfd08110ce6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
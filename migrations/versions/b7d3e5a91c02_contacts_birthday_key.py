@@ -0,0 +1,35 @@
+"""contacts birthday key
+
+Revision ID: b7d3e5a91c02
+Revises: 8e41b0c6d2f5
+Create Date: 2026-10-17 13:05:51.204417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3e5a91c02'
+down_revision: Union[str, None] = '8e41b0c6d2f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_key', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("UPDATE contacts SET birthday_key = CAST(strftime('%m%d', date_of_birth) AS INTEGER) "
+                   "WHERE date_of_birth IS NOT NULL")
+    else:
+        op.execute("UPDATE contacts SET birthday_key = "
+                   "EXTRACT(MONTH FROM date_of_birth) * 100 + EXTRACT(DAY FROM date_of_birth) "
+                   "WHERE date_of_birth IS NOT NULL")
+    op.create_index('ix_contacts_user_id_birthday_key', 'contacts', ['user_id', 'birthday_key'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_key', table_name='contacts')
+    op.drop_column('contacts', 'birthday_key')
@@ -0,0 +1,30 @@
+"""contacts versioning
+
+Revision ID: d41f6a2c8e97
+Revises: b7d3e5a91c02
+Create Date: 2026-10-17 14:21:07.518330
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f6a2c8e97'
+down_revision: Union[str, None] = 'b7d3e5a91c02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('users', sa.Column('contacts_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'contacts_version')
+    op.drop_column('contacts', 'updated_at')
+    op.drop_column('contacts', 'version')
@@ -2,19 +2,26 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
-from main import app
+from main import create_app
 from m14.database.models import Base
 from m14.database.db import get_db
+from m14.database.replica import get_read_db
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
+app = create_app()
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 @pytest.fixture(scope="module")
 def session():
 # Create the database
@@ -32,15 +39,15 @@ def session():
 def client(session):
 # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
-    yield TestClient(app)
+    with TestClient(app) as client:
+        yield client
 
 @pytest.fixture(scope="module")
 def user():
@@ -1,10 +1,10 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock
 
 from m14.database.models import User
 
 def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
-    monkeypatch.setattr("m14.routes.auth.send_email", mock_send_email)
+    mock_enqueue = AsyncMock()
+    monkeypatch.setattr("m14.routes.auth.job_queue.enqueue", mock_enqueue)
     
     response = client.post(
         "/api/auth/signup",
@@ -14,7 +14,8 @@ def test_create_user(client, user, monkeypatch):
     assert response.status_code == 201, response.text
     data = response.json()
     
-    mock_send_email.assert_called_once()
+    mock_enqueue.assert_awaited_once_with("send_email", email=user["email"], username=user["username"],
+                                          host="http://testserver/")
 
 
 def test_repeat_create_user(client, user):
@@ -0,0 +1,42 @@
+import pytest
+
+from m14.database.models import User
+from m14.services.auth import auth_service
+
+
+@pytest.fixture(scope="module")
+def headers(client, session):
+    session.add(User(username="wolverine", email="wolverine@example.com", confirmed=True,
+                     password=auth_service.pwd_context.hash("haslo1234")))
+    session.commit()
+    response = client.post("/api/auth/login", data={"username": "wolverine@example.com", "password": "haslo1234"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def contact(client, headers):
+    response = client.post("/api/contacts/create", headers=headers,
+                           json={"first_name": "Logan", "last_name": "Howlett", "email": "logan@example.com",
+                                 "phone_number": "123456789", "date_of_birth": "1970-02-16"})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def test_batch_patch_rejects_clearing_date_of_birth(client, headers, contact):
+    response = client.patch("/api/contacts/batch", headers=headers,
+                            json={"items": [{"id": contact["id"], "date_of_birth": None}]})
+    assert response.status_code == 422, response.text
+
+    response = client.get(f"/api/contacts/{contact['id']}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["date_of_birth"] == "1970-02-16"
+
+
+def test_batch_patch_updates_date_of_birth(client, headers, contact):
+    response = client.patch("/api/contacts/batch", headers=headers,
+                            json={"items": [{"id": contact["id"], "date_of_birth": "1970-02-17"}]})
+    assert response.status_code == 200, response.text
+
+    response = client.get(f"/api/contacts/{contact['id']}", headers=headers)
+    assert response.json()["date_of_birth"] == "1970-02-17"
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from m14.database.queries import QueryMonitor, QueryStats, QueryTimingMiddleware, current_queries, normalize_sql
+
+
+class TestNormalizeSql(unittest.TestCase):
+
+    def test_replaces_literals_and_placeholders(self):
+        statement = "SELECT users.id, x::text FROM users\n  WHERE users.id IN ($1, $2, $3) AND name = 'O''Brien' LIMIT 10"
+        self.assertEqual(normalize_sql(statement),
+                         "SELECT users.id, x::text FROM users WHERE users.id IN (?, ...) AND name = ? LIMIT ?")
+
+
+    def test_groups_driver_paramstyles(self):
+        self.assertEqual(normalize_sql("SELECT * FROM t_1 WHERE a = :a_1 AND b IN (?, ?) AND c = %(c)s AND d = %s"),
+                         "SELECT * FROM t_1 WHERE a = ? AND b IN (?, ...) AND c = ? AND d = ?")
+
+
+class TestQueryMonitor(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.monitor = QueryMonitor(slow_ms=0)
+        self.monitor.instrument(self.engine.sync_engine)
+        async with self.engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+            await conn.execute(text("INSERT INTO t (id) VALUES (1), (2), (3)"))
+
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+
+    async def test_attributes_statements_to_current_request(self):
+        stats = QueryStats()
+        token = current_queries.set(stats)
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT id FROM t"))
+                await conn.execute(text("UPDATE t SET id = id + 10 WHERE id > 1"))
+        finally:
+            current_queries.reset(token)
+        self.assertEqual((stats.count, stats.rows), (2, 5))
+        self.assertGreater(stats.duration, 0)
+        self.assertEqual(self.monitor.queries, 4)
+        self.assertIn('desc="2 queries, 5 rows"', stats.server_timing())
+
+
+    async def test_logs_slow_queries(self):
+        self.monitor.slow_ms = 1e-6
+        with patch("builtins.print") as mock_print:
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT id FROM t WHERE id = :id"), {"id": 2})
+        mock_print.assert_called_once()
+        self.assertIn("rows): SELECT id FROM t WHERE id = ?", mock_print.call_args.args[0])
+        self.assertEqual(self.monitor.slow, 1)
+
+
+class TestQueryTimingMiddleware(unittest.TestCase):
+
+    def test_server_timing_and_route_totals(self):
+        monitor = QueryMonitor()
+        app = FastAPI()
+        app.add_middleware(QueryTimingMiddleware, monitor=monitor)
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int):
+            stats = current_queries.get()
+            stats.count, stats.rows, stats.duration = 2, 7, 0.0015
+            return {"id": item_id}
+
+        response = TestClient(app).get("/items/3")
+        self.assertTrue(response.headers["Server-Timing"].startswith('db;dur=1.5;desc="2 queries, 7 rows", app;dur='))
+        self.assertEqual(monitor.stats()["routes"]["GET /items/{item_id}"]["max_queries"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
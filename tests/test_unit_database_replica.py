@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from m14.database.replica import ReplicaRouter
+
+
+class TestReplicaRouter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.primary = MagicMock(spec=async_sessionmaker)
+        self.replica = MagicMock(spec=async_sessionmaker)
+        self.router = ReplicaRouter(self.primary, self.replica, FakeRedis(server=self.server),
+                                    max_lag=5, sticky_seconds=10, check_interval=60)
+
+
+    async def test_without_replica_reads_primary(self):
+        router = ReplicaRouter(self.primary, None, FakeRedis(server=self.server))
+        await router.mark_write(1)
+        self.assertIs(await router.sessionmaker_for(1), self.primary)
+        self.assertEqual(await router.redis.keys(), [])
+
+
+    async def test_reads_replica_within_max_lag(self):
+        with patch.object(self.router, "measure_lag", AsyncMock(return_value=0.5)) as measure_lag:
+            self.assertIs(await self.router.sessionmaker_for(1), self.replica)
+            self.assertIs(await self.router.sessionmaker_for(2), self.replica)
+        measure_lag.assert_awaited_once()
+        self.assertEqual(self.router.stats()["replica_reads"], 2)
+
+
+    async def test_write_sticks_user_to_primary(self):
+        await self.router.mark_write(1)
+        with patch.object(self.router, "measure_lag", AsyncMock(return_value=0)):
+            self.assertIs(await self.router.sessionmaker_for(1), self.primary)
+            self.assertIs(await self.router.sessionmaker_for(2), self.replica)
+        self.assertAlmostEqual(await self.router.redis.pttl("replica-sticky:1"), 10000, delta=100)
+        self.assertEqual(self.router.sticky_reads, 1)
+
+
+    async def test_sticky_window_covers_max_lag(self):
+        router = ReplicaRouter(self.primary, self.replica, FakeRedis(server=self.server), max_lag=30, sticky_seconds=1)
+        self.assertEqual(router.sticky_seconds, 30)
+
+
+    async def test_lagging_replica_falls_back(self):
+        with patch.object(self.router, "measure_lag", AsyncMock(return_value=12.0)):
+            self.assertIs(await self.router.sessionmaker_for(1), self.primary)
+        self.assertEqual((self.router.fallbacks, self.router.lag, self.router.healthy), (1, 12.0, False))
+
+
+    async def test_unreachable_replica_falls_back(self):
+        with patch.object(self.router, "measure_lag", AsyncMock(side_effect=OSError("connection refused"))):
+            self.assertIs(await self.router.sessionmaker_for(1), self.primary)
+        self.assertIsNone(self.router.lag)
+
+
+    async def test_redis_down_reads_primary(self):
+        self.server.connected = False
+        await self.router.mark_write(1)
+        self.assertIs(await self.router.sessionmaker_for(1), self.primary)
+        self.assertEqual(self.router.errors, 2)
+
+
+    async def test_mark_down_until_next_check(self):
+        with patch.object(self.router, "measure_lag", AsyncMock(return_value=0)):
+            self.assertIs(await self.router.sessionmaker_for(1), self.replica)
+            self.router.mark_down()
+            self.assertIs(await self.router.sessionmaker_for(1), self.primary)
+
+
+    async def test_measure_lag_without_lag_query(self):
+        engine = create_async_engine("sqlite+aiosqlite://")
+        router = ReplicaRouter(self.primary, async_sessionmaker(engine), FakeRedis(server=self.server))
+        self.assertEqual(await router.measure_lag(), 0.0)
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
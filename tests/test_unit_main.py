@@ -0,0 +1,163 @@
+import subprocess
+import sys
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from fastapi.testclient import TestClient
+
+import main
+from m14.conf.config import settings
+from m14.database import db
+from m14.services import avatars, connections
+from m14.services.auth import auth_service
+from m14.services.contacts_cache import contacts_cache
+from m14.services.jobs import job_queue
+
+
+class AppTestCase(unittest.TestCase):
+    """Runs apps against fakeredis and mock engines."""
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.clients = []
+        self.engines = []
+        # The lifespan rebinds these module singletons; put them back afterwards.
+        for target, attribute in ((auth_service, "hash_executor"), (avatars, "upload_executor"),
+                                  (avatars, "image_executor"), (auth_service.user_cache, "redis"),
+                                  (contacts_cache, "redis"), (job_queue, "redis"),
+                                  (main.replica_router, "redis")):
+            patcher = patch.object(target, attribute, getattr(target, attribute))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for target, attribute, fake in ((connections, "redis_client", self.redis_client),
+                                        (db, "create_engines", self.create_engines)):
+            patcher = patch.object(target, attribute, side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+    def redis_client(self, app_settings, decode_responses=False):
+        client = FakeRedis(server=self.server, decode_responses=decode_responses)
+        client.aclose = AsyncMock(wraps=client.aclose)
+        self.clients.append(client)
+        return client
+
+
+    def create_engines(self, app_settings):
+        self.engines.append(MagicMock(dispose=AsyncMock()))
+        return self.engines[-1], None
+
+
+class TestLifespan(AppTestCase):
+
+    def test_startup_binds_and_shutdown_releases_every_pool(self):
+        with TestClient(main.create_app()) as client:
+            self.assertEqual(client.get("/").status_code, 200)
+            state = client.app.state
+            shared, text = self.clients
+            self.assertEqual((state.redis, state.text_redis), (shared, text))
+            self.assertIs(auth_service.user_cache.redis, shared)
+            self.assertIs(contacts_cache.redis, shared)
+            self.assertIs(job_queue.redis, text)
+            self.assertIs(db.SessionLocal.kw["bind"], state.engine)
+            self.assertIs(auth_service.hash_executor, state.hash_executor)
+            executors = (state.hash_executor, state.upload_executor, state.image_executor)
+            state.engine.dispose.assert_not_awaited()
+        for redis in self.clients:
+            redis.aclose.assert_awaited_once()
+        self.engines[0].dispose.assert_awaited_once()
+        for executor in executors:
+            with self.assertRaises(RuntimeError):
+                executor.submit(print)
+        self.assertEqual((auth_service.hash_executor, avatars.upload_executor, contacts_cache.redis,
+                          db.SessionLocal.kw["bind"]), (None, None, None, None))
+
+
+    def test_each_app_builds_its_pools_from_its_settings(self):
+        app_settings = settings.model_copy(update={"password_hash_workers": 3})
+        for _ in range(2):
+            with TestClient(main.create_app(app_settings)):
+                db.create_engines.assert_called_with(app_settings)
+                self.assertEqual(auth_service.hash_executor._max_workers, 3)
+                # A previous app's shutdown must not leave this one with dead executors.
+                auth_service.hash_executor.submit(print).result()
+        self.assertEqual(len(self.engines), 2)
+
+
+    def test_apps_keep_their_own_rate_limiter(self):
+        limited = main.create_app()
+        unlimited = main.create_app(settings.model_copy(update={"rate_limit_enabled": False}))
+        self.assertIsNot(limited.state.rate_limiter, unlimited.state.rate_limiter)
+        self.assertEqual((limited.state.rate_limiter.enabled, unlimited.state.rate_limiter.enabled), (True, False))
+        with TestClient(limited) as client:
+            self.assertIs(limited.state.rate_limiter.redis, self.clients[0])
+            self.assertIn("RateLimit-Limit", client.get("/").headers)
+        self.assertIsNone(limited.state.rate_limiter.redis)
+        with TestClient(unlimited) as client:
+            self.assertNotIn("RateLimit-Limit", client.get("/").headers)
+
+
+    def test_module_app_is_built_on_first_access(self):
+        self.assertIs(main.app, main.app)
+        with self.assertRaises(AttributeError):
+            main.missing
+
+
+class TestOpsEndpoints(AppTestCase):
+
+    def test_disabled_by_default(self):
+        with TestClient(main.create_app()) as client:
+            self.assertEqual(client.get("/metrics").status_code, 404)
+            self.assertEqual(client.get("/db/queries").status_code, 404)
+
+
+    def test_require_the_ops_token(self):
+        app_settings = settings.model_copy(update={"ops_endpoints_enabled": True, "ops_token": "s3cret"})
+        with TestClient(main.create_app(app_settings)) as client:
+            for headers in ({}, {"Authorization": "Bearer wrong"}, {"Authorization": "s3cret"}):
+                response = client.get("/ratelimit/stats", headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response.headers["WWW-Authenticate"], "Bearer")
+            response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+            self.assertEqual(response.status_code, 200)
+
+
+    def test_reject_every_request_without_a_configured_token(self):
+        app_settings = settings.model_copy(update={"ops_endpoints_enabled": True, "ops_token": None})
+        with TestClient(main.create_app(app_settings)) as client:
+            self.assertEqual(client.get("/metrics", headers={"Authorization": "Bearer "}).status_code, 401)
+
+
+    def test_job_stats_degrade_when_redis_is_down(self):
+        app_settings = settings.model_copy(update={"ops_endpoints_enabled": True, "ops_token": "s3cret"})
+        with TestClient(main.create_app(app_settings)) as client:
+            self.server.connected = False
+            response = client.get("/jobs/stats", headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["queued"], None)
+
+
+class TestImports(unittest.TestCase):
+
+    def test_importing_the_app_skips_optional_sdks(self):
+        code = ("import sys, main; print(sorted(name for name in ('cloudinary', 'PIL', 'fastapi_mail', 'uvicorn') "
+                "if name in sys.modules))")
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                                timeout=60).stdout
+        self.assertEqual(output.strip(), "[]")
+
+
+    def test_importing_the_app_builds_no_pools(self):
+        code = ("import main; from m14.database import db; from m14.services import avatars; "
+                "from m14.services.auth import auth_service; from m14.services.rate_limit import rate_limiter; "
+                "print('app' in vars(main), db.SessionLocal.kw.get('bind'), auth_service.hash_executor, "
+                "avatars.upload_executor, avatars.image_executor, rate_limiter.redis)")
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                                timeout=60).stdout
+        self.assertEqual(output.split(), ["False"] + ["None"] * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
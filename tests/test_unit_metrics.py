@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from m14.metrics import MetricsMiddleware
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetricsMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/test-metrics/{item_id}")
+        async def item(item_id: int):
+            if item_id == 0:
+                raise HTTPException(status_code=404, detail="Not found")
+            return {"id": item_id}
+
+        self.client = TestClient(app)
+
+
+    def test_counts_by_route_template_and_status(self):
+        route = "/test-metrics/{item_id}"
+        ok = sample("http_requests_total", method="GET", route=route, status="200")
+        missing = sample("http_requests_total", method="GET", route=route, status="404")
+        observed = sample("http_request_duration_seconds_count", method="GET", route=route)
+        self.client.get("/test-metrics/1")
+        self.client.get("/test-metrics/2")
+        self.client.get("/test-metrics/0")
+        self.assertEqual(sample("http_requests_total", method="GET", route=route, status="200") - ok, 2)
+        self.assertEqual(sample("http_requests_total", method="GET", route=route, status="404") - missing, 1)
+        self.assertEqual(sample("http_request_duration_seconds_count", method="GET", route=route) - observed, 3)
+        self.assertEqual(sample("http_requests_in_progress", method="GET"), 0)
+
+
+    def test_unknown_paths_share_one_label(self):
+        before = sample("http_requests_total", method="GET", route="unmatched", status="404")
+        self.client.get("/no/such/path/1")
+        self.client.get("/no/such/path/2")
+        self.assertEqual(sample("http_requests_total", method="GET", route="unmatched", status="404") - before, 2)
+
+
+class TestMultiprocess(unittest.TestCase):
+
+    def run_python(self, code: str, directory: str) -> str:
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory}
+        return subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True,
+                              text=True, timeout=60).stdout
+
+
+    def test_render_sums_every_process(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for _ in range(2):
+                self.run_python("from m14.metrics import SMTP_MESSAGES; SMTP_MESSAGES.labels('sent').inc(3)",
+                                directory)
+            output = self.run_python("from m14.metrics import render; print(render()[0].decode())", directory)
+        self.assertIn('smtp_messages_total{result="sent"} 6.0', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
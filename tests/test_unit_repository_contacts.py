@@ -1,11 +1,15 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm.exc import StaleDataError
 
-from m14.database.models import Contacts, User
-from m14.schemas import ContactsIn
+from m14.database.models import Base, Contacts, User
+from m14.schemas import ContactsIn, ContactsPatch
 from m14.repository.contacts import (
     upcoming_birthdays,
     create_contact,
@@ -14,12 +18,24 @@ from m14.repository.contacts import (
     get_contact,
     update_contact,
     remove_contact,
+    get_contacts_page,
+    encode_cursor,
+    decode_cursor,
+    _search_filter,
+    birthday_key_ranges,
+    create_contacts,
+    stream_contacts,
+    get_contacts_by_ids,
+    update_contacts,
+    remove_contacts,
+    get_contact_version,
 )
 
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.session.scalars.return_value = MagicMock()
         self.user = User(id=1)
 
     async def test_upcoming_birthdays(self):
@@ -30,7 +46,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             Contacts(date_of_birth=end_date),
             Contacts(date_of_birth=today + timedelta(days=3)),
         ]
-        self.session.query().filter().all.return_value = contacts
+        self.session.scalars.return_value.all.return_value = contacts
 
         result = await upcoming_birthdays(user=self.user, db=self.session)
 
@@ -60,7 +76,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_contacts(self):
         contacts = [Contacts(), Contacts(), Contacts()]
-        self.session.query().filter().offset().limit().all.return_value = contacts
+        self.session.scalars.return_value.all.return_value = contacts
         result = await get_contacts(skip=0, limit=10, user=self.user, db=self.session)
         self.assertEqual(result, contacts)
 
@@ -72,20 +88,20 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         Contacts(first_name="Jane"),
         ]
     
-        self.session.query().filter().filter().offset().limit().all.return_value = contacts
+        self.session.scalars.return_value.all.return_value = contacts
         result = await search_contacts(search=search_query, skip=0, limit=10, current_user=self.user, db=self.session)
         self.assertEqual(result, contacts)
 
 
     async def test_get_contact_found(self):
         contact = Contacts()
-        self.session.query().filter().first.return_value = contact
+        self.session.scalars.return_value.first.return_value = contact
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
 
     async def test_get_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.scalars.return_value.first.return_value = None
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
@@ -109,7 +125,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             date_of_birth="1980-01-01",
             nick="old_nick"
         )
-        self.session.query().filter().first.return_value = contact
+        self.session.scalars.return_value.first.return_value = contact
         self.session.commit.return_value = None
         result = await update_contact(contact_id=1, body=contact_input, user=self.user, db=self.session)
         self.assertEqual(result.first_name, result.first_name)
@@ -125,14 +141,14 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             date_of_birth="1990-01-01",
             nick="johnny"
         )
-        self.session.query().filter().first.return_value = None
+        self.session.scalars.return_value.first.return_value = None
         self.session.commit.return_value = None
         result = await update_contact(contact_id=1, body=contact_input, user=self.user, db=self.session)
         self.assertIsNone(result)
 
     async def test_remove_contact_found(self):
         contact = Contacts()
-        self.session.query().filter().first.return_value = contact
+        self.session.scalars.return_value.first.return_value = contact
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
         self.assertTrue(self.session.delete.called)
@@ -140,10 +156,288 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
 
 
     async def test_remove_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.scalars.return_value.first.return_value = None
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
 
+    async def test_update_contact_stale_version(self):
+        contact = Contacts(id=1, user_id=self.user.id, version=3)
+        self.session.scalars.return_value.first.return_value = contact
+        body = ContactsIn(first_name="John", last_name="Dooe", email="john.doe@example.com",
+                          phone_number="123456789", date_of_birth="1990-01-01")
+        with self.assertRaises(StaleDataError):
+            await update_contact(contact_id=1, body=body, user=self.user, db=self.session, version=2)
+        self.assertFalse(self.session.commit.called)
+
+
+    async def test_remove_contact_bumps_collection_version(self):
+        self.session.scalars.return_value.first.return_value = Contacts(id=1, version=2)
+        await remove_contact(contact_id=1, user=self.user, db=self.session, version=2)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertEqual(stmt.table.name, "users")
+        self.assertIn("contacts_version", str(stmt))
+        self.assertTrue(self.session.commit.called)
+
+
+    async def test_get_contact_version(self):
+        self.session.scalar.return_value = 4
+        self.assertEqual(await get_contact_version(contact_id=1, user=self.user, db=self.session), 4)
+        self.assertEqual(str(self.session.scalar.call_args.args[0].selected_columns[0]), "contacts.version")
+
+
+    async def test_get_contacts_page_has_next(self):
+        contacts = [Contacts(id=1), Contacts(id=2), Contacts(id=3)]
+        self.session.scalars.return_value.all.return_value = contacts
+        result, next_cursor = await get_contacts_page(cursor=None, limit=2, user=self.user, db=self.session)
+        self.assertEqual(result, contacts[:2])
+        self.assertEqual(decode_cursor(next_cursor, "id")["id"], 2)
+
+
+    async def test_get_contacts_page_last_page(self):
+        contacts = [Contacts(id=3)]
+        self.session.scalars.return_value.all.return_value = contacts
+        cursor = encode_cursor("id", Contacts(id=2))
+        result, next_cursor = await get_contacts_page(cursor=cursor, limit=2, user=self.user, db=self.session)
+        self.assertEqual(result, contacts)
+        self.assertIsNone(next_cursor)
+
+
+    async def test_get_contacts_page_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            await get_contacts_page(cursor="not-a-cursor", limit=2, user=self.user, db=self.session)
+        cursor = encode_cursor("id", Contacts(id=2))
+        with self.assertRaises(ValueError):
+            await get_contacts_page(cursor=cursor, limit=2, user=self.user, db=self.session, order_by="last_name")
+
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor("last_name", Contacts(id=7, last_name="Dooe"))
+        position = decode_cursor(cursor, "last_name")
+        self.assertEqual(position["v"], "Dooe")
+        self.assertEqual(position["id"], 7)
+
+
+    def test_search_filter_uses_fts_on_sqlite(self):
+        self.session.get_bind.return_value.dialect.name = "sqlite"
+        self.assertIn("contacts_fts MATCH", str(_search_filter("john", self.session)))
+        self.assertIn("lower", str(_search_filter("jo", self.session)).lower())
+
+
+    def test_search_filter_escapes_wildcards(self):
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        clause = _search_filter("50%_off", self.session)
+        self.assertIn("%50\\%\\_off%", clause.compile().params.values())
+
+
+    def test_birthday_key_ranges(self):
+        self.assertEqual(birthday_key_ranges(date(2026, 6, 10), 7), [(610, 617)])
+        self.assertEqual(birthday_key_ranges(date(2026, 12, 28), 7), [(1228, 1231), (101, 104)])
+        self.assertEqual(birthday_key_ranges(date(2026, 2, 21), 7), [(221, 229)])
+        self.assertEqual(birthday_key_ranges(date(2028, 2, 22), 7), [(222, 229)])
+        self.assertEqual(birthday_key_ranges(date(2026, 3, 1), 7), [(301, 308)])
+        self.assertEqual(birthday_key_ranges(date(2026, 3, 1), 365), [(101, 1231)])
+
+
+    def test_birthday_key_follows_date_of_birth(self):
+        contact = Contacts(date_of_birth=date(1992, 2, 29))
+        self.assertEqual(contact.birthday_key, 229)
+        contact.date_of_birth = date(1990, 12, 31)
+        self.assertEqual(contact.birthday_key, 1231)
+
+
+    async def test_create_contacts_rejects_duplicates(self):
+        bodies = [
+            ContactsIn(first_name="John", last_name="Dooe", email=email, phone_number="123",
+                       date_of_birth="1990-01-01")
+            for email in ["taken@example.com", "new@example.com", "new@example.com"]
+        ]
+        self.session.scalars.return_value.all.return_value = ["taken@example.com"]
+        result = await create_contacts(bodies=bodies, user=self.user, db=self.session)
+        self.assertEqual(result, ["Contact with this email already exists", None, "Duplicate email in file"])
+        inserted = self.session.execute.call_args.args[1]
+        self.assertEqual([row["email"] for row in inserted], ["new@example.com"])
+        self.assertEqual(inserted[0]["birthday_key"], 101)
+        self.assertTrue(self.session.commit.called)
+
+
+    async def test_stream_contacts(self):
+        batches = [["row1", "row2"], ["row3"]]
+
+        async def partitions():
+            for batch in batches:
+                yield batch
+
+        result = MagicMock()
+        result.partitions.return_value = partitions()
+        result.close = AsyncMock()
+        self.session.stream = AsyncMock(return_value=result)
+        streamed = [batch async for batch in stream_contacts(user=self.user, db=self.session, batch_size=2)]
+        self.assertEqual(streamed, batches)
+        stmt = self.session.stream.call_args.args[0]
+        self.assertEqual(stmt.get_execution_options()["yield_per"], 2)
+        self.assertTrue(result.close.called)
+
+
+    async def test_get_contacts_rows(self):
+        rows = [("John", "Dooe", "john@example.com", "123", None, None, 1)]
+        self.session.execute.return_value = MagicMock()
+        self.session.execute.return_value.all.return_value = rows
+        result = await get_contacts(skip=0, limit=10, user=self.user, db=self.session, rows=True)
+        self.assertEqual(result, rows)
+        stmt = self.session.execute.call_args.args[0]
+        self.assertEqual([column.name for column in stmt.selected_columns],
+                         ["first_name", "last_name", "email", "phone_number", "date_of_birth", "nick", "id"])
+        self.assertFalse(self.session.scalars.called)
+
+
+    async def test_get_contacts_by_ids(self):
+        contacts = [Contacts(id=1), Contacts(id=3)]
+        self.session.scalars.return_value.all.return_value = contacts
+        result = await get_contacts_by_ids(ids=[1, 2, 3], user=self.user, db=self.session)
+        self.assertEqual(result, {1: contacts[0], 3: contacts[1]})
+        self.assertEqual(self.session.scalars.call_count, 1)
+
+
+    async def test_update_contacts(self):
+        contacts = [Contacts(id=1, email="one@example.com", nick=None, version=1),
+                    Contacts(id=2, email="two@example.com", version=4)]
+        self.session.scalars.return_value.all.return_value = contacts
+        self.session.execute.return_value = MagicMock()
+        self.session.execute.return_value.all.return_value = [("two@example.com", 2)]
+        patches = [
+            ContactsPatch(id=1, nick="uno", date_of_birth="1990-12-31"),
+            ContactsPatch(id=1, nick="again"),
+            ContactsPatch(id=2, email="two@example.com"),
+            ContactsPatch(id=3, nick="missing"),
+            ContactsPatch(id=2, nick="stale", version=3),
+        ]
+        result = await update_contacts(patches=patches, user=self.user, db=self.session)
+        self.assertEqual(result, [contacts[0], "Duplicate id in batch", contacts[1], None, "Duplicate id in batch"])
+        self.assertEqual((contacts[0].nick, contacts[0].birthday_key, contacts[0].version), ("uno", 1231, 2))
+        rows = self.session.execute.call_args.args[1]
+        self.assertEqual(rows, [{"id": 1, "version": 1, "nick": "uno", "date_of_birth": date(1990, 12, 31),
+                                 "birthday_key": 1231},
+                                {"id": 2, "version": 4, "email": "two@example.com"}])
+        self.assertTrue(self.session.commit.called)
+
+
+    async def test_update_contacts_rejects_taken_email(self):
+        self.session.scalars.return_value.all.return_value = [Contacts(id=1, email="one@example.com")]
+        self.session.execute.return_value = MagicMock()
+        self.session.execute.return_value.all.return_value = [("two@example.com", 2)]
+        result = await update_contacts(patches=[ContactsPatch(id=1, email="two@example.com")],
+                                       user=self.user, db=self.session)
+        self.assertEqual(result, ["Contact with this email already exists"])
+        self.assertFalse(self.session.commit.called)
+
+
+    async def test_update_contacts_rejects_stale_version(self):
+        self.session.scalars.return_value.all.return_value = [Contacts(id=1, version=2)]
+        result = await update_contacts(patches=[ContactsPatch(id=1, nick="stale", version=1)],
+                                       user=self.user, db=self.session)
+        self.assertEqual(result, ["Contact has been modified"])
+        self.assertFalse(self.session.commit.called)
+
+
+    async def test_remove_contacts(self):
+        contacts = [Contacts(id=2)]
+        self.session.scalars.return_value.all.return_value = contacts
+        result = await remove_contacts(ids=[1, 2], user=self.user, db=self.session)
+        self.assertEqual(result, {2: contacts[0]})
+        self.assertIn("RETURNING", str(self.session.scalars.call_args.args[0]).upper())
+        self.assertTrue(self.session.commit.called)
+
+
+class TestContactsOnSQLite(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_async_engine("sqlite+aiosqlite:///" + os.path.join(self.directory.name, "contacts.db"))
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.SessionLocal = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.user, self.other = User(id=1), User(id=2)
+        async with self.SessionLocal() as db:
+            db.add_all([User(id=1, username="owner", email="owner@example.com", password="x"),
+                        User(id=2, username="other", email="other@example.com", password="x")])
+            await db.commit()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+        self.directory.cleanup()
+
+
+    async def add(self, user_id: int, **born: date) -> None:
+        async with self.SessionLocal() as db:
+            db.add_all([Contacts(first_name=name, last_name="Test", email=f"{name}.{user_id}@example.com",
+                                 phone_number="123456789", date_of_birth=date_of_birth, user_id=user_id)
+                        for name, date_of_birth in born.items()])
+            await db.commit()
+
+
+    async def upcoming(self, today: date, days: int, user: User = None) -> list:
+        with patch("m14.repository.contacts.datetime") as clock:
+            clock.now.return_value = datetime.combine(today, datetime.min.time())
+            async with self.SessionLocal() as db:
+                contacts = await upcoming_birthdays(user=user or self.user, db=db, days=days)
+        return [contact.first_name for contact in contacts]
+
+
+    async def test_upcoming_birthdays_wrap_the_year_for_the_user_only(self):
+        await self.add(1, dec30=date(1990, 12, 30), jan03=date(1985, 1, 3), jan10=date(1990, 1, 10),
+                       dec27=date(1990, 12, 27))
+        await self.add(2, stranger=date(1990, 12, 30))
+        self.assertEqual(await self.upcoming(date(2023, 12, 28), 7), ["dec30", "jan03"])
+        self.assertEqual(await self.upcoming(date(2023, 12, 28), 7, self.other), ["stranger"])
+
+
+    async def test_upcoming_birthdays_leap_day(self):
+        await self.add(1, leap=date(2000, 2, 29), march=date(1990, 3, 1), feb26=date(1990, 2, 26))
+        self.assertEqual(await self.upcoming(date(2023, 2, 25), 3), ["feb26", "leap"])
+        self.assertEqual(await self.upcoming(date(2024, 2, 25), 3), ["feb26"])
+        self.assertEqual(await self.upcoming(date(2024, 2, 27), 3), ["leap", "march"])
+
+
+    async def stored(self) -> dict:
+        async with self.SessionLocal() as db:
+            return {contact.first_name: (contact.nick, contact.version) for contact in await db.scalars(select(Contacts))}
+
+
+    async def test_update_contacts_rejects_a_concurrent_change(self):
+        await self.add(1, first=date(1990, 1, 1), second=date(1990, 1, 2))
+        async with self.SessionLocal() as db, self.SessionLocal() as other:
+            loaded = await get_contacts_by_ids([1, 2], self.user, db)
+            await update_contacts([ContactsPatch(id=1, nick="theirs")], self.user, other)
+            # db still holds version 1 of contact 1 in `loaded`, so its bulk UPDATE matches one row of two.
+            result = await update_contacts([ContactsPatch(id=1, nick="mine"), ContactsPatch(id=2, nick="two")],
+                                           self.user, db)
+        self.assertEqual(result, ["Contact has been modified"] * 2)
+        self.assertEqual(await self.stored(), {"first": ("theirs", 2), "second": (None, 1)})
+
+
+    async def test_update_contacts_increments_stored_versions(self):
+        await self.add(1, first=date(1990, 1, 1), second=date(1990, 1, 2))
+        async with self.SessionLocal() as db:
+            result = await update_contacts([ContactsPatch(id=1, nick="one", version=1),
+                                            ContactsPatch(id=2, nick="two")], self.user, db)
+        self.assertEqual([contact.version for contact in result], [2, 2])
+        self.assertEqual(await self.stored(), {"first": ("one", 2), "second": ("two", 2)})
+
+
+    async def test_remove_contacts_locks_the_user_before_the_contacts(self):
+        await self.add(1, first=date(1990, 1, 1), second=date(1990, 1, 2))
+        statements = []
+        event.listen(self.engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement.split()[0:3]))
+        async with self.SessionLocal() as db:
+            self.assertEqual(set(await remove_contacts([1, 3], self.user, db)), {1})
+            self.assertEqual(await remove_contacts([3], self.user, db), {})
+            versions = (await db.scalars(select(User.contacts_version).order_by(User.id))).all()
+        writes = [words for words in statements if words[0] in ("UPDATE", "DELETE")]
+        self.assertEqual(writes[:2], [["UPDATE", "users", "SET"], ["DELETE", "FROM", "contacts"]])
+        self.assertEqual(versions, [1, 0])
+
+
 if __name__ == '__main__':
     unittest.main()
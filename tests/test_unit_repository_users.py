@@ -1,8 +1,7 @@
 import unittest
 from unittest import mock
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from m14.database.models import User
@@ -18,13 +17,14 @@ from m14.repository.users import (
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.session.scalars.return_value = MagicMock()
 
 
     async def test_get_user_by_email_found(self):
         email = "test@example.com"
         user = User(email=email)
-        self.session.query().filter().first.return_value = user
+        self.session.scalars.return_value.first.return_value = user
         result = await get_user_by_email(email=email, db=self.session)
         self.assertEqual(result, user)
 
@@ -43,7 +43,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_user_by_email_not_found(self):
         email = "test@example.com"
-        self.session.query().filter().first.return_value = None
+        self.session.scalars.return_value.first.return_value = None
         result = await get_user_by_email(email=email, db=self.session)
         self.assertIsNone(result)
 
@@ -59,7 +59,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
     async def test_confirm_email(self):
         email = "test@example.com"
         user = User(email=email, confirmed=False)
-        self.session.query().filter().first.return_value = user
+        self.session.scalars.return_value.first.return_value = user
         await confirm_email(email=email, db=self.session)
         self.assertTrue(user.confirmed)
 
@@ -68,7 +68,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         email = "test@example.com"
         url = "http://example.com/avatar.jpg"
         user = User(email=email)
-        self.session.commit = MagicMock(return_value=None)
+        self.session.commit = AsyncMock(return_value=None)
         updated_user = await update_avatar(email=email, url=url, db=self.session)
         self.assertEqual(updated_user.avatar, url)
 
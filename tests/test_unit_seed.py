@@ -0,0 +1,76 @@
+import os
+import random
+import statistics
+import tempfile
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, func, select
+
+from m14.database.models import Contacts, User, birthday_key
+from m14.seed import contact_count, contact_rows, seed_database
+
+
+class TestGenerators(unittest.TestCase):
+
+    def test_distributions_keep_mean_and_cap(self):
+        rng = random.Random(7)
+        for distribution in ("uniform", "lognormal", "pareto"):
+            counts = [contact_count(rng, distribution, 100, 10_000) for _ in range(20_000)]
+            self.assertAlmostEqual(statistics.mean(counts), 100, delta=15, msg=distribution)
+        self.assertEqual(contact_count(rng, "fixed", 100, 10_000), 100)
+        self.assertEqual(max(contact_count(rng, "pareto", 100, 150) for _ in range(1000)), 150)
+
+
+    def test_rows_depend_only_on_seed_and_user(self):
+        today = date(2024, 6, 1)
+        rows = contact_rows(3, 42, "fixed", 50, 1000, today)
+        self.assertEqual(rows, contact_rows(3, 42, "fixed", 50, 1000, today))
+        self.assertNotEqual(rows, contact_rows(4, 42, "fixed", 50, 1000, today))
+        for row in rows:
+            self.assertEqual(row["birthday_key"], birthday_key(row["date_of_birth"]))
+            self.assertTrue(4 <= len(row["first_name"]) <= 16 and 4 <= len(row["last_name"]) <= 16)
+
+
+class TestSeedDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+
+    def contacts(self, url: str) -> list:
+        engine = create_engine(url)
+        with engine.connect() as conn:
+            rows = conn.execute(select(Contacts.email, Contacts.date_of_birth, Contacts.birthday_key,
+                                       Contacts.version, Contacts.user_id).order_by(Contacts.email)).all()
+        engine.dispose()
+        return rows
+
+
+    def test_parallel_writers_produce_the_same_rows(self):
+        serial = "sqlite:///" + os.path.join(self.directory.name, "serial.db")
+        parallel = "sqlite:///" + os.path.join(self.directory.name, "parallel.db")
+        result = seed_database(serial, users=6, contacts=30, seed=5, batch=50)
+        self.assertEqual(seed_database(parallel, users=6, contacts=30, seed=5, batch=50, workers=3)["contacts"],
+                         result["contacts"])
+        rows = self.contacts(serial)
+        self.assertEqual(len(rows), result["contacts"])
+        self.assertEqual(rows, self.contacts(parallel))
+        self.assertTrue(all(row.version == 1 and row.birthday_key == birthday_key(row.date_of_birth)
+                            for row in rows))
+
+
+    def test_appends_users_after_existing_ones(self):
+        url = "sqlite:///" + os.path.join(self.directory.name, "append.db")
+        seed_database(url, users=2, contacts=3, distribution="fixed")
+        seed_database(url, users=3, contacts=3, distribution="fixed")
+        engine = create_engine(url)
+        with engine.connect() as conn:
+            self.assertEqual(conn.scalars(select(User.id).order_by(User.id)).all(), [1, 2, 3, 4, 5])
+            self.assertEqual(conn.scalar(select(func.count()).select_from(Contacts)), 15)
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
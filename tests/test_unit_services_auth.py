@@ -0,0 +1,40 @@
+import unittest
+
+from jose import JWTError
+
+from m14.services.auth import Auth
+from m14.services.cache import LRUCache
+
+
+class TestAuth(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.token_cache = LRUCache(maxsize=16)
+
+
+    async def test_decode_access_token_is_cached(self):
+        token = await self.auth.create_access_token(data={"sub": "test@example.com"})
+        first = self.auth.decode_access_token(token)
+        second = self.auth.decode_access_token(token)
+        self.assertEqual(first["sub"], "test@example.com")
+        self.assertEqual(first, second)
+        self.assertEqual((self.auth.token_cache.hits, self.auth.token_cache.misses), (1, 1))
+
+
+    async def test_expired_token_is_not_cached(self):
+        token = await self.auth.create_access_token(data={"sub": "test@example.com"}, expires_delta=-10)
+        with self.assertRaises(JWTError):
+            self.auth.decode_access_token(token)
+        self.assertEqual(len(self.auth.token_cache), 0)
+
+
+    async def test_tampered_token_is_rejected(self):
+        token = await self.auth.create_access_token(data={"sub": "test@example.com"})
+        self.auth.decode_access_token(token)
+        with self.assertRaises(JWTError):
+            self.auth.decode_access_token(token[:-2] + ("AA" if token[-2:] != "AA" else "BB"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import cloudinary
+import cloudinary.exceptions
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from m14.services import avatars
+from m14.services.avatars import CloudinaryStorage, LocalStorage, avatar_key, check_avatar, sniff_image_type
+from m14.services.images import AVATAR_SIZES, content_hash
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+def upload(data: bytes, size: bool = True) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=len(data) if size else None, filename="avatar.png")
+
+
+class TestCheckAvatar(unittest.IsolatedAsyncioTestCase):
+
+    def test_sniff_image_type(self):
+        self.assertEqual(sniff_image_type(b"\xff\xd8\xff\xe0" + b"\x00" * 8), "image/jpeg")
+        self.assertEqual(sniff_image_type(b"RIFF\x00\x00\x00\x00WEBP"), "image/webp")
+        self.assertIsNone(sniff_image_type(b"<svg xmlns="))
+
+
+    async def test_accepts_image_and_rewinds(self):
+        file = upload(PNG)
+        self.assertEqual(await check_avatar(file, max_bytes=1024), "image/png")
+        self.assertEqual(await file.read(), PNG)
+
+
+    async def test_rejects_declared_size_over_limit(self):
+        with self.assertRaises(HTTPException) as e:
+            await check_avatar(upload(PNG), max_bytes=50)
+        self.assertEqual(e.exception.status_code, 413)
+
+
+    async def test_rejects_undeclared_size_over_limit(self):
+        with self.assertRaises(HTTPException) as e:
+            await check_avatar(upload(PNG, size=False), max_bytes=50)
+        self.assertEqual(e.exception.status_code, 413)
+
+
+    async def test_rejects_non_image(self):
+        with self.assertRaises(HTTPException) as e:
+            await check_avatar(upload(b"GIF? no, a text file"), max_bytes=1024)
+        self.assertEqual(e.exception.status_code, 415)
+
+
+def png(color="red") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 300), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestStorage(unittest.IsolatedAsyncioTestCase):
+
+    async def test_local_storage_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            storage = LocalStorage(directory)
+            self.assertFalse(await storage.exists("abc/64.webp"))
+            with self.assertRaises(HTTPException) as e:
+                storage.response("abc/64.webp", {})
+            self.assertEqual(e.exception.status_code, 404)
+            await storage.put("abc/64.webp", b"webp")
+            self.assertTrue(await storage.exists("abc/64.webp"))
+            response = storage.response("abc/64.webp", {"ETag": '"abc-64"'})
+            self.assertEqual((response.path, response.media_type), (os.path.join(directory, "abc/64.webp"), "image/webp"))
+
+
+    async def test_cloudinary_calls_run_off_the_event_loop(self):
+        threads = []
+
+        def fake_upload(file, **kwargs):
+            threads.append(threading.get_ident())
+            return {"version": 7}
+
+        with patch("cloudinary.uploader.upload", side_effect=fake_upload) as upload, \
+                patch("cloudinary.api.resource", side_effect=cloudinary.exceptions.NotFound("missing")), \
+                patch("cloudinary.config", wraps=cloudinary.config) as config:
+            storage = CloudinaryStorage("cloud", "key", "secret")
+            configured = config.call_count
+            self.assertFalse(await storage.exists("abc/250.webp"))
+            await storage.put("abc/250.webp", b"webp")
+        self.assertEqual(configured, 1)
+        self.assertEqual(upload.call_args.kwargs, {"public_id": "NotesApp/abc/250", "overwrite": False})
+        self.assertNotEqual(threads, [threading.get_ident()])
+        self.assertIn("NotesApp/abc/250.webp", storage.response("abc/250.webp", {}).headers["location"])
+
+
+    def test_cloudinary_response_skips_the_admin_api(self):
+        with patch("cloudinary.api.resource") as resource:
+            response = CloudinaryStorage("cloud", "key", "secret").response("abc/250.webp", {"ETag": '"abc-250"'})
+        resource.assert_not_called()
+        self.assertEqual((response.status_code, response.headers["etag"]), (308, '"abc-250"'))
+
+
+class TestStoreAvatar(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = patch.object(avatars, "avatar_storage", LocalStorage(self.directory.name))
+        self.storage.start()
+
+    def tearDown(self):
+        self.storage.stop()
+        self.directory.cleanup()
+
+
+    async def test_processes_in_worker_process_and_stores_by_hash(self):
+        data = png()
+        digest = await avatars.store_avatar(upload(data))
+        self.assertEqual(digest, content_hash(data))
+        for size in AVATAR_SIZES:
+            self.assertTrue(await avatars.avatar_storage.exists(avatar_key(digest, size)))
+
+
+    async def test_duplicate_upload_is_not_processed_again(self):
+        data = png("blue")
+        with patch.object(avatars, "image_executor", ThreadPoolExecutor(1)):
+            await avatars.store_avatar(upload(data))
+            with patch("m14.services.avatars.process_avatar") as process:
+                self.assertEqual(await avatars.store_avatar(upload(data)), content_hash(data))
+        process.assert_not_called()
+
+
+    async def test_undecodable_image_is_unsupported(self):
+        with patch.object(avatars, "image_executor", ThreadPoolExecutor(1)):
+            with self.assertRaises(HTTPException) as e:
+                await avatars.store_avatar(upload(PNG))
+        self.assertEqual(e.exception.status_code, 415)
+
+
+    async def test_storage_failure_is_bad_gateway(self):
+        with patch.object(avatars.avatar_storage, "exists", side_effect=OSError("disk gone")):
+            with self.assertRaises(HTTPException) as e:
+                await avatars.store_avatar(upload(png()))
+        self.assertEqual(e.exception.status_code, 502)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+from collections import namedtuple
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from m14.database.models import User
+from m14.services import contacts_cache
+from m14.services.cache import ContactsCache, LRUCache, UserCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+
+    def test_expired_entry_is_a_miss(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1, ttl=0)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.redis = FakeRedis(server=self.server)
+        self.cache = UserCache(self.redis, ttl=900)
+        self.user = User(id=1, username="deadpool", email="deadpool@example.com", password="hash", avatar=None)
+
+
+    async def test_set_stores_compact_payload_with_expiry(self):
+        cached = await self.cache.set(self.user)
+        self.assertEqual(cached.email, self.user.email)
+        payload = await self.redis.get("user:deadpool@example.com")
+        self.assertNotIn(b"hash", payload)
+        self.assertGreater(await self.redis.ttl("user:deadpool@example.com"), 0)
+
+
+    async def test_get_falls_back_to_redis(self):
+        await self.cache.set(self.user)
+        other = UserCache(FakeRedis(server=self.server))
+        user = await other.get("deadpool@example.com")
+        self.assertEqual(user.id, 1)
+        self.assertEqual(len(other.local), 1)
+
+
+    async def test_invalidate_reaches_other_workers(self):
+        other = UserCache(FakeRedis(server=self.server))
+        listener = asyncio.create_task(other.listen())
+        await asyncio.sleep(0.05)
+        await other.set(self.user)
+
+        await self.cache.invalidate("deadpool@example.com")
+        await asyncio.sleep(0.05)
+        listener.cancel()
+
+        self.assertIsNone(other.local.get("deadpool@example.com"))
+        self.assertIsNone(await self.redis.get("user:deadpool@example.com"))
+
+
+class TestContactsCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.cache = ContactsCache(FakeRedis(server=self.server), ttl=300)
+        self.loader = AsyncMock(return_value=[{"id": 1, "first_name": "John"}])
+
+
+    async def test_read_through(self):
+        first = await self.cache.get_or_load(1, "list", (0, 100), self.loader)
+        second = await self.cache.get_or_load(1, "list", (0, 100), self.loader)
+        self.assertEqual(first, second)
+        self.assertEqual(self.loader.await_count, 1)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "errors": 0, "hit_ratio": 0.5})
+        self.assertGreater(await self.cache.redis.ttl("contacts:1:0:list:0:100"), 0)
+
+
+    async def test_invalidate_bumps_generation_of_one_user(self):
+        await self.cache.get_or_load(1, "list", (0, 100), self.loader)
+        await self.cache.get_or_load(2, "list", (0, 100), self.loader)
+        await self.cache.invalidate(1)
+        await self.cache.get_or_load(1, "list", (0, 100), self.loader)
+        await self.cache.get_or_load(2, "list", (0, 100), self.loader)
+        self.assertEqual(self.loader.await_count, 3)
+        self.assertEqual(await self.cache.redis.get("contacts:1:gen"), b"1")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+
+
+    async def test_none_is_not_cached(self):
+        loader = AsyncMock(return_value=None)
+        await self.cache.get_or_load(1, "contact", (7,), loader)
+        await self.cache.get_or_load(1, "contact", (7,), loader)
+        self.assertEqual(loader.await_count, 2)
+
+
+    async def test_redis_down_falls_back_to_loader(self):
+        self.server.connected = False
+        result = await self.cache.get_or_load(1, "list", (0, 100), self.loader)
+        await self.cache.invalidate(1)
+        self.assertEqual(result, self.loader.return_value)
+        self.assertEqual(self.cache.errors, 2)
+
+
+    async def test_cached_repository_reads(self):
+        Row = namedtuple("Row", ["first_name", "last_name", "email", "phone_number", "date_of_birth", "nick", "id"])
+        rows = [Row("John", "Dooe", "john@example.com", "123", date(1990, 1, 1), None, 1)]
+        user = User(id=1)
+        with patch.object(contacts_cache, "contacts_cache", self.cache), \
+                patch.object(contacts_cache.repository_contacts, "get_contacts", AsyncMock(return_value=rows)) as load:
+            first = await contacts_cache.get_contacts(0, 10, user, db=None, version=3)
+            second = await contacts_cache.get_contacts(0, 10, user, db=None, version=3)
+            await contacts_cache.invalidate(user)
+            await contacts_cache.get_contacts(0, 10, user, db=None, version=3)
+        self.assertEqual(first[0]["date_of_birth"], date(1990, 1, 1))
+        self.assertEqual(second[0]["date_of_birth"], "1990-01-01")
+        self.assertEqual(load.await_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
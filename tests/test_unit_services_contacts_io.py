@@ -0,0 +1,158 @@
+import io
+import os
+import tempfile
+import tracemalloc
+import unittest
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from m14.database.models import Base, Contacts, User
+from m14.seed import contact_rows
+from m14.services.contacts_io import EXPORT_FIELDS, detect_format, export_chunks, iter_csv, iter_ndjson, iter_vcard
+from m14.services.exports import stream_export
+
+Row = namedtuple("Row", EXPORT_FIELDS)
+
+
+async def generated_partitions(total, batch_size=1000):
+    for start in range(0, total, batch_size):
+        yield [Row(i, "John", "Dooe", f"john{i}@example.com", "123456789", date(1990, 1, 1), None)
+               for i in range(start, min(start + batch_size, total))]
+
+
+class TestContactsIO(unittest.TestCase):
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format("book.CSV"), "csv")
+        self.assertEqual(detect_format("export.jsonl"), "ndjson")
+        self.assertEqual(detect_format("cards.vcf"), "vcard")
+        self.assertEqual(detect_format("upload", "text/vcard"), "vcard")
+        self.assertIsNone(detect_format("notes.txt", "text/plain"))
+
+
+    def test_iter_csv(self):
+        lines = io.StringIO("first_name,last_name,email,phone_number,date_of_birth,nick\n"
+                            "John,Dooe,john@example.com,123,1990-01-01,\n")
+        rows = list(iter_csv(lines))
+        self.assertEqual(rows[0][0], 2)
+        self.assertEqual(rows[0][1]["email"], "john@example.com")
+        self.assertIsNone(rows[0][1]["nick"])
+
+
+    def test_iter_ndjson_reports_bad_lines(self):
+        lines = io.StringIO('{"first_name": "John"}\n\n[1, 2]\n{oops\n')
+        rows = list(iter_ndjson(lines))
+        self.assertEqual(rows[0], (1, {"first_name": "John"}))
+        self.assertEqual([row for row, values in rows if "__error__" in values], [3, 4])
+
+
+    def test_iter_vcard(self):
+        lines = io.StringIO("BEGIN:VCARD\r\nVERSION:3.0\r\nN:Dooe;John;;;\r\nFN:John Dooe\r\n"
+                            "EMAIL;TYPE=INTERNET:john@exam\r\n ple.com\r\nTEL;TYPE=CELL:123\r\n"
+                            "BDAY:19900101\r\nNICKNAME:johnny\r\nEND:VCARD\r\n"
+                            "BEGIN:VCARD\r\nFN:Jane Smith\r\nEND:VCARD\r\n")
+        cards = list(iter_vcard(lines))
+        self.assertEqual(cards[0], (1, {"last_name": "Dooe", "first_name": "John", "email": "john@example.com",
+                                        "phone_number": "123", "date_of_birth": "1990-01-01", "nick": "johnny"}))
+        self.assertEqual(cards[1], (2, {"first_name": "Jane", "last_name": "Smith"}))
+
+
+class TestContactsExport(unittest.IsolatedAsyncioTestCase):
+
+    async def export(self, fmt, rows):
+        async def partitions():
+            yield rows
+        return b"".join([chunk async for chunk in export_chunks(fmt, partitions())]).decode()
+
+
+    async def test_export_round_trips_through_parsers(self):
+        rows = [Row(1, "John", "Dooe", "john@example.com", "123", date(1990, 1, 1), "j;o,hn"),
+                Row(2, "Jane", "Smith", "jane@example.com", "456", None, None)]
+        expected = {"first_name": "John", "last_name": "Dooe", "email": "john@example.com",
+                    "phone_number": "123", "date_of_birth": "1990-01-01"}
+        csv_rows = list(iter_csv(io.StringIO(await self.export("csv", rows), newline="")))
+        self.assertEqual(csv_rows[0][1], dict(expected, id="1", nick="j;o,hn"))
+        ndjson_rows = list(iter_ndjson(io.StringIO(await self.export("ndjson", rows))))
+        self.assertEqual(ndjson_rows[1][1]["date_of_birth"], None)
+        cards = list(iter_vcard(io.StringIO(await self.export("vcard", rows), newline="")))
+        self.assertEqual(cards[0][1], dict(expected, nick="j\\;o\\,hn"))
+        self.assertEqual(len(cards), 2)
+
+
+    async def test_serializer_memory_is_flat_at_one_million_rows(self):
+        total, exported = 1_000_000, 0
+        tracemalloc.start()
+        try:
+            async for chunk in export_chunks("csv", generated_partitions(total)):
+                exported += chunk.count(b"\n")
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(exported, total + 1)
+        self.assertLess(peak, 5 * 1024 * 1024)
+
+
+class TestExportFromDatabase(unittest.IsolatedAsyncioTestCase):
+
+    ROWS = 50_000
+    CHUNK = 50_000
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "export.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def seed(self, rows: int) -> None:
+        engine = create_engine("sqlite:///" + self.path)
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            # Trigram indexing of every insert is irrelevant here and dominates the seeding time.
+            conn.execute(text("DROP TRIGGER contacts_fts_ai"))
+            conn.execute(insert(User), [{"id": 1, "username": "owner", "email": "owner@example.com", "password": "x"},
+                                        {"id": 2, "username": "other", "email": "other@example.com", "password": "x"}])
+            for part in range(0, rows, self.CHUNK):
+                size = min(self.CHUNK, rows - part)
+                conn.execute(insert(Contacts), [{**row, "email": f"{part}.{row['email']}"} for row in
+                                                contact_rows(1, part, "fixed", size, size, date(2024, 6, 1))])
+            conn.execute(insert(Contacts), contact_rows(2, 1, "fixed", 10, 10, date(2024, 6, 1)))
+        engine.dispose()
+
+    async def export_peak(self) -> tuple:
+        """Lines exported for user 1 and the peak traced memory while streaming them."""
+        engine = create_async_engine("sqlite+aiosqlite:///" + self.path)
+        exported = 0
+        tracemalloc.start()
+        try:
+            async for chunk in stream_export(User(id=1), "csv", sessionmaker=async_sessionmaker(engine)):
+                exported += chunk.count(b"\n")
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            await engine.dispose()
+        return exported, peak
+
+
+    async def test_export_streams_from_the_database_in_flat_memory(self):
+        self.seed(self.ROWS)
+        exported, peak = await self.export_peak()
+        self.assertEqual(exported, self.ROWS + 1)
+        # Fetching the whole result first (e.g. .all() instead of db.stream) peaks at about 30 MB here.
+        self.assertLess(peak, 5 * 1024 * 1024)
+
+
+    @unittest.skipUnless(os.environ.get("M14_SLOW_TESTS"), "set M14_SLOW_TESTS=1 to export a million rows")
+    async def test_export_of_one_million_rows_from_the_database_is_flat(self):
+        self.seed(1_000_000)
+        exported, peak = await self.export_peak()
+        self.assertEqual(exported, 1_000_000 + 1)
+        # The same bound as at 50 000 rows: memory does not grow with the export.
+        self.assertLess(peak, 5 * 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from fastapi import HTTPException
+
+from m14.services.etags import collection_etag, contact_etag, etag_matches, if_match_version, not_modified
+
+
+class TestETags(unittest.TestCase):
+
+    def test_collection_etag_depends_on_query_and_version(self):
+        etag = collection_etag(1, 5, [("limit", "10"), ("skip", "0")])
+        self.assertEqual(etag, collection_etag(1, 5, [("skip", "0"), ("limit", "10")]))
+        self.assertNotEqual(etag, collection_etag(1, 6, [("limit", "10"), ("skip", "0")]))
+        self.assertNotEqual(etag, collection_etag(1, 5, [("limit", "20"), ("skip", "0")]))
+
+
+    def test_etag_matches(self):
+        etag = contact_etag(3, 2)
+        self.assertTrue(etag_matches('"1-1", W/"3-2"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"3-1"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+    def test_not_modified(self):
+        response = not_modified('"3-2"')
+        self.assertEqual((response.status_code, response.headers["etag"], response.body), (304, '"3-2"', b""))
+
+
+    def test_if_match_version(self):
+        self.assertIsNone(if_match_version(None, 3))
+        self.assertIsNone(if_match_version("*", 3))
+        self.assertEqual(if_match_version('"1-1", "3-7"', 3), 7)
+        with self.assertRaises(HTTPException) as error:
+            if_match_version('W/"3-7"', 3)
+        self.assertEqual(error.exception.status_code, 412)
+
+
+if __name__ == '__main__':
+    unittest.main()
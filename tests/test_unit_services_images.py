@@ -0,0 +1,59 @@
+import io
+import unittest
+
+from PIL import Image
+
+from m14.services.images import AVATAR_SIZES, MAX_PIXELS, content_hash, process_avatar
+
+
+def encode(image: Image.Image, fmt: str, **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+class TestProcessAvatar(unittest.TestCase):
+
+    def test_outputs_square_webp_per_size(self):
+        outputs = process_avatar(encode(Image.new("RGB", (640, 480), "red"), "JPEG"))
+        self.assertEqual(sorted(outputs), sorted(AVATAR_SIZES))
+        for size, data in outputs.items():
+            with Image.open(io.BytesIO(data)) as image:
+                self.assertEqual((image.format, image.size), ("WEBP", (size, size)))
+
+
+    def test_applies_exif_orientation(self):
+        image = Image.new("RGB", (400, 200))
+        image.paste((0, 0, 255), (0, 0, 200, 200))
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        outputs = process_avatar(encode(image, "JPEG", exif=exif), sizes=(64,))
+        with Image.open(io.BytesIO(outputs[64])) as result:
+            self.assertGreater(result.getpixel((32, 2))[2], 200)
+            self.assertLess(result.getpixel((32, 61))[2], 60)
+
+
+    def test_keeps_transparency(self):
+        outputs = process_avatar(encode(Image.new("RGBA", (100, 100), (0, 0, 0, 0)), "PNG"), sizes=(64,))
+        with Image.open(io.BytesIO(outputs[64])) as result:
+            self.assertEqual(result.getpixel((0, 0))[3], 0)
+
+
+    def test_rejects_invalid_image(self):
+        with self.assertRaises(ValueError):
+            process_avatar(b"\x89PNG\r\n\x1a\n" + b"\x00" * 100)
+
+
+    def test_rejects_decompression_bomb(self):
+        side = int(MAX_PIXELS ** 0.5) + 1
+        with self.assertRaises(ValueError):
+            process_avatar(encode(Image.new("1", (side, side)), "PNG"))
+
+
+    def test_content_hash_is_stable(self):
+        self.assertEqual(content_hash(b"avatar"), content_hash(b"avatar"))
+        self.assertEqual(len(content_hash(b"avatar")), 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
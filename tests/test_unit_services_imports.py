@@ -0,0 +1,95 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from m14.database.models import User
+from m14.services import imports
+from m14.services.imports import ImportJob, ImportJobStore
+
+CSV = ("first_name,last_name,email,phone_number,date_of_birth,nick\n"
+       "Anna,Leeds,anna@example.com,123456789,1990-01-01,\n"
+       "Anna,Again,anna@example.com,123456789,1990-01-01,\n"
+       "Bernard,Date,bernard@example.com,123456789,not-a-date,\n")
+
+
+class TestImportJob(unittest.TestCase):
+
+    def test_keeps_the_lowest_rejected_rows_in_order(self):
+        job = ImportJob(1, "csv")
+        with patch.object(imports, "MAX_REPORTED_ERRORS", 2):
+            for row in (4, 3, 9, 1):
+                job.reject(row, f"row {row}")
+        self.assertEqual([error.row for error in job.state.errors], [1, 3])
+        self.assertEqual(job.state.failed, 4)
+
+
+class TestImportJobStore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.store = ImportJobStore(FakeRedis(server=self.server, decode_responses=True))
+        # Another worker's store: same Redis, nothing local.
+        self.other = ImportJobStore(FakeRedis(server=self.server, decode_responses=True))
+
+
+    async def test_progress_is_shared_between_workers(self):
+        job = ImportJob(1, "csv")
+        await self.store.save(job)
+        job.state.processed = 7
+        await self.store.save(job)
+        progress = await self.other.get(job.state.id, 1)
+        self.assertEqual((progress.id, progress.processed), (job.state.id, 7))
+        self.assertIsNone(await self.other.get(job.state.id, 2))
+        self.assertIsNone(await self.other.get("unknown", 1))
+        self.assertLessEqual(await self.other.redis.ttl(self.store.key(1, job.state.id)), self.store.ttl)
+
+
+    async def test_redis_down_answers_for_local_jobs(self):
+        job = ImportJob(1, "csv")
+        self.server.connected = False
+        await self.store.save(job)
+        self.assertEqual((await self.store.get(job.state.id, 1)).id, job.state.id)
+        self.assertIsNone(await self.store.get(job.state.id, 2))
+        self.assertIsNone(await self.other.get(job.state.id, 1))
+        self.assertEqual(self.store.errors, 3)
+
+
+    async def test_run_import_saves_progress_and_sorted_errors(self):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as out:
+            out.write(CSV)
+        session = MagicMock(__aenter__=AsyncMock(), __aexit__=AsyncMock(return_value=False))
+        threads = []
+
+        def parse_chunk(rows, size):
+            threads.append(threading.get_ident())
+            return parse(rows, size)
+
+        parse = imports._parse_chunk
+        with patch.object(imports, "import_jobs", self.store), \
+                patch.object(imports, "_parse_chunk", side_effect=parse_chunk), \
+                patch.object(imports, "SessionLocal", return_value=session), \
+                patch.object(imports.repository_contacts, "create_contacts",
+                             AsyncMock(return_value=[None, "Duplicate email in file"])), \
+                patch.object(imports.contacts_cache, "invalidate", AsyncMock()), \
+                patch.object(imports.replica_router, "mark_write", AsyncMock()):
+            job = await imports.create_job(1, "csv")
+            await imports.run_import(job, path, User(id=1))
+        progress = await self.other.get(job.state.id, 1)
+        self.assertEqual((progress.status, progress.processed, progress.inserted, progress.failed),
+                         ("done", 3, 1, 2))
+        # The duplicate is only rejected at insert, after the invalid date below it.
+        self.assertEqual([error.row for error in progress.errors], [3, 4])
+        self.assertFalse(os.path.exists(path))
+        # Parsing and validation run off the event loop.
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(len(threads), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
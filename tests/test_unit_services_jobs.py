@@ -0,0 +1,120 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from m14.services.jobs import JobQueue
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = FakeServer()
+        self.redis = FakeRedis(server=self.server, decode_responses=True)
+        self.queue = JobQueue(self.redis, max_attempts=3, backoff_base=2, claim_idle=60)
+        await self.queue.ensure_group()
+
+
+    async def test_runs_and_removes_job(self):
+        handler = AsyncMock()
+        self.queue.register("send_email", handler)
+        await self.queue.enqueue("send_email", email="a@example.com", host="http://testserver/")
+        self.assertEqual(await self.queue.step("w1", block=10), 1)
+        handler.assert_awaited_once_with(email="a@example.com", host="http://testserver/")
+        self.assertEqual(await self.queue.stats(), {"queued": 0, "delayed": 0, "dead": 0, "processed": 1,
+                                                    "retried": 0, "dead_lettered": 0})
+
+
+    async def test_stats_without_redis_keep_the_local_counters(self):
+        self.server.connected = False
+        self.assertEqual(await self.queue.stats(), {"queued": None, "delayed": None, "dead": None, "processed": 0,
+                                                    "retried": 0, "dead_lettered": 0})
+
+
+    async def test_failed_job_is_retried_after_backoff(self):
+        handler = AsyncMock(side_effect=[OSError("smtp down"), None])
+        self.queue.register("send_email", handler)
+        await self.queue.enqueue("send_email", email="a@example.com")
+        with patch("m14.services.jobs.time.time", return_value=1000.0):
+            await self.queue.step("w1", block=10)
+            self.assertEqual(await self.queue.step("w1", block=10), 0)
+        due = await self.redis.zrange(self.queue.delayed, 0, -1, withscores=True)
+        self.assertTrue(1001 <= due[0][1] <= 1002)
+        with patch("m14.services.jobs.time.time", return_value=1002.0):
+            self.assertEqual(await self.queue.step("w1", block=10), 1)
+        self.assertEqual(handler.await_count, 2)
+        self.assertEqual((self.queue.retried, self.queue.processed), (1, 1))
+        self.assertEqual(await self.redis.xlen(self.queue.stream), 0)
+
+
+    def test_backoff_doubles_up_to_max(self):
+        self.queue.backoff_max = 10
+        self.assertTrue(1 <= self.queue.backoff(1) <= 2)
+        self.assertTrue(4 <= self.queue.backoff(3) <= 8)
+        self.assertTrue(5 <= self.queue.backoff(10) <= 10)
+
+
+    async def test_exhausted_job_is_dead_lettered(self):
+        self.queue.backoff_base = 0
+        self.queue.register("send_email", AsyncMock(side_effect=ValueError("bad address")))
+        job_id = await self.queue.enqueue("send_email", email="a@example.com")
+        for _ in range(3):
+            await self.queue.step("w1", block=10)
+        dead = await self.redis.xrange(self.queue.dead)
+        self.assertEqual(len(dead), 1)
+        self.assertEqual((dead[0][1]["id"], dead[0][1]["attempt"], dead[0][1]["error"]),
+                         (job_id, "3", "ValueError: bad address"))
+        self.assertEqual(await self.redis.zcard(self.queue.delayed), 0)
+
+
+    async def test_unknown_job_is_retried(self):
+        await self.queue.enqueue("birthday_reminders")
+        await self.queue.step("w1", block=10)
+        self.assertEqual(self.queue.retried, 1)
+
+
+    async def test_stale_pending_job_is_claimed(self):
+        handler = AsyncMock()
+        self.queue.register("send_email", handler)
+        await self.queue.enqueue("send_email", email="a@example.com")
+        await self.queue.read("crashed", 10, block=10)
+        self.assertEqual(await self.queue.step("w2", block=10), 0)
+        self.queue.claim_idle = 0
+        self.assertEqual(await self.queue.step("w2", block=10), 1)
+        handler.assert_awaited_once()
+
+
+    async def test_run_respects_concurrency_and_limits(self):
+        running, peak = 0, 0
+
+        async def handler(n):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        self.queue.register("work", handler, limit=2)
+        for n in range(10):
+            await self.queue.enqueue("work", n=n)
+        stop = asyncio.Event()
+        worker = asyncio.create_task(self.queue.run("w1", concurrency=4, block=10, stop=stop))
+        while self.queue.processed < 10:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await worker
+        self.assertEqual(peak, 2)
+
+
+    async def test_run_survives_redis_outage(self):
+        stop = asyncio.Event()
+        self.server.connected = False
+        with patch("m14.services.jobs.asyncio.sleep", AsyncMock(side_effect=lambda _: stop.set())) as sleep:
+            await self.queue.run("w1", block=10, stop=stop)
+        sleep.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import asyncio
+import socket
+import unittest
+from email.message import EmailMessage
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+from aiosmtplib.errors import SMTPRecipientsRefused, SMTPResponseException
+
+from m14.services.email_service import confirmation_message, templates
+from m14.services.mail_transport import SMTPMailer, SMTPPool
+
+
+class Inbox:
+
+    def __init__(self):
+        self.messages = []
+        self.busy = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.busy:
+            self.busy -= 1
+            return "421 Service not available, try again later"
+        self.messages.append(envelope.rcpt_tos[0])
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def message(recipient: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = "app@example.com"
+    msg["To"] = recipient
+    msg["Subject"] = "Test"
+    msg.set_content("Hello")
+    return msg
+
+
+class TestSMTPMailer(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.inbox = Inbox()
+        port = free_port()
+        self.controller = Controller(self.inbox, hostname="127.0.0.1", port=port)
+        self.controller.start()
+        self.pool = SMTPPool(lambda: aiosmtplib.SMTP(hostname="127.0.0.1", port=port), size=2, max_messages=100)
+        self.mailer = SMTPMailer(self.pool, batch_size=50)
+
+    async def asyncTearDown(self):
+        await self.mailer.close()
+
+    def tearDown(self):
+        self.controller.stop()
+
+
+    async def test_send_many_reuses_sessions(self):
+        errors = await self.mailer.send_many([message(f"user{i}@example.com") for i in range(150)])
+        self.assertEqual(errors, [None] * 150)
+        self.assertEqual(len(self.inbox.messages), 150)
+        self.assertEqual(self.pool.connects, 2)
+        self.assertEqual(self.mailer.stats()["sent"], 150)
+
+
+    async def test_session_is_replaced_after_max_messages(self):
+        self.pool.max_messages = 10
+        await self.mailer.send_many([message(f"user{i}@example.com") for i in range(25)])
+        self.assertEqual(self.pool.connects, 3)
+
+
+    async def test_queued_sends_are_batched(self):
+        await asyncio.gather(*(self.mailer.send(message(f"user{i}@example.com")) for i in range(40)))
+        self.assertEqual(len(self.inbox.messages), 40)
+        self.assertLessEqual(self.pool.connects, 2)
+
+
+    async def test_rejected_recipient_fails_only_its_message(self):
+        errors = await self.mailer.send_many([message("a@example.com"), message("bounce@example.com"),
+                                              message("b@example.com")])
+        self.assertIsInstance(errors[1], SMTPRecipientsRefused)
+        self.assertEqual(self.inbox.messages, ["a@example.com", "b@example.com"])
+        self.assertEqual(self.pool.connects, 1)
+        with self.assertRaises(SMTPRecipientsRefused):
+            await self.mailer.send(message("bounce@example.com"))
+
+
+    async def test_idle_session_is_probed_and_reused(self):
+        self.pool.keepalive = 0
+        await self.mailer.send_many([message("a@example.com")])
+        await self.mailer.send_many([message("b@example.com")])
+        self.assertEqual((self.pool.connects, self.pool.reuses), (1, 1))
+
+
+    async def test_dropped_session_is_reopened(self):
+        await self.mailer.send_many([message("a@example.com")])
+        self.pool._idle[0].smtp.close()
+        self.assertEqual(await self.mailer.send_many([message("b@example.com")]), [None])
+        self.assertEqual(self.pool.connects, 2)
+
+
+    async def test_transient_reply_retries_on_a_new_session(self):
+        self.inbox.busy = 1
+        errors = await self.mailer.send_many([message("a@example.com"), message("b@example.com")])
+        self.assertEqual(errors, [None, None])
+        self.assertEqual(self.inbox.messages, ["a@example.com", "b@example.com"])
+        self.assertEqual(self.pool.connects, 2)
+
+
+    async def test_repeated_transient_reply_fails_the_rest_of_the_batch(self):
+        self.inbox.busy = 2
+        errors = await self.mailer.send_many([message("a@example.com"), message("b@example.com")])
+        self.assertTrue(all(isinstance(error, SMTPResponseException) and error.code == 421 for error in errors))
+        self.assertEqual(self.pool.connects, 2)
+        self.assertEqual(self.pool._idle, [])
+
+
+    async def test_unreachable_server_fails_every_message(self):
+        mailer = SMTPMailer(SMTPPool(lambda: aiosmtplib.SMTP(hostname="127.0.0.1", port=free_port())))
+        errors = await mailer.send_many([message("a@example.com"), message("b@example.com")])
+        self.assertTrue(all(isinstance(error, OSError) for error in errors))
+        self.assertEqual(mailer.failed, 2)
+
+
+class TestConfirmationMessage(unittest.TestCase):
+
+    def test_renders_cached_template(self):
+        msg = confirmation_message("alice@example.com", "alice", "http://testserver/")
+        self.assertEqual(msg["To"], "alice@example.com")
+        self.assertIn("http://testserver/api/auth/confirmed_email/", msg.get_content())
+        self.assertIs(templates.get_template("email_template.html"), templates.get_template("email_template.html"))
+
+
+if __name__ == '__main__':
+    unittest.main()
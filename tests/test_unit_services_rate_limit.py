@@ -0,0 +1,121 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from m14.services import rate_limit
+from m14.services.rate_limit import Policy, RateLimiter, RateLimitHeadersMiddleware
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = FakeServer()
+        self.policy = Policy("test", 5, 3600)
+        self.limiter = RateLimiter(FakeRedis(server=self.server), sync_interval=60)
+
+
+    async def test_rejects_over_limit(self):
+        decisions = [await self.limiter.hit(self.policy, "1.2.3.4") for _ in range(6)]
+        self.assertEqual([d.allowed for d in decisions], [True] * 5 + [False])
+        self.assertEqual([d.remaining for d in decisions], [4, 3, 2, 1, 0, 0])
+        self.assertGreater(decisions[-1].retry_after, 0)
+        self.assertTrue((await self.limiter.hit(self.policy, "5.6.7.8")).allowed)
+
+
+    async def test_checks_between_syncs_stay_local(self):
+        for _ in range(5):
+            await self.limiter.hit(self.policy, "1.2.3.4")
+        await self.limiter.drain()
+        self.assertEqual(self.limiter.syncs, 1)
+        self.assertEqual(self.limiter.stats()["allowed"], 5)
+
+
+    async def test_processes_share_window_through_redis(self):
+        other = RateLimiter(FakeRedis(server=self.server), sync_interval=0)
+        self.limiter.sync_interval = 0
+        for _ in range(3):
+            self.assertTrue((await self.limiter.hit(self.policy, "1.2.3.4")).allowed)
+        await self.limiter.drain()
+        # A cold bucket knows nothing of the other process until its first sync has run.
+        decisions = [await other.hit(self.policy, "1.2.3.4")]
+        await other.drain()
+        decisions += [await other.hit(self.policy, "1.2.3.4") for _ in range(2)]
+        await other.drain()
+        self.assertEqual([d.allowed for d in decisions], [True, True, False])
+        window = int(time.time() // self.policy.period)
+        self.assertEqual(int(await other.redis.get(other.counter_key(self.policy, "1.2.3.4", window))), 5)
+        self.assertEqual(decisions[-1].retry_after, decisions[-1].reset)
+
+
+    async def test_cold_bucket_decides_without_waiting_for_redis(self):
+        with patch.object(self.limiter.redis, "pipeline", wraps=self.limiter.redis.pipeline) as pipeline:
+            decision = await self.limiter.hit(self.policy, "1.2.3.4")
+            pipeline.assert_not_called()
+            await self.limiter.drain()
+        self.assertTrue(decision.allowed)
+        pipeline.assert_called_once()
+        self.assertEqual(self.limiter.syncs, 1)
+
+
+    async def test_tokens_refill_over_time(self):
+        policy = Policy("test", 2, 60)
+        with patch("m14.services.rate_limit.time.time", return_value=30.0), \
+                patch("m14.services.rate_limit.time.monotonic", return_value=100.0):
+            self.assertTrue((await self.limiter.hit(policy, "k")).allowed)
+            self.assertTrue((await self.limiter.hit(policy, "k")).allowed)
+            denied = await self.limiter.hit(policy, "k")
+        self.assertFalse(denied.allowed)
+        self.assertEqual(denied.retry_after, 30)
+        with patch("m14.services.rate_limit.time.time", return_value=75.0), \
+                patch("m14.services.rate_limit.time.monotonic", return_value=145.0):
+            self.assertTrue((await self.limiter.hit(policy, "k")).allowed)
+
+
+    async def test_redis_down_limits_locally(self):
+        self.server.connected = False
+        limiter = RateLimiter(FakeRedis(server=self.server), sync_interval=60)
+        decisions = [await limiter.hit(self.policy, "1.2.3.4") for _ in range(6)]
+        await limiter.drain()
+        self.assertEqual([d.allowed for d in decisions], [True] * 5 + [False])
+        self.assertEqual(limiter.errors, 1)
+
+
+class TestRateLimitHeaders(unittest.TestCase):
+
+    def setUp(self):
+        limiter = RateLimiter(FakeRedis(server=FakeServer()), sync_interval=60)
+        patcher = patch.object(rate_limit, "rate_limiter", limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app = FastAPI(dependencies=[Depends(rate_limit.rate_limit(Policy("default", 10, 3600)))])
+        app.add_middleware(RateLimitHeadersMiddleware)
+
+        @app.get("/items", dependencies=[Depends(rate_limit.rate_limit(Policy("items", 2, 3600)))])
+        async def items():
+            return ORJSONResponse([1, 2])
+
+        self.client = TestClient(app)
+
+
+    def test_headers_and_429(self):
+        first = self.client.get("/items")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers["RateLimit-Limit"], "2")
+        self.assertEqual(first.headers["RateLimit-Remaining"], "1")
+        self.assertEqual(first.headers["RateLimit-Policy"], "2;w=3600")
+        self.client.get("/items")
+        rejected = self.client.get("/items")
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(rejected.headers["RateLimit-Remaining"], "0")
+        self.assertIn("Retry-After", rejected.headers)
+        self.assertEqual(rejected.headers.get_list("RateLimit-Limit"), ["2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from collections import namedtuple
+from datetime import date
+
+import orjson
+from pydantic import ValidationError
+
+from m14.conf.config import settings
+from m14.services.serialization import contacts_response, contacts_to_json
+
+Row = namedtuple("Row", ["first_name", "last_name", "email", "phone_number", "date_of_birth", "nick", "id"])
+
+
+class TestSerialization(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [Row("John", "Dooe", "john@example.com", "123", date(1990, 1, 1), None, 1)]
+
+    def tearDown(self):
+        settings.debug = False
+
+
+    def test_contacts_response(self):
+        response = contacts_response(self.rows)
+        self.assertEqual(orjson.loads(response.body), [{"first_name": "John", "last_name": "Dooe",
+                                                        "email": "john@example.com", "phone_number": "123",
+                                                        "date_of_birth": "1990-01-01", "nick": None, "id": 1}])
+        page = orjson.loads(contacts_response([], next_cursor=None).body)
+        self.assertEqual(page, {"items": [], "next_cursor": None})
+
+
+    def test_debug_validates_rows(self):
+        rows = [self.rows[0]._replace(first_name="Jo")]
+        self.assertEqual(contacts_to_json(rows)[0]["first_name"], "Jo")
+        settings.debug = True
+        with self.assertRaises(ValidationError):
+            contacts_to_json(rows)
+
+
+if __name__ == '__main__':
+    unittest.main()